@@ -1 +1,10 @@
-from . import agent
+import importlib
+
+
+def __getattr__(name):
+    # The agents are built on first access, so importing `agent.tools` stays cheap.
+    if name == "agent":
+        return importlib.import_module(".agent", __name__)
+    if name == "root_agent":
+        return importlib.import_module(".agent", __name__).root_agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,29 +1,41 @@
-import vertexai
-
 from google.adk.agents import Agent
 from google.adk.tools import AgentTool
 from google.adk.tools.preload_memory_tool import PreloadMemoryTool
-from google.adk.models.google_llm import Gemini
 
 from . import config
-from .tools.agent_tools import retry_config
-from .tools.agent_tools import auto_save_session_to_memory_callback
+from .startup import init_vertexai_callback, start_warm_up
+from .tools.agent_tools import AdmittedGemini, model_admission
+from .tools.agent_tools import AgentIdentifier, AgentPriceFetcher
+from .tools.batch_add import BatchAdder
+from .tools.clients import add_client_hook
+from .tools.intent_router import IntentRouter
+from .tools.session_memory import auto_save_session_to_memory_callback
+from .tools.telemetry import Telemetry
 
 # Import sub-agents
 from .inventory_agent import root_agent as inventory_agent
+from .inventory_agent.agent import firestore_tools
 from .identifier_agent import root_agent as identifier_agent
+from .identifier_agent.agent import image_preprocessor
 from .value_agent import root_agent as value_agent
+from .value_agent.agent import market_prices
+
+# Simple commands are answered straight from the inventory tools, skipping the model hops.
+intent_router = IntentRouter(firestore_tools)
 
-vertexai.init(project=config.PROJECT_ID, location=config.LOCATION)
+# Multi-item adds identify and value every item concurrently, then save them in one batch.
+batch_adder = BatchAdder(
+    firestore_tools,
+    identifier=AgentIdentifier(identifier_agent),
+    price_fetcher=AgentPriceFetcher(value_agent, price_cache=market_prices),
+    concurrency=config.VALUATION_MAX_WORKERS,
+)
 
 root_agent = Agent(
     name="master_agent",
-    model=Gemini(
-        model=config.MODEL,
-        retry_options=retry_config
-    ),
+    model=AdmittedGemini(model=config.MASTER_MODEL, admission=model_admission(config.MODEL_RATE_PER_MINUTE)),
     description="A master agent that orchestrates sub-agents to manage inventory and identify products.",
-    instruction="""You are a helpful master inventory orchestrator. Your job is to understand the user's goal and create a plan by calling the correct tools in the correct order. Your tools are other specialized agents.
+    instruction="""You are a helpful master inventory orchestrator. Your job is to understand the user's goal and create a plan by calling the correct tools in the correct order. Your tools are other specialized agents and a portfolio valuation tool.
 
 **Your Thought Process:**
 1.  **Analyze the Goal**: Read the user's prompt to determine their primary goal. Use the conversation memory to understand the context if the prompt is a follow-up (e.g., "add it to my collection").
@@ -32,14 +44,16 @@ root_agent = Agent(
         1.  First, call the `identifier_agent` tool to get the item's details (title, UPC, URL).
         2.  After identifying the product, you **MUST** then take the identified item's details (especially title, UPC, and condition of the item) and call the `value_agent` tool to find its market value.
         3.  Finally, combine all the collected information (identified details and value) and call the `inventory_agent` tool to save the complete record to the database.
+    - If a photo is followed by a note that it **matches a previously identified product**, use that title, UPC and URL instead of calling the `identifier_agent` tool, unless the user says it is a different item.
+    - If the user wants to **add several items at once** (e.g., a list of titles or a photo of a shelf), call the `batch_add_items` tool **once** with every item instead of the steps above. Split the request into one object per item with its `Title`, `Format` and `Condition` (read them from the image if there is one), and pass the inventory category as `collection_id`, using one of the user's existing categories if possible. It identifies and values all items in parallel and saves them together. Report any items with an `error` status so the user can fix them.
     - If the user *only* wants to **identify a product** (e.g., "what is the UPC for this DVD?"), call the `identifier_agent` tool.
     - If the user *only* wants to know the **value of an item** (e.g., "what is this DVD worth?"), call the `value_agent` tool.
-    - If the user wants to know the **value of their assets** or asks for **all their items/inventory** (e.g., "what's the current value of my assets?", "show me all my stuff"):
-        1.  First, call the `inventory_agent` tool's `get_all_user_inventory` function to get a list of all items.
-        2.  For each item, check its `PriceHistory`.
-        3.  If the most recent price check was **within the last day**, use that value and do not perform a new search.
-        4.  If the price is **older than one day**, or if the user explicitly asks to **"refresh"** the price, then call the `value_agent` tool with the item's details (title, UPC) to find its current market value.
-        5.  If a new value was found, call the `inventory_agent` tool to update that item's record by appending the new price to its `PriceHistory`.
+    - If the user wants to know the **value of their assets** (e.g., "what's the current value of my assets?"):
+        1.  Call the `value_portfolio` tool **once**. It reuses prices checked within the last day, refreshes older ones and saves them, and returns the total value with a per-category breakdown.
+        2.  If the user explicitly asks to **"refresh"** prices, call `value_portfolio` with `refresh` set to true.
+        3.  Do not call the `value_agent` or `inventory_agent` tools item by item for this. Mention any items listed under `not_refreshed` so the user knows those values may be out of date.
+    - If the user asks for **all their items/inventory** (e.g., "show me all my stuff"), call the `inventory_agent` tool's `get_all_user_inventory` function.
+    - If the user asks **how many** items they own or the **total** of a category (e.g., "how many Blu-rays do I have?"), call the `inventory_agent` tool; it answers from server-side aggregates.
     - For all other database tasks like **querying, updating, or deleting inventory**, call the `inventory_agent` tool.
 3.  **Be Helpful**: Your primary role is to call your tools to accomplish the user's task. Do not try to answer questions directly, but use your understanding of the conversation to guide the user if their request is unclear.
 
@@ -48,6 +62,24 @@ root_agent = Agent(
         AgentTool(agent=inventory_agent), 
         AgentTool(agent=identifier_agent), 
         AgentTool(agent=value_agent),
+        firestore_tools.value_portfolio,
+        *batch_adder.get_tools(),
         PreloadMemoryTool()],
-    after_agent_callback=auto_save_session_to_memory_callback,
+    before_agent_callback=[
+        init_vertexai_callback,
+        *([intent_router.before_agent_callback] if config.INTENT_ROUTER else []),
+    ],
+    after_agent_callback=[auto_save_session_to_memory_callback, image_preprocessor.after_agent_callback],
+    # Photos reach the model downsized, and annotated if they show an already identified product.
+    before_model_callback=image_preprocessor.before_model_callback,
 )
+
+# Latency, Firestore RPC and token counts of every agent, model and tool call.
+if config.TELEMETRY:
+    telemetry = Telemetry(json_path=config.TELEMETRY_JSON_PATH or None)
+    telemetry.instrument_agent(root_agent)
+    add_client_hook(telemetry.instrument_firestore)
+
+# Optionally create the clients now, in the background, instead of on the first request.
+if config.WARM_UP:
+    start_warm_up(root_agent)
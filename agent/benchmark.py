@@ -0,0 +1,313 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Offline benchmark of the inventory tools and agents.
+
+Runs against the Firestore emulator, or with --sqlite against a local SQLite database,
+with scripted stand-ins for the Gemini models (the stand-in agents have no
+`google_search`), so no live model or database is touched. For each inventory size a
+synthetic user is seeded and every scenario is timed, reporting p50/p99 latency,
+Firestore RPCs and documents read per call.
+
+Scenarios:
+    list         Pages through the whole inventory with `get_all_user_inventory`.
+    value-all    `value_portfolio(refresh=True)`, valuing every item through the value agent.
+    add          Adds one item through `batch_add_items` (identify, value and write).
+    bulk-import  Writes 100 items per `bulk_add_documents` call.
+
+Results can be saved as a threshold file and later runs checked against it, so that
+performance regressions fail before deploy.
+
+Usage:
+    gcloud emulators firestore start --host-port=localhost:8080
+    export FIRESTORE_EMULATOR_HOST=localhost:8080
+    python -m agent.benchmark --sizes 10 1000 10000
+    python -m agent.benchmark --write-thresholds benchmark_thresholds.json
+    python -m agent.benchmark --check benchmark_thresholds.json
+    python -m agent.benchmark --sqlite /tmp/benchmark.db --sizes 10 1000 10000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from collections import Counter
+from typing import Any, AsyncGenerator, Callable, Optional
+
+from google.adk.agents import Agent
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from .tools.agent_tools import AgentIdentifier, AgentPriceFetcher, call_tool
+from .tools.batch_add import BatchAdder
+from .tools.firestore_tools import FirestoreTools
+from .tools.sqlite_tools import SqliteTools
+from .tools.telemetry import instrument_firestore
+
+SCENARIOS = ("list", "value-all", "add", "bulk-import")
+
+# Latency thresholds get this much headroom over the recorded run; counts must not grow at all.
+LATENCY_HEADROOM = 1.5
+
+_CATEGORIES = ("dvd", "bluray", "4k", "cd", "vinyl", "games")
+_WORDS = (
+    "Midnight", "Return", "Empire", "Silent", "River", "Galaxy", "Last", "Crimson", "Echo",
+    "Harbor", "Storm", "Iron", "Garden", "Shadow", "Northern", "Paper", "Velvet", "Signal",
+)
+
+
+class ScriptedLlm(BaseLlm):
+    """A stand-in model that answers every request from a script after a fixed delay."""
+
+    script: Callable[[str], str]
+    latency_seconds: float = 0.0
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        await asyncio.sleep(self.latency_seconds)
+        prompt = "".join(
+            part.text or "" for content in llm_request.contents if content.role == "user"
+            for part in content.parts or []
+        )
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=self.script(prompt))]))
+
+
+class RpcCounter:
+    """Counts the RPCs a Firestore client makes and the documents they return."""
+
+    def __init__(self):
+        self.rpcs: Counter = Counter()
+        self.documents = 0
+
+    def instrument(self, db: Any) -> None:
+        """Routes a client's RPCs through the counter."""
+        instrument_firestore(db, self._count_rpc, self._count_documents)
+
+    def reset(self) -> None:
+        self.rpcs.clear()
+        self.documents = 0
+
+    def _count_rpc(self, name: str, writes: int) -> None:
+        self.rpcs[name] += 1
+
+    def _count_documents(self, count: int) -> None:
+        self.documents += count
+
+
+def synthetic_item(rng: random.Random) -> dict[str, Any]:
+    """Builds a random inventory item shaped like the ones the agents write."""
+    upc = "".join(rng.choice("0123456789") for _ in range(12))
+    return {
+        "Title": " ".join(rng.sample(_WORDS, rng.randint(1, 4))),
+        "CreatedDate": "2025-01-01",
+        "UpdatedDate": "2025-01-01",
+        "UPC": upc,
+        "Format": rng.choice(("DVD", "Blu-ray", "4K UHD")),
+        "Condition": rng.choice(("New", "Used")),
+        "Quantity": rng.choice((1, 1, 1, 2, 3)),
+        "PriceHistory": [{"value": round(rng.uniform(2, 60), 2), "date_checked": "2025-01-01T00:00:00+00:00"}],
+        "SourceURL": f"https://www.blu-ray.com/movies/{upc}/",
+    }
+
+
+def stub_agents(model_latency_seconds: float) -> tuple[Agent, Agent]:
+    """Returns stand-ins for `identifier_agent` and `value_agent` that answer from a script."""
+    def identify(prompt: str) -> str:
+        upc = str(uuid.uuid4().int)[:12]
+        return f"Found it.\nIDENTIFIED: Benchmark Title | {upc} | https://www.blu-ray.com/movies/{upc}/"
+
+    identifier_agent = Agent(
+        name="identifier_agent",
+        model=ScriptedLlm(model="scripted", script=identify, latency_seconds=model_latency_seconds),
+        instruction="Identify the item.",
+    )
+    value_agent = Agent(
+        name="value_agent",
+        model=ScriptedLlm(model="scripted", script=lambda prompt: "$12.99", latency_seconds=model_latency_seconds),
+        instruction="Value the item.",
+    )
+    return identifier_agent, value_agent
+
+
+class Benchmark:
+    """Seeds synthetic users and times each scenario against them."""
+
+    def __init__(
+        self,
+        project_id: str,
+        database: str,
+        model_latency_seconds: float,
+        repeat: int,
+        seed: int,
+        sqlite_path: Optional[str] = None,
+    ):
+        self.counter = RpcCounter()
+        if sqlite_path:
+            # No RPCs are made, so the RPC and document counts stay zero.
+            self.tools = SqliteTools(sqlite_path)
+        else:
+            self.tools = FirestoreTools(project_id, database)
+            self.counter.instrument(self.tools.db)
+        identifier_agent, value_agent = stub_agents(model_latency_seconds)
+        self.price_fetcher = AgentPriceFetcher(value_agent)
+        self.batch_adder = BatchAdder(
+            self.tools, identifier=AgentIdentifier(identifier_agent), price_fetcher=self.price_fetcher)
+        self.repeat = repeat
+        self.rng = random.Random(seed)
+
+    async def run(self, sizes: list[int], scenarios: list[str]) -> dict[str, Any]:
+        results: dict[str, Any] = {}
+        for size in sizes:
+            user_id = f"bench-{size}-{uuid.uuid4().hex[:8]}"
+            await self._seed(user_id, size)
+            for scenario in scenarios:
+                print(f"Running {scenario} with {size} items...", file=sys.stderr, flush=True)
+                operation = getattr(self, "_" + scenario.replace("-", "_"))
+                # Valuing the whole inventory runs the value agent per item, so it is repeated less.
+                repeat = min(self.repeat, 3) if scenario == "value-all" else self.repeat
+                results[f"{scenario}@{size}"] = await self._measure(operation, user_id, repeat)
+        return results
+
+    async def _seed(self, user_id: str, size: int) -> None:
+        """Writes `size` synthetic items spread over the categories, 400 per batch."""
+        categories = _CATEGORIES[:max(1, min(len(_CATEGORIES), size // 10))]
+        items = [(self.rng.choice(categories), synthetic_item(self.rng)) for _ in range(size)]
+        for category in categories:
+            documents = [item for item_category, item in items if item_category == category]
+            for start in range(0, len(documents), 400):
+                await call_tool(self.tools.bulk_add_documents, collection_id=category,
+                                documents=documents[start:start + 400], tool_context=None, user_id=user_id)
+
+    async def _measure(self, operation: Callable, user_id: str, repeat: int) -> dict[str, Any]:
+        latencies: list[float] = []
+        self.counter.reset()
+        for _ in range(repeat):
+            started = time.perf_counter()
+            await operation(user_id)
+            latencies.append((time.perf_counter() - started) * 1000)
+        latencies.sort()
+        return {
+            "calls": len(latencies),
+            "p50_ms": round(_percentile(latencies, 0.50), 1),
+            "p99_ms": round(_percentile(latencies, 0.99), 1),
+            "rpcs_per_call": round(sum(self.counter.rpcs.values()) / len(latencies), 1),
+            "documents_read_per_call": round(self.counter.documents / len(latencies), 1),
+            "rpcs": dict(self.counter.rpcs),
+        }
+
+    async def _list(self, user_id: str) -> None:
+        start_after = None
+        while True:
+            page = await call_tool(
+                self.tools.get_all_user_inventory, tool_context=None, user_id=user_id, start_after=start_after)
+            start_after = page.get("next_start_after")
+            if not start_after:
+                return
+
+    async def _value_all(self, user_id: str) -> None:
+        self.tools.price_fetcher = self.price_fetcher
+        try:
+            await call_tool(self.tools.value_portfolio, tool_context=None, user_id=user_id, refresh=True)
+        finally:
+            self.tools.price_fetcher = None
+
+    async def _add(self, user_id: str) -> None:
+        item = {"Title": "Benchmark Title", "Format": "Blu-ray", "Condition": "New"}
+        await self.batch_adder.batch_add_items([item], None, collection_id="bluray", user_id=user_id)
+
+    async def _bulk_import(self, user_id: str) -> None:
+        items = [synthetic_item(self.rng) for _ in range(100)]
+        await call_tool(
+            self.tools.bulk_add_documents, collection_id="import", documents=items, tool_context=None, user_id=user_id)
+
+
+def _percentile(sorted_values: list[float], quantile: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(quantile * len(sorted_values)))]
+
+
+def thresholds_from(results: dict[str, Any]) -> dict[str, Any]:
+    """Derives regression thresholds from a run: latency with headroom, counts as recorded."""
+    return {
+        key: {
+            "p99_ms": round(result["p99_ms"] * LATENCY_HEADROOM, 1),
+            "rpcs_per_call": result["rpcs_per_call"],
+            "documents_read_per_call": result["documents_read_per_call"],
+        }
+        for key, result in results.items()
+    }
+
+
+def check_thresholds(results: dict[str, Any], thresholds: dict[str, Any]) -> list[str]:
+    """Returns a description of every metric that exceeds its threshold."""
+    failures = []
+    for key, limits in thresholds.items():
+        if key not in results:
+            continue
+        for metric, limit in limits.items():
+            if results[key][metric] > limit:
+                failures.append(f"{key}: {metric} {results[key][metric]} > {limit}")
+    return failures
+
+
+async def _main(args: argparse.Namespace) -> dict[str, Any]:
+    benchmark = Benchmark(
+        args.project, args.database, args.model_latency_ms / 1000, args.repeat, args.seed, args.sqlite)
+    return await benchmark.run(args.sizes, args.scenario or list(SCENARIOS))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the inventory tools and agents offline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000],
+                        help="Inventory sizes of the synthetic users (between 10 and 10000 items).")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS,
+                        help="Only run this scenario. May be repeated (default: all scenarios).")
+    parser.add_argument("--repeat", type=int, default=20, help="Calls measured per scenario and size.")
+    parser.add_argument("--model-latency-ms", type=float, default=0.0,
+                        help="Simulated latency of every stub model call.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic inventories.")
+    parser.add_argument("--project", default="benchmark", help="Project ID used with the emulator.")
+    parser.add_argument("--database", default="inventory", help="Database name used with the emulator.")
+    parser.add_argument("--sqlite", help="Benchmark the SQLite backend with this database file instead.")
+    parser.add_argument("--check", help="Exit with an error if a result exceeds a threshold in this file.")
+    parser.add_argument("--write-thresholds", help="Save thresholds derived from this run to this file.")
+    args = parser.parse_args()
+
+    if not args.sqlite and not os.environ.get("FIRESTORE_EMULATOR_HOST"):
+        parser.error("FIRESTORE_EMULATOR_HOST is not set; the benchmark only runs against the emulator or with --sqlite.")
+
+    results = asyncio.run(_main(args))
+    print(json.dumps(results, indent=2))
+    if args.write_thresholds:
+        with open(args.write_thresholds, "w", encoding="utf-8") as f:
+            json.dump(thresholds_from(results), f, indent=2)
+    if args.check:
+        with open(args.check, encoding="utf-8") as f:
+            failures = check_thresholds(results, json.load(f))
+        if failures:
+            print("\n".join(failures), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
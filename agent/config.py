@@ -17,10 +17,73 @@ import os
 # We are using custom PROJECT_ID instead of GOOGLE_CLOUD_PROJECT because 
 # this values defaults to the PROJECT NUMBER in Vertex Agent Engine and
 # causes issues with finding the database.
-PROJECT_ID = os.environ["PROJECT_ID"]
-LOCATION = os.environ["GOOGLE_CLOUD_LOCATION"]
+# Missing values only fail when a client is first used or Vertex AI is initialized, with an
+# error naming the variable, so the package imports without them.
+PROJECT_ID = os.environ.get("PROJECT_ID")
+LOCATION = os.environ.get("GOOGLE_CLOUD_LOCATION")
 
 MODEL = "gemini-2.5-pro"
 
+# Model tier of each agent. The orchestrator, identifier and value agents reason over
+# searches and default to MODEL; the inventory agent only maps requests to tool calls.
+MASTER_MODEL = os.environ.get("MASTER_MODEL", MODEL)
+INVENTORY_MODEL = os.environ.get("INVENTORY_MODEL", "gemini-2.5-flash")
+IDENTIFIER_MODEL = os.environ.get("IDENTIFIER_MODEL", MODEL)
+VALUE_MODEL = os.environ.get("VALUE_MODEL", MODEL)
+
+# Answer simple commands ("show me all my stuff", "delete Inception") directly from the
+# inventory tools instead of running the orchestrator model.
+INTENT_ROUTER = os.environ.get("INTENT_ROUTER", "true").lower() == "true"
+
 # Define your Firestore database name
 FIRESTORE_DATABASE = "inventory"
+
+# Prices older than this are refreshed when valuing a user's portfolio.
+PRICE_MAX_AGE_HOURS = int(os.environ.get("PRICE_MAX_AGE_HOURS", "24"))
+
+# Set to false when the background price-refresh worker (python -m agent.price_refresh)
+# keeps prices fresh, so value_portfolio answers from stored prices without valuation calls.
+INLINE_PRICE_REFRESH = os.environ.get("INLINE_PRICE_REFRESH", "true").lower() == "true"
+
+# Maximum number of value agent runs per minute made by the background price-refresh worker.
+PRICE_REFRESH_RATE_PER_MINUTE = float(os.environ.get("PRICE_REFRESH_RATE_PER_MINUTE", "30"))
+
+# Maximum number of calls per minute to each model, across all sessions of the process.
+# Unset for no limit beyond the adaptive concurrency limit.
+MODEL_RATE_PER_MINUTE = float(os.environ["MODEL_RATE_PER_MINUTE"]) if os.environ.get("MODEL_RATE_PER_MINUTE") else None
+
+# Maximum number of concurrent price lookups while valuing a portfolio.
+VALUATION_MAX_WORKERS = int(os.environ.get("VALUATION_MAX_WORKERS", "8"))
+
+# Where the inventory is stored: "firestore", or "sqlite" for a local database file at
+# SQLITE_PATH (single-tenant deployments, local runs and load tests).
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "firestore").lower()
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "inventory.db")
+
+# Run the Firestore tools in worker threads so tool calls do not block the event loop.
+FIRESTORE_ASYNC = os.environ.get("FIRESTORE_ASYNC", "true").lower() == "true"
+
+# Read-through cache for inventory reads. Set the TTL to 0 to disable caching. Only writes
+# made through this process's tools invalidate it; writes by the price refresh worker,
+# imports, migrations, summary rebuilds or other replicas show up once the TTL expires.
+INVENTORY_CACHE_TTL_SECONDS = int(os.environ.get("INVENTORY_CACHE_TTL_SECONDS", "30"))
+INVENTORY_CACHE_MAX_MB = int(os.environ.get("INVENTORY_CACHE_MAX_MB", "64"))
+
+# Identifications in the shared product catalog are reused for this long.
+CATALOG_REFRESH_DAYS = int(os.environ.get("CATALOG_REFRESH_DAYS", "90"))
+
+# Photos are downsized to at most this many pixels on their longest side before they are
+# sent to a model (768 fits one Gemini image tile).
+IMAGE_MAX_SIDE = int(os.environ.get("IMAGE_MAX_SIDE", "768"))
+
+# Market prices in the shared cross-user price table are reused for this long.
+MARKET_PRICE_MAX_AGE_HOURS = int(os.environ.get("MARKET_PRICE_MAX_AGE_HOURS", "24"))
+
+# Measure agent runs, model calls, tool calls and Firestore RPCs as attributes of the ADK
+# trace spans. Set TELEMETRY_JSON_PATH to also append every measurement to a JSON lines file.
+TELEMETRY = os.environ.get("TELEMETRY", "true").lower() == "true"
+TELEMETRY_JSON_PATH = os.environ.get("TELEMETRY_JSON_PATH", "")
+
+# Create the Firestore and model clients in a background thread at import, instead of on
+# the first request.
+WARM_UP = os.environ.get("WARM_UP", "false").lower() == "true"
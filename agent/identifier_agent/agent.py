@@ -13,19 +13,27 @@
 # limitations under the License.
 
 from google.adk.agents import Agent
-from google.adk.models.google_llm import Gemini
 from google.adk.tools import google_search
 
+from datetime import timedelta
+
 from .. import config
-from ..tools.agent_tools import retry_config
+from ..tools.agent_tools import AdmittedGemini, model_admission
+from ..tools.catalog import ProductCatalog
+from ..tools.clients import lazy_async_firestore_client
+from ..tools.images import ImagePreprocessor
+
 
+# Identifications are shared across users, so repeat titles skip the search entirely.
+catalog = ProductCatalog(
+    lazy_async_firestore_client(config.PROJECT_ID, config.FIRESTORE_DATABASE),
+    refresh_after=timedelta(days=config.CATALOG_REFRESH_DAYS),
+)
+image_preprocessor = ImagePreprocessor(catalog, max_side=config.IMAGE_MAX_SIDE)
 
 root_agent = Agent(
     name="identifier_agent",
-    model=Gemini(
-        model=config.MODEL,
-        retry_options=retry_config
-    ),
+    model=AdmittedGemini(model=config.IDENTIFIER_MODEL, admission=model_admission(config.MODEL_RATE_PER_MINUTE)),
     description="Identifies a physical media item from an image or text query, considering its condition (e.g., special edition, new, used), finds it on blu-ray.com, and extracts its UPC code.",
     instruction="""You are a physical media identification specialist. Your task is to identify an item's title and condition from an image or a text query, find it on blu-ray.com, and extract its UPC code. Your primary goal is to gather enough detail to ensure the `value_agent` can find an accurate market price.
 
@@ -38,6 +46,10 @@ root_agent = Agent(
     - You should not respond directly to the user or ask clarifying questions. Return your findings to the master agent.
     - If you cannot identify the item, find it on blu-ray.com, or locate its UPC code, return that information.
     - If you find multiple versions, return the details for each so the master agent can ask the user for clarification.
+4.  **Summary Lines**: End your response with one line per identified version in exactly this form: `IDENTIFIED: <title> | <UPC> | <blu-ray.com URL>`. Omit these lines if you could not find a UPC.
 """,
     tools=[google_search],
+    before_agent_callback=catalog.before_agent_callback,
+    after_agent_callback=catalog.after_agent_callback,
+    before_model_callback=image_preprocessor.before_model_callback,
 )
\ No newline at end of file
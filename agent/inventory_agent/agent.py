@@ -1,28 +1,67 @@
 import os
+from datetime import timedelta
 
 from google.adk.agents import Agent
-from google.adk.models.google_llm import Gemini
 
 from .. import config
-from ..tools.agent_tools import retry_config
+from ..tools.admin_tools import AdminTools
+from ..tools.agent_tools import AdmittedGemini, AgentPriceFetcher, model_admission
+from ..tools.async_firestore_tools import AsyncFirestoreTools
 from ..tools.firestore_tools import FirestoreTools
+from ..tools.inventory_cache import InventoryCache
+from ..tools.sqlite_tools import SqliteTools
 from ..tools.user_tools import UserTools
+from ..value_agent import root_agent as value_agent
+from ..value_agent.agent import market_prices
 
 
 # Initialize your custom tool classes
-firestore_tools = FirestoreTools(
-    project_id=config.PROJECT_ID, 
-    database=config.FIRESTORE_DATABASE
+# Without inline refresh, value_portfolio only reads the prices kept fresh by agent.price_refresh.
+price_fetcher = (
+    AgentPriceFetcher(value_agent, price_cache=market_prices)
+    if config.INLINE_PRICE_REFRESH else None
 )
+inventory_cache = InventoryCache(
+    ttl_seconds=config.INVENTORY_CACHE_TTL_SECONDS,
+    max_bytes=config.INVENTORY_CACHE_MAX_MB * 1024 * 1024,
+) if config.INVENTORY_CACHE_TTL_SECONDS > 0 else None
+if config.STORAGE_BACKEND == "sqlite":
+    firestore_tools = SqliteTools(
+        path=config.SQLITE_PATH,
+        price_fetcher=price_fetcher,
+        max_workers=config.VALUATION_MAX_WORKERS,
+        price_max_age=timedelta(hours=config.PRICE_MAX_AGE_HOURS),
+        cache=inventory_cache,
+    )
+elif config.FIRESTORE_ASYNC:
+    firestore_tools = AsyncFirestoreTools(
+        project_id=config.PROJECT_ID,
+        database=config.FIRESTORE_DATABASE,
+        price_fetcher=price_fetcher,
+        max_workers=config.VALUATION_MAX_WORKERS,
+        price_max_age=timedelta(hours=config.PRICE_MAX_AGE_HOURS),
+        cache=inventory_cache,
+    )
+else:
+    firestore_tools = FirestoreTools(
+        project_id=config.PROJECT_ID, 
+        database=config.FIRESTORE_DATABASE,
+        price_fetcher=price_fetcher,
+        max_workers=config.VALUATION_MAX_WORKERS,
+        price_max_age=timedelta(hours=config.PRICE_MAX_AGE_HOURS),
+        cache=inventory_cache,
+    )
 user_tools = UserTools(user_id="1")
+# Cross-user analytics use Firestore collection-group queries; a SQLite store has a single tenant.
+admin_tools = (
+    AdminTools(project_id=config.PROJECT_ID, database=config.FIRESTORE_DATABASE)
+    if config.STORAGE_BACKEND != "sqlite" else None
+)
 
 root_agent = Agent(
     # Renamed from "root_agent" to match the name used for delegation
     name="inventory_agent",
-    model=Gemini(
-        model=config.MODEL,
-        retry_options=retry_config
-    ),
+    model=AdmittedGemini(model=config.INVENTORY_MODEL, admission=model_admission(config.MODEL_RATE_PER_MINUTE)),
     description="A worker agent that manages inventory records in the database. It can add, update, get, delete, query, and list items.",
     instruction=f"""You are an inventory database specialist. Your role is to interact directly with the database to manage inventory records.
 
@@ -33,8 +72,13 @@ root_agent = Agent(
 4.  **Category Consistency**: Before adding an item to a new category, you **MUST** use the `list_inventory_categories` tool to check if a similar category already exists. Use the existing category if possible to avoid duplicates (e.g., use 'dvd' instead of creating 'dvds').
 
 **Your Workflow:**
-- **Find Before Acting**: If you need to **delete** or **update** an item based on its name or title, you **MUST** first use the `find_document_by_field` tool to get its `document_id`. This tool looks for similar, not just exact, titles.
+- **Find Before Acting**: If you need to **delete** or **update** an item based on its name or title, you **MUST** first use the `find_document_by_field` tool to get its `document_id`. For titles it finds similar, not just exact, matches in a single call and ranks them by `score`; if the best match is clearly the item, use it instead of searching again, and if several score similarly, ask which one is meant. Before **deleting** an item whose title is not exactly the one the user gave, confirm it with the user.
 - **Execute the Correct Tool**: Call the appropriate tool with the `collection_id` and other necessary data.
+- **Batch Multiple Items**: When adding, updating, or deleting more than one item in the same category, use `bulk_add_documents`, `bulk_update_documents`, or `bulk_delete_documents` with the whole list in a single call instead of calling the single-item tools repeatedly.
+- **Counts and Totals**: For questions like "how many Blu-rays do I own" or "what are my DVDs worth", use `aggregate_inventory` (with `include_value` for values) instead of fetching the items and adding them up yourself.
+- **Keep Reads Small**: `get_all_user_inventory` returns item summaries with only the latest price, one page at a time. Only set `summary` to false or request another page (via `start_after`) when the task needs it. Use `fields` with `query_collection` to fetch just the fields you need.
+- **Price History**: Use `get_price_history` only when the user asks about older prices or how an item's value has changed over time.
+- **Questions About All Users**: For an admin's questions across all users (e.g., "which UPCs are most owned", "total value across all users"), use `aggregate_all_users` in a single call instead of reading each user's inventory. Never use it for anyone who is not an admin.
 - **Ask for More Information**: When adding a new item, after gathering the essential details, feel free to ask the user questions to help fill out optional fields like `StorageLocation`, `PurchasePrice`, `PurchaseDate`, or `Notes`.
 
 **Output:**
@@ -49,7 +93,8 @@ When you use the `add_document` or `update_document` tools, the `data` payload f
 -   `Format`: The physical media format (e.g., 'DVD', 'Blu-ray', '4K UHD').
 -   `Condition`: The condition of the item (e.g., 'New', 'Used').
 -   `Quantity`: The number of units for this item.
--   `PriceHistory` (Optional): A list of price checks. Each entry should be an object with `value` and `date_checked`. When adding a new price, append to this list.
+-   `PriceHistory` (Optional): A list of price checks. Each entry should be an object with `value` and `date_checked`. When adding a new price, append to this list. Only the latest checks are kept on the item; older ones are moved to its full price history automatically.
+-   `PriceRollup`: Maintained automatically from `PriceHistory` (count, min, max and daily/weekly points). Never write it yourself.
 -   `SourceURL` (Optional): The URL from blu-ray.com.
 -   `StorageLocation` (Optional): The physical location where the item is stored.
 -   `PurchasePrice` (Optional): The price paid for the item.
@@ -64,6 +109,7 @@ DATABASE STRUCTURE:
 """,
     tools=(
         firestore_tools.get_tools() +
-        user_tools.get_tools()
+        user_tools.get_tools() +
+        (admin_tools.get_tools() if admin_tools else [])
     ),
 )
\ No newline at end of file
@@ -0,0 +1,316 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Bulk import and export of user inventories as CSV or JSON Lines.
+
+Rows are streamed in chunks, so memory use does not grow with the size of the file.
+Each chunk is optionally enriched (identification and valuation) with bounded
+concurrency, validated against the inventory schema, de-duplicated by UPC and written
+with one batched write per category. Progress is checkpointed after every chunk so an
+interrupted import can be resumed.
+
+Both commands run on the storage backend set by `STORAGE_BACKEND`.
+
+Usage:
+    python -m agent.inventory_io import --user-id 42 --category dvd shelf.csv
+    python -m agent.inventory_io import --user-id 42 --identify --value shelf.jsonl
+    python -m agent.inventory_io export --user-id 42 inventory.csv
+"""
+
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import os
+from datetime import date
+from typing import Any, Iterator, Optional
+
+from . import config
+from .tools.agent_tools import AgentIdentifier, AgentPriceFetcher, enrich_record
+from .tools.inventory_tools import MAX_PAGE_SIZE, WRITES_PER_BATCH, InventoryTools
+from .tools.inventory_schema import FIELDS, canonicalize_fields, validate_item
+from .tools.storage import InventoryStorage
+
+# Only the first few validation errors are kept in the report.
+MAX_REPORTED_ERRORS = 100
+
+# Firestore allows at most 30 values in an `in` filter.
+_MAX_IN_VALUES = 30
+
+
+def _detect_format(path: str, fmt: Optional[str]) -> str:
+    if fmt:
+        return fmt
+    return "jsonl" if path.lower().endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def _read_rows(path: str, fmt: str) -> Iterator[dict[str, Any]]:
+    """Streams the records of a CSV or JSON Lines file one at a time."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _chunks(rows: Iterator[dict[str, Any]], size: int) -> Iterator[list[dict[str, Any]]]:
+    while chunk := list(itertools.islice(rows, size)):
+        yield chunk
+
+
+class InventoryImporter:
+    """Imports records from a file into a user's inventory."""
+
+    def __init__(
+        self,
+        tools: InventoryTools,
+        user_id: str,
+        default_category: str,
+        identifier: Optional[AgentIdentifier] = None,
+        price_fetcher: Optional[AgentPriceFetcher] = None,
+        concurrency: int = 8,
+        chunk_size: int = WRITES_PER_BATCH,
+    ):
+        """
+        Initializes the importer.
+
+        Args:
+            tools: The tools used to read existing UPCs and write the imported items.
+            user_id: The ID of the user whose inventory is imported into.
+            default_category: The category for records without a `Category` column.
+            identifier: If set, records without a UPC are identified before validation.
+            price_fetcher: If set, records without a `PriceHistory` are valued before writing.
+            concurrency: The maximum number of concurrent identification/valuation calls.
+            chunk_size: The number of records read, enriched and written at a time.
+        """
+        self.tools = tools
+        self.user_id = user_id
+        self.default_category = default_category
+        self.identifier = identifier
+        self.price_fetcher = price_fetcher
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.chunk_size = chunk_size
+
+    async def run(self, path: str, fmt: str, checkpoint_path: Optional[str] = None) -> dict[str, Any]:
+        """
+        Imports a file, resuming from `checkpoint_path` if it records earlier progress.
+        The checkpoint is removed once the whole file has been imported.
+
+        Returns:
+            Counts of imported, duplicate, invalid and failed records, plus the first errors.
+        """
+        report = _load_checkpoint(checkpoint_path, path) or {
+            "input": os.path.abspath(path),
+            "rows_done": 0,
+            "imported": 0,
+            "duplicates": 0,
+            "invalid": 0,
+            "failed": 0,
+            "errors": [],
+        }
+        today = date.today().isoformat()
+        rows = itertools.islice(_read_rows(path, fmt), report["rows_done"], None)
+
+        for chunk in _chunks(rows, self.chunk_size):
+            first_row = report["rows_done"] + 1
+            records = await asyncio.gather(*(self._enrich(row) for row in chunk))
+
+            valid: dict[str, list[dict[str, Any]]] = {}
+            for row_number, record in enumerate(records, start=first_row):
+                category = str(record.pop("Category", None) or self.default_category)
+                item, errors = validate_item(record, today)
+                if errors:
+                    report["invalid"] += 1
+                    _report_error(report, row_number, "; ".join(errors))
+                    continue
+                valid.setdefault(category, []).append(item)
+
+            documents: dict[str, list[dict[str, Any]]] = {}
+            for category, items in valid.items():
+                upcs = await asyncio.to_thread(self._existing_upcs, category, [item["UPC"] for item in items])
+                for item in items:
+                    if item["UPC"] in upcs:
+                        report["duplicates"] += 1
+                        continue
+                    upcs.add(item["UPC"])
+                    documents.setdefault(category, []).append(item)
+
+            for category, items in documents.items():
+                result = await asyncio.to_thread(
+                    self.tools.bulk_add_documents, category, items, tool_context=None, user_id=self.user_id)
+                if "error" in result:
+                    report["failed"] += len(items)
+                    _report_error(report, first_row, result["error"])
+                    continue
+                report["imported"] += result["succeeded"]
+                report["failed"] += result["failed"]
+
+            report["rows_done"] += len(chunk)
+            _save_checkpoint(checkpoint_path, report)
+            print(f"Processed {report['rows_done']} rows ({report['imported']} imported).", flush=True)
+
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        return report
+
+    def _existing_upcs(self, category: str, upcs: list[str]) -> set[str]:
+        """Returns which of the given UPCs are already stored in a category."""
+        upcs = sorted(set(upcs))
+        existing: set[str] = set()
+        for start in range(0, len(upcs), _MAX_IN_VALUES):
+            condition = ("UPC", "in", upcs[start:start + _MAX_IN_VALUES])
+            docs = self.tools.storage.query(self.user_id, category, condition, ["UPC"])
+            existing.update(str(doc.to_dict()["UPC"]) for doc in docs)
+        return existing
+
+    async def _enrich(self, row: dict[str, Any]) -> dict[str, Any]:
+        """Fills in a missing UPC/URL and price using the agents, if enabled."""
+        async with self.semaphore:
+            return await enrich_record(canonicalize_fields(row), self.identifier, self.price_fetcher)
+
+
+async def export_inventory(
+    storage: InventoryStorage, user_id: str, path: str, fmt: str
+) -> dict[str, Any]:
+    """
+    Streams every item of a user's inventory into a CSV or JSON Lines file, one page of
+    `MAX_PAGE_SIZE` items at a time.
+
+    Both formats hold the schema fields plus `Category`, which is what `import` accepts, so
+    an exported file can be imported again. Fields outside the schema are left out, and so
+    is the `PriceRollup`, which is rebuilt from the prices on import. `PriceHistory` holds
+    each item's latest prices only, like in the database, and is JSON-encoded in CSV files.
+    """
+    exported = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = None
+        if fmt == "csv":
+            writer = csv.DictWriter(f, fieldnames=["Category", *FIELDS])
+            writer.writeheader()
+        for category in await asyncio.to_thread(storage.categories, user_id):
+            cursor = None
+            while True:
+                docs = await asyncio.to_thread(
+                    storage.query, user_id, category, fields=FIELDS, cursor=cursor, limit=MAX_PAGE_SIZE)
+                for doc in docs:
+                    data = doc.to_dict()
+                    item = {"Category": category, **{field: data[field] for field in FIELDS if field in data}}
+                    if writer is not None:
+                        if "PriceHistory" in item:
+                            item["PriceHistory"] = json.dumps(item["PriceHistory"], default=str)
+                        writer.writerow(item)
+                    else:
+                        f.write(json.dumps(item, default=str) + "\n")
+                    exported += 1
+                if len(docs) < MAX_PAGE_SIZE:
+                    break
+                cursor = docs[-1]
+    return {"output": os.path.abspath(path), "exported": exported}
+
+
+def _report_error(report: dict[str, Any], row_number: int, message: str) -> None:
+    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+        report["errors"].append({"row": row_number, "error": message})
+
+
+def _load_checkpoint(checkpoint_path: Optional[str], input_path: str) -> Optional[dict[str, Any]]:
+    if not checkpoint_path or not os.path.exists(checkpoint_path):
+        return None
+    with open(checkpoint_path, encoding="utf-8") as f:
+        report = json.load(f)
+    if report.get("input") != os.path.abspath(input_path):
+        raise ValueError(f"Checkpoint '{checkpoint_path}' belongs to '{report.get('input')}'.")
+    return report
+
+
+def _save_checkpoint(checkpoint_path: Optional[str], report: dict[str, Any]) -> None:
+    if not checkpoint_path:
+        return
+    # Write then rename, so an interruption never leaves a truncated checkpoint.
+    with open(checkpoint_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(report, f)
+    os.replace(checkpoint_path + ".tmp", checkpoint_path)
+
+
+def _tools() -> InventoryTools:
+    """Returns the tools on the storage set by `STORAGE_BACKEND`."""
+    if config.STORAGE_BACKEND == "sqlite":
+        from .tools.sqlite_tools import SqliteTools
+
+        return SqliteTools(config.SQLITE_PATH)
+    from .tools.firestore_tools import FirestoreTools
+
+    return FirestoreTools(project_id=config.PROJECT_ID, database=config.FIRESTORE_DATABASE)
+
+
+async def _main(args: argparse.Namespace) -> dict[str, Any]:
+    tools = _tools()
+    fmt = _detect_format(args.path, args.format)
+    if args.command == "export":
+        return await export_inventory(tools.storage, args.user_id, args.path, fmt)
+
+    identifier = price_fetcher = None
+    if args.identify:
+        from .identifier_agent import root_agent as identifier_agent
+        identifier = AgentIdentifier(identifier_agent)
+    if args.value:
+        from .value_agent.agent import market_prices, root_agent as value_agent
+        price_fetcher = AgentPriceFetcher(value_agent, price_cache=market_prices)
+
+    importer = InventoryImporter(
+        tools,
+        user_id=args.user_id,
+        default_category=args.category,
+        identifier=identifier,
+        price_fetcher=price_fetcher,
+        concurrency=args.concurrency,
+    )
+    checkpoint = args.checkpoint or f"{args.path}.checkpoint.json"
+    return await importer.run(args.path, fmt, checkpoint_path=checkpoint)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import or export a user's inventory.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Import items from a CSV or JSON Lines file.")
+    import_parser.add_argument("path", help="The CSV or JSON Lines file to import.")
+    import_parser.add_argument("--category", default="dvd",
+                               help="Category for rows without a 'Category' column.")
+    import_parser.add_argument("--identify", action="store_true",
+                               help="Identify rows without a UPC using the identifier agent.")
+    import_parser.add_argument("--value", action="store_true",
+                               help="Value rows without a PriceHistory using the value agent.")
+    import_parser.add_argument("--concurrency", type=int, default=config.VALUATION_MAX_WORKERS,
+                               help="Maximum concurrent identification/valuation calls.")
+    import_parser.add_argument("--checkpoint",
+                               help="Checkpoint file used to resume (default: <path>.checkpoint.json).")
+
+    export_parser = subparsers.add_parser("export", help="Export all items to a CSV or JSON Lines file.")
+    export_parser.add_argument("path", help="The CSV or JSON Lines file to write.")
+
+    for subparser in (import_parser, export_parser):
+        subparser.add_argument("--user-id", required=True, help="The ID of the user.")
+        subparser.add_argument("--format", choices=("csv", "jsonl"),
+                               help="File format (default: inferred from the file extension).")
+
+    print(json.dumps(asyncio.run(_main(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
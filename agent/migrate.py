@@ -0,0 +1,190 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+One-off migrations of the inventory documents written before a storage change.
+
+Every migration is idempotent: documents that are already up to date are not written,
+so a migration can be re-run after an interruption.
+
+Usage:
+    python -m agent.migrate search-keys
+    python -m agent.migrate search-keys --user-id 42
+    python -m agent.migrate price-history
+    python -m agent.migrate quantities
+"""
+
+import argparse
+import asyncio
+import json
+from typing import Any, Optional
+
+from google.cloud import firestore
+
+from . import config
+from .tools.clients import get_async_firestore_client
+from .tools.inventory_tools import MAX_BATCH_SIZE
+from .tools.price_history import (
+    HISTORY_COLLECTION,
+    RECENT_PRICES,
+    ROLLUP_FIELD,
+    entry_id,
+    needs_compaction,
+    price_entries,
+    roll_up_prices,
+)
+from .tools.pricing import item_quantity
+from .tools.title_search import SEARCH_KEYS_FIELD, title_keys
+
+
+async def _user_collections(db: firestore.AsyncClient, user_ids: Optional[list[str]]):
+    """Yields every inventory category of the given users, or of all users if omitted."""
+    if user_ids is None:
+        user_ids = [doc_ref.id async for doc_ref in db.collection("users").list_documents()]
+    for user_id in user_ids:
+        async for collection in db.collection("users").document(user_id).collections():
+            yield collection
+
+
+async def migrate_search_keys(db: firestore.AsyncClient, user_ids: Optional[list[str]] = None) -> dict[str, Any]:
+    """Writes the `TitleSearchKeys` used by fuzzy title search for items that lack or have outdated keys."""
+    report = {"scanned": 0, "updated": 0}
+    async for collection in _user_collections(db, user_ids):
+        batch, pending = db.batch(), 0
+        async for doc in collection.select(["Title", SEARCH_KEYS_FIELD]).stream():
+            report["scanned"] += 1
+            data = doc.to_dict()
+            if not isinstance(data.get("Title"), str):
+                continue
+            keys = title_keys(data["Title"])
+            if data.get(SEARCH_KEYS_FIELD) == keys:
+                continue
+            batch.update(doc.reference, {SEARCH_KEYS_FIELD: keys})
+            pending += 1
+            if pending == MAX_BATCH_SIZE:
+                await batch.commit()
+                report["updated"] += pending
+                batch, pending = db.batch(), 0
+        if pending:
+            await batch.commit()
+            report["updated"] += pending
+    return report
+
+
+async def migrate_price_history(db: firestore.AsyncClient, user_ids: Optional[list[str]] = None) -> dict[str, Any]:
+    """
+    Moves each item's full `PriceHistory` into its `price_history` subcollection, keeping the
+    latest entries and a `PriceRollup` of all of them on the item.
+
+    The raw entries are written before the item is trimmed, and their IDs are derived from
+    their content, so an interrupted run loses nothing and a re-run writes the same entries.
+    The item is trimmed in a transaction that reads it again, so prices written to it in
+    the meantime are kept too.
+    """
+    report = {"scanned": 0, "updated": 0, "entries": 0}
+    async for collection in _user_collections(db, user_ids):
+        async for doc in collection.select(["PriceHistory", ROLLUP_FIELD]).stream():
+            report["scanned"] += 1
+            item = doc.to_dict()
+            if not needs_compaction(item):
+                continue
+            history = price_entries(item.get("PriceHistory"))
+            for start in range(0, len(history), MAX_BATCH_SIZE):
+                batch = db.batch()
+                for entry in history[start:start + MAX_BATCH_SIZE]:
+                    batch.set(doc.reference.collection(HISTORY_COLLECTION).document(entry_id(entry)), entry)
+                await batch.commit()
+            entries = await _compact_price_history(
+                db.transaction(), doc.reference, {entry_id(entry) for entry in history})
+            if entries is not None:
+                report["updated"] += 1
+                report["entries"] += entries
+    return report
+
+
+@firestore.async_transactional
+async def _compact_price_history(
+    transaction: firestore.AsyncTransaction, doc_ref: Any, copied: set[str]
+) -> Optional[int]:
+    """
+    Trims an item's `PriceHistory` into its `PriceRollup` as the item is at commit time, and
+    writes the entries added since the `copied` ones to its raw history in the same transaction.
+
+    Returns:
+        The number of entries in the item's history, or None if it no longer needs compaction.
+    """
+    snapshot = await doc_ref.get(field_paths=["PriceHistory", ROLLUP_FIELD], transaction=transaction)
+    if not snapshot.exists or not needs_compaction(snapshot.to_dict()):
+        return None
+    history = price_entries(snapshot.to_dict().get("PriceHistory"))
+    for entry in history:
+        if entry_id(entry) not in copied:
+            transaction.set(doc_ref.collection(HISTORY_COLLECTION).document(entry_id(entry)), entry)
+    transaction.update(doc_ref, {
+        "PriceHistory": history[-RECENT_PRICES:],
+        ROLLUP_FIELD: roll_up_prices(None, history),
+    })
+    return len(history)
+
+
+async def migrate_quantities(db: firestore.AsyncClient, user_ids: Optional[list[str]] = None) -> dict[str, Any]:
+    """
+    Stores every item's `Quantity` as the whole number the portfolio totals count it as,
+    so that server-side sums agree with them: missing and malformed values become 1.
+    """
+    report = {"scanned": 0, "updated": 0}
+    async for collection in _user_collections(db, user_ids):
+        batch, pending = db.batch(), 0
+        async for doc in collection.select(["Quantity"]).stream():
+            report["scanned"] += 1
+            data = doc.to_dict()
+            quantity = item_quantity(data)
+            stored = data.get("Quantity")
+            if isinstance(stored, int) and not isinstance(stored, bool) and stored == quantity:
+                continue
+            batch.update(doc.reference, {"Quantity": quantity})
+            pending += 1
+            if pending == MAX_BATCH_SIZE:
+                await batch.commit()
+                report["updated"] += pending
+                batch, pending = db.batch(), 0
+        if pending:
+            await batch.commit()
+            report["updated"] += pending
+    return report
+
+
+MIGRATIONS = {
+    "search-keys": migrate_search_keys,
+    "price-history": migrate_price_history,
+    "quantities": migrate_quantities,
+}
+
+
+async def _main(args: argparse.Namespace) -> dict[str, Any]:
+    db = get_async_firestore_client(config.PROJECT_ID, config.FIRESTORE_DATABASE)
+    return await MIGRATIONS[args.migration](db, args.user_id)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Migrate inventory documents to the current storage format.")
+    parser.add_argument("migration", choices=sorted(MIGRATIONS), help="The migration to run.")
+    parser.add_argument("--user-id", action="append",
+                        help="Only migrate this user's inventory. May be repeated (default: all users).")
+
+    print(json.dumps(asyncio.run(_main(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
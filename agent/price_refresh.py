@@ -0,0 +1,284 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Background worker that refreshes stale prices outside of chat turns.
+
+Each pass scans the inventories for items whose latest `PriceHistory` entry is older
+than `PRICE_MAX_AGE_HOURS` and queues them, most stale and most valuable first. Items
+are valued in chunks with bounded concurrency and a global rate limit on agent runs,
+and the new prices are written with `write_prices`: the item's compact price fields
+plus an entry in its raw price history, appended to the item as it is at write time so
+concurrent chat writes are not overwritten. Progress is checkpointed after every chunk
+so an interrupted pass can be resumed.
+
+The worker runs on the storage backend set by `STORAGE_BACKEND`.
+
+Usage:
+    python -m agent.price_refresh
+    python -m agent.price_refresh --user-id 42 --rate-per-minute 10
+    python -m agent.price_refresh --interval-minutes 60
+"""
+
+import argparse
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import math
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from . import config
+from .tools.agent_tools import AgentPriceFetcher
+from .tools.inventory_tools import write_prices
+from .tools.price_history import ROLLUP_FIELD
+from .tools.pricing import item_quantity, latest_price, latest_price_entry, parse_date
+from .tools.storage import InventoryStorage
+
+# Only the fields needed to value an item are read during the scan.
+_SCAN_FIELDS = ["Title", "UPC", "Format", "Condition", "Quantity", "PriceHistory", ROLLUP_FIELD]
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_priority(item: dict[str, Any], max_age: timedelta, now: datetime) -> Optional[float]:
+    """
+    Returns the item's place in the refresh queue (lower goes first), or None if its price is fresh.
+
+    Items that were never priced go first. Other items are ordered by how many `max_age`
+    windows their price is overdue, weighted by the log of their total value.
+    """
+    entry = latest_price_entry(item)
+    checked = parse_date(entry.get("date_checked")) if entry else None
+    price = latest_price(item)
+    if checked is None or price is None:
+        return -math.inf
+    age = now - checked
+    if age <= max_age:
+        return None
+    overdue = age / max_age
+    return -overdue * (1.0 + math.log1p(price * item_quantity(item)))
+
+
+class PriceRefresher:
+    """Refreshes the stale prices of one or more users' inventories."""
+
+    def __init__(
+        self,
+        storage: InventoryStorage,
+        price_fetcher: AgentPriceFetcher,
+        max_age: timedelta = timedelta(days=1),
+        concurrency: int = 8,
+        chunk_size: int = 100,
+    ):
+        """
+        Initializes the refresher.
+
+        Args:
+            storage: The database holding the inventories.
+            price_fetcher: Looks up the current market value of an item. Give it a rate limiter
+                to cap the number of search and model calls.
+            max_age: How old a price may be before it is refreshed.
+            concurrency: The maximum number of concurrent price lookups.
+            chunk_size: The number of items valued and written at a time.
+        """
+        self.storage = storage
+        self.price_fetcher = price_fetcher
+        self.max_age = max_age
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.chunk_size = chunk_size
+
+    async def run(
+        self, user_ids: Optional[list[str]] = None, checkpoint_path: Optional[str] = None
+    ) -> dict[str, Any]:
+        """
+        Runs one refresh pass, resuming from `checkpoint_path` if it records earlier progress.
+
+        Items refreshed before an interruption are fresh when the pass is resumed, so only the
+        items that could not be priced need to be remembered in the checkpoint.
+
+        Args:
+            user_ids: The users to refresh; all users if omitted.
+            checkpoint_path: File used to resume an interrupted pass. Removed once the pass completes.
+
+        Returns:
+            Counts of queued, refreshed and failed items, plus the first items that failed.
+        """
+        report = _load_checkpoint(checkpoint_path) or {
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "refreshed": 0,
+            "failed": 0,
+            "failed_paths": [],
+        }
+        now = datetime.now(timezone.utc)
+        queue = await asyncio.to_thread(self._scan, user_ids, set(report["failed_paths"]), now)
+        report["queued"] = len(queue)
+        print(f"Queued {len(queue)} items with stale prices.", flush=True)
+
+        while queue:
+            chunk = [heapq.heappop(queue) for _ in range(min(self.chunk_size, len(queue)))]
+            values = await asyncio.gather(*(self._fetch(item) for _, _, _, item in chunk))
+
+            prices: dict[str, float] = {}
+            failed: list[str] = []
+            for (_, _, path, _), value in zip(chunk, values):
+                if value is None:
+                    failed.append(path)
+                else:
+                    prices[path] = value
+            written, unwritten = await self._write_prices(prices)
+            report["refreshed"] += written
+            report["failed"] += len(failed) + len(unwritten)
+            report["failed_paths"] += failed + unwritten
+
+            _save_checkpoint(checkpoint_path, report)
+            print(f"Refreshed {report['refreshed']} prices ({len(queue)} left).", flush=True)
+
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        report["failed_paths"] = report["failed_paths"][:20]
+        return report
+
+    def _scan(
+        self, user_ids: Optional[list[str]], skip: set[str], now: datetime
+    ) -> list[tuple[float, int, str, dict[str, Any]]]:
+        """Builds a heap of (priority, tiebreak, document path, item) for every stale item."""
+        queue: list[tuple[float, int, str, dict[str, Any]]] = []
+        counter = itertools.count()
+        for user_id in user_ids if user_ids is not None else self.storage.users():
+            for category_id in self.storage.categories(user_id):
+                for doc in self.storage.query(user_id, category_id, fields=_SCAN_FIELDS):
+                    path = f"users/{user_id}/{category_id}/{doc.id}"
+                    item = doc.to_dict()
+                    priority = refresh_priority(item, self.max_age, now)
+                    if priority is not None and path not in skip:
+                        queue.append((priority, next(counter), path, item))
+        heapq.heapify(queue)
+        return queue
+
+    async def _fetch(self, item: dict[str, Any]) -> Optional[float]:
+        async with self.semaphore:
+            try:
+                return await self.price_fetcher.fetch_async(item)
+            except Exception as e:
+                # A failed item is recorded and retried on the next pass.
+                logger.warning("Could not value '%s': %s", item.get("Title"), e)
+                return None
+
+    async def _write_prices(self, prices: dict[str, float]) -> tuple[int, list[str]]:
+        """
+        Appends the new prices to each item's compact price fields and raw history, with the
+        resulting change to its owner's portfolio summary, writing each user's items concurrently.
+
+        Args:
+            prices: The new prices, keyed by document path.
+
+        Returns:
+            The number of items written, and the paths of the items whose write failed. Items
+            deleted since the scan are in neither.
+        """
+        now = datetime.now(timezone.utc)
+        by_user: dict[str, dict[tuple[str, str], float]] = {}
+        for path, value in prices.items():
+            _, user_id, category_id, document_id = path.split("/")
+            by_user.setdefault(user_id, {})[category_id, document_id] = value
+
+        results = await asyncio.gather(
+            *(asyncio.to_thread(write_prices, self.storage, user_id, user_prices, now)
+              for user_id, user_prices in by_user.items()),
+            return_exceptions=True,
+        )
+        written, failed = 0, []
+        for (user_id, user_prices), result in zip(by_user.items(), results):
+            if isinstance(result, Exception):
+                logger.warning("Could not write %d prices of user '%s': %s", len(user_prices), user_id, result)
+                unwritten = list(user_prices)
+            else:
+                written += len(result[0])
+                unwritten = result[1]
+            failed += [f"users/{user_id}/{category_id}/{document_id}" for category_id, document_id in unwritten]
+        return written, failed
+
+
+def _load_checkpoint(checkpoint_path: Optional[str]) -> Optional[dict[str, Any]]:
+    if not checkpoint_path or not os.path.exists(checkpoint_path):
+        return None
+    with open(checkpoint_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_checkpoint(checkpoint_path: Optional[str], report: dict[str, Any]) -> None:
+    if not checkpoint_path:
+        return
+    # Write then rename, so an interruption never leaves a truncated checkpoint.
+    with open(checkpoint_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(report, f)
+    os.replace(checkpoint_path + ".tmp", checkpoint_path)
+
+
+def _storage() -> InventoryStorage:
+    """Returns the storage set by `STORAGE_BACKEND`."""
+    if config.STORAGE_BACKEND == "sqlite":
+        from .tools.sqlite_tools import SqliteStorage
+
+        return SqliteStorage(config.SQLITE_PATH)
+    from .tools.clients import lazy_firestore_client
+    from .tools.firestore_tools import FirestoreStorage
+
+    return FirestoreStorage(lazy_firestore_client(config.PROJECT_ID, config.FIRESTORE_DATABASE))
+
+
+async def _main(args: argparse.Namespace) -> dict[str, Any]:
+    from .tools.rate_limit import RateLimiter
+    from .value_agent.agent import market_prices, root_agent as value_agent
+
+    refresher = PriceRefresher(
+        _storage(),
+        AgentPriceFetcher(
+            value_agent,
+            price_cache=market_prices,
+            rate_limiter=RateLimiter(args.rate_per_minute, burst=args.concurrency),
+        ),
+        max_age=timedelta(hours=config.PRICE_MAX_AGE_HOURS),
+        concurrency=args.concurrency,
+    )
+    while True:
+        report = await refresher.run(args.user_id, checkpoint_path=args.checkpoint)
+        if not args.interval_minutes:
+            return report
+        print(json.dumps(report, indent=2), flush=True)
+        await asyncio.sleep(args.interval_minutes * 60)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Refresh stale inventory prices in the background.")
+    parser.add_argument("--user-id", action="append",
+                        help="Only refresh this user's inventory. May be repeated (default: all users).")
+    parser.add_argument("--concurrency", type=int, default=config.VALUATION_MAX_WORKERS,
+                        help="Maximum concurrent price lookups.")
+    parser.add_argument("--rate-per-minute", type=float, default=config.PRICE_REFRESH_RATE_PER_MINUTE,
+                        help="Maximum value agent runs per minute across all lookups.")
+    parser.add_argument("--interval-minutes", type=float,
+                        help="Keep running, starting a new pass this many minutes after the last one.")
+    parser.add_argument("--checkpoint", default="price_refresh.checkpoint.json",
+                        help="Checkpoint file used to resume an interrupted pass.")
+
+    print(json.dumps(asyncio.run(_main(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Rebuilds the portfolio summaries stored on `users/{user_id}` documents from scratch.
+
+The tools keep each summary up to date with deltas on every write. Run this once after
+deploying the summaries, and again whenever a summary has drifted (e.g. after documents
+were edited directly in the console).
+
+Usage:
+    python -m agent.rebuild_summaries
+    python -m agent.rebuild_summaries --user-id 42 --user-id 43
+"""
+
+import argparse
+import asyncio
+import json
+from typing import Any, Optional
+
+from google.cloud import firestore
+
+from . import config
+from .tools.clients import get_async_firestore_client
+from .tools.portfolio_summary import SUMMARY_FIELD, SUMMARY_INPUT_FIELDS, rebuild_summary
+
+
+async def rebuild_user_summary(db: firestore.AsyncClient, user_id: str) -> int:
+    """Recomputes one user's summary from their inventory and returns the number of items."""
+    user_ref = db.collection("users").document(user_id)
+    inventory: list[tuple[str, dict[str, Any]]] = []
+    async for collection in user_ref.collections():
+        async for doc in collection.select(SUMMARY_INPUT_FIELDS).stream():
+            inventory.append((collection.id, doc.to_dict()))
+    # Merging only the summary field replaces it as a whole, dropping deleted categories.
+    await user_ref.set(rebuild_summary(inventory), merge=[SUMMARY_FIELD])
+    return len(inventory)
+
+
+async def rebuild_summaries(
+    db: firestore.AsyncClient, user_ids: Optional[list[str]] = None, concurrency: int = 8
+) -> dict[str, Any]:
+    """
+    Rebuilds the summaries of the given users, or of all users if omitted.
+
+    Returns:
+        Counts of rebuilt users and items, plus the users that failed.
+    """
+    if user_ids is None:
+        user_ids = [doc_ref.id async for doc_ref in db.collection("users").list_documents()]
+    semaphore = asyncio.Semaphore(concurrency)
+    report: dict[str, Any] = {"users": 0, "items": 0, "failed": {}}
+
+    async def rebuild(user_id: str) -> None:
+        async with semaphore:
+            try:
+                report["items"] += await rebuild_user_summary(db, user_id)
+                report["users"] += 1
+            except Exception as e:
+                report["failed"][user_id] = str(e)
+
+    await asyncio.gather(*(rebuild(user_id) for user_id in user_ids))
+    return report
+
+
+async def _main(args: argparse.Namespace) -> dict[str, Any]:
+    db = get_async_firestore_client(config.PROJECT_ID, config.FIRESTORE_DATABASE)
+    return await rebuild_summaries(db, args.user_id, args.concurrency)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild the per-user portfolio summaries.")
+    parser.add_argument("--user-id", action="append",
+                        help="Only rebuild this user's summary. May be repeated (default: all users).")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Maximum number of users rebuilt at the same time.")
+
+    print(json.dumps(asyncio.run(_main(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
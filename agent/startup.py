@@ -0,0 +1,143 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Deferred start-up of the agent process.
+
+Importing the agents creates no clients. Vertex AI is initialized on the first turn,
+and the Firestore and model clients on their first use. `warm_up` does all of this
+ahead of time, and with WARM_UP=true it runs in a background thread at import.
+
+Measure the cold start (import, then each warm-up step) with:
+    python -m agent.startup
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import threading
+import time
+from typing import Any, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.google_llm import Gemini
+from google.genai import types
+
+from . import config
+from .tools.clients import warm_up_clients
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_vertexai_ready = False
+
+
+def init_vertexai() -> None:
+    """
+    Initializes the Vertex AI SDK once per process; later calls return immediately.
+
+    Raises:
+        ValueError: If PROJECT_ID or GOOGLE_CLOUD_LOCATION is not set, instead of falling
+            back to the credentials' default project and location.
+    """
+    global _vertexai_ready
+    if _vertexai_ready:
+        return
+    missing = [
+        name for name, value in (("PROJECT_ID", config.PROJECT_ID), ("GOOGLE_CLOUD_LOCATION", config.LOCATION))
+        if not value
+    ]
+    if missing:
+        raise ValueError(f"Vertex AI is not configured. Set {' and '.join(missing)} in the environment.")
+    with _lock:
+        if not _vertexai_ready:
+            import vertexai
+
+            vertexai.init(project=config.PROJECT_ID, location=config.LOCATION)
+            _vertexai_ready = True
+
+
+async def init_vertexai_callback(callback_context: CallbackContext) -> Optional[types.Content]:
+    """Initializes the Vertex AI SDK before the first turn, off the event loop."""
+    if not _vertexai_ready:
+        await asyncio.to_thread(init_vertexai)
+    return None
+
+
+def warm_up(root_agent: Any) -> dict[str, float]:
+    """
+    Creates everything the first request would otherwise create.
+
+    Args:
+        root_agent: The agent whose models, including those of its sub-agents and agent
+            tools, get their API clients created.
+
+    Returns:
+        The duration of each step in milliseconds.
+    """
+    timings = {}
+    for step, run in (
+        ("vertexai_ms", init_vertexai),
+        ("firestore_clients_ms", warm_up_clients),
+        ("model_clients_ms", lambda: _warm_up_models(root_agent, set())),
+    ):
+        started = time.perf_counter()
+        run()
+        timings[step] = round((time.perf_counter() - started) * 1000, 1)
+    return timings
+
+
+def start_warm_up(root_agent: Any) -> threading.Thread:
+    """Runs `warm_up` in a daemon thread, so the process can start serving meanwhile."""
+    def run() -> None:
+        try:
+            timings = warm_up(root_agent)
+            logger.info("Warm-up finished: %s", json.dumps(timings))
+        except Exception as e:
+            # Whatever failed is created again on first use, which reports the error.
+            logger.warning("Warm-up failed: %s", e)
+
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def _warm_up_models(agent: Any, seen: set[int]) -> None:
+    if id(agent) in seen:
+        return
+    seen.add(id(agent))
+    model = getattr(agent, "model", None)
+    if isinstance(model, Gemini):
+        # `Gemini` creates its client, discovering credentials, on first access.
+        model.api_client
+    for sub_agent in getattr(agent, "sub_agents", None) or []:
+        _warm_up_models(sub_agent, seen)
+    for tool in getattr(agent, "tools", None) or []:
+        if getattr(tool, "agent", None) is not None:
+            _warm_up_models(tool.agent, seen)
+
+
+def main() -> None:
+    argparse.ArgumentParser(description="Measure the cold start of the agent package.").parse_args()
+    started = time.perf_counter()
+    module = importlib.import_module(".agent", __package__)
+    timings = {"import_ms": round((time.perf_counter() - started) * 1000, 1)}
+    timings.update(warm_up(module.root_agent))
+    print(json.dumps(timings, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Cross-user inventory analytics for admins.
+
+Questions about all users ("which UPCs are most owned", "what is everything worth") are
+answered with one collection-group query per inventory category, instead of listing and
+reading every user's inventory. Each query reads `PAGE_SIZE` documents at a time, only
+the fields the totals need, and every page is folded into an `InventoryReducer` before the
+next is read. Memory grows with the number of distinct products and their owners, not
+with the number of items read.
+"""
+
+import heapq
+from typing import Any, AsyncIterator, Callable, Optional
+
+from google.adk.tools import ToolContext
+from google.cloud import firestore
+
+from .clients import lazy_async_firestore_client
+from .inventory_tools import _RANGE_OPERATORS
+from .inventory_schema import normalize_upc
+from .portfolio_summary import SUMMARY_FIELD
+from .pricing import item_quantity, latest_price
+
+# Documents read per query page.
+PAGE_SIZE = 500
+# Scans stop after this many items and report a partial result.
+MAX_DOCUMENTS = 200_000
+MAX_TOP_N = 100
+
+RANK_BY = ("owners", "quantity", "items", "value")
+
+# The fields read from every item; the grouping field is added to them.
+_ITEM_FIELDS = ("Title", "Quantity", "PriceHistory")
+
+
+def _empty_totals() -> dict[str, Any]:
+    return {"items": 0, "quantity": 0, "value": 0.0, "unpriced": 0}
+
+
+class InventoryReducer:
+    """Folds items of any number of users into totals per category and per product."""
+
+    def __init__(self, group_by: str = "UPC"):
+        """
+        Initializes the reducer.
+
+        Args:
+            group_by: The item field products are grouped by. UPCs are normalized to their digits.
+        """
+        self.group_by = group_by
+        self.documents = 0
+        self.totals = _empty_totals()
+        self.users: set[str] = set()
+        self.categories: dict[str, dict[str, Any]] = {}
+        self._category_users: dict[str, set[str]] = {}
+        self._groups: dict[str, dict[str, Any]] = {}
+
+    def add(self, user_id: str, category_id: str, item: dict[str, Any]) -> None:
+        """Adds one item owned by `user_id` in `category_id`."""
+        self.documents += 1
+        quantity = item_quantity(item)
+        price = latest_price(item)
+        value = price * quantity if price is not None else 0.0
+        self.users.add(user_id)
+        self._category_users.setdefault(category_id, set()).add(user_id)
+        for totals in (self.totals, self.categories.setdefault(category_id, _empty_totals())):
+            totals["items"] += 1
+            totals["quantity"] += quantity
+            totals["value"] += value
+            totals["unpriced"] += 1 if price is None else 0
+
+        key = self._group_key(item.get(self.group_by))
+        if key is None:
+            return
+        # With group_by='Title', the key doubles as the title.
+        group = self._groups.setdefault(key, {
+            "Title": None, self.group_by: key, "owners": set(), "items": 0, "quantity": 0, "value": 0.0,
+        })
+        group["Title"] = group["Title"] or item.get("Title")
+        group["owners"].add(user_id)
+        group["items"] += 1
+        group["quantity"] += quantity
+        group["value"] += value
+
+    def result(self, top_n: int = 10, rank_by: str = "owners") -> dict[str, Any]:
+        """
+        Returns the totals and the top `top_n` products.
+
+        Args:
+            top_n: The number of products to return.
+            rank_by: 'owners' (number of users), 'quantity', 'items' or 'value'. Ties go
+                to the larger quantity.
+        """
+        def rank(group: dict[str, Any]) -> tuple[float, int]:
+            score = len(group["owners"]) if rank_by == "owners" else group[rank_by]
+            return score, group["quantity"]
+
+        top = heapq.nlargest(top_n, self._groups.values(), key=rank)
+        return {
+            "currency": "USD",
+            "totals": {**_rounded(self.totals), "users": len(self.users), "products": len(self._groups)},
+            "categories": {
+                category_id: {**_rounded(totals), "users": len(self._category_users[category_id])}
+                for category_id, totals in sorted(self.categories.items())
+            },
+            "top": [
+                {**group, "owners": len(group["owners"]), "value": round(group["value"], 2)}
+                for group in top
+            ],
+            "documents_read": self.documents,
+        }
+
+    def _group_key(self, value: Any) -> Optional[str]:
+        if self.group_by == "UPC":
+            return normalize_upc(value)
+        if value is None or isinstance(value, (dict, list)) or not str(value).strip():
+            return None
+        return str(value).strip()
+
+
+class AdminTools:
+    """Tools that answer questions about the inventories of all users, for admins."""
+
+    def __init__(
+        self,
+        project_id: str,
+        database: str,
+        page_size: int = PAGE_SIZE,
+        max_documents: int = MAX_DOCUMENTS,
+    ):
+        """
+        Initializes the tools with the process-wide shared `AsyncClient`, created on first use.
+
+        Args:
+            project_id: The Google Cloud project ID.
+            database: The name of the Firestore database.
+            page_size: The number of documents read per query page.
+            max_documents: The most items one call reads before it returns a partial result.
+        """
+        self.db = lazy_async_firestore_client(project_id, database)
+        self.page_size = page_size
+        self.max_documents = max_documents
+
+    async def aggregate_all_users(
+        self,
+        tool_context: ToolContext,
+        collection_ids: Optional[list[str]] = None,
+        field: Optional[str] = None,
+        operator: str = "==",
+        value: Any = None,
+        group_by: str = "UPC",
+        rank_by: str = "owners",
+        top_n: int = 10,
+    ) -> dict[str, Any]:
+        """
+        Totals the inventories of all users and ranks the products they own. Admins only.
+        Use this tool when an admin asks about all users, e.g. "which UPCs are most owned" or
+        "what is the total value across all users", instead of reading each user's inventory.
+        Never use it for a user who has not identified as an admin.
+
+        Args:
+            collection_ids: Only include these inventory categories (e.g., ['dvd', 'bluray']). All if omitted.
+            field: An optional document field to filter on (e.g., 'Format').
+            operator: The comparison operator for `field` (e.g., '==', '>=').
+            value: The value to compare `field` against.
+            group_by: The field products are grouped by (e.g., 'UPC', 'Title', 'Format').
+            rank_by: How products are ranked: 'owners' (number of users), 'quantity', 'items' or 'value'.
+            top_n: The number of top products to return (at most 100).
+            tool_context: The context of the tool invocation.
+        """
+        try:
+            if rank_by not in RANK_BY:
+                return {"error": f"rank_by must be one of {', '.join(RANK_BY)}."}
+            categories = collection_ids or await self._categories()
+            reducer = InventoryReducer(group_by)
+            order_field = field if field and operator in _RANGE_OPERATORS else None
+            fields = list(dict.fromkeys([*_ITEM_FIELDS, group_by, *([order_field] if order_field else [])]))
+
+            truncated = False
+            for category_id in categories:
+                query = self.db.collection_group(category_id)
+                if field:
+                    query = query.where(field, operator, value)
+                async for doc in _stream_pages(query.select(fields), self.page_size, order_field):
+                    user_id = _owner(doc.reference)
+                    if user_id is None:
+                        continue
+                    if reducer.documents >= self.max_documents:
+                        truncated = True
+                        break
+                    reducer.add(user_id, category_id, doc.to_dict())
+                if truncated:
+                    break
+
+            result = reducer.result(min(max(int(top_n), 1), MAX_TOP_N), rank_by)
+            result["truncated"] = truncated
+            return result
+        except Exception as e:
+            return {"error": f"An unexpected error occurred while aggregating all inventories: {e}"}
+
+    async def _categories(self) -> list[str]:
+        """
+        Returns every category named in a user's portfolio summary.
+
+        Writes through the tools add their category to the summary, so this finds every
+        category once `agent.rebuild_summaries` has run, without listing each user's collections.
+        """
+        categories: set[str] = set()
+        query = self.db.collection("users").select([f"{SUMMARY_FIELD}.categories"])
+        async for doc in _stream_pages(query, self.page_size):
+            summary = (doc.to_dict() or {}).get(SUMMARY_FIELD) or {}
+            categories.update(summary.get("categories") or {})
+        return sorted(categories)
+
+    def get_tools(self) -> list[Callable]:
+        """Returns a list of all tool methods."""
+        return [self.aggregate_all_users]
+
+
+async def _stream_pages(query: Any, page_size: int, order_field: Optional[str] = None) -> AsyncIterator[Any]:
+    """
+    Yields the results of a query, reading them one page at a time.
+
+    Each page is a separate, bounded read that starts after the last document of the
+    previous one, so a long scan never holds more than one page.
+    """
+    if order_field:
+        # Firestore requires queries with a range filter to be ordered by the filtered field first.
+        query = query.order_by(order_field)
+    query = query.order_by(firestore.FieldPath.document_id())
+    cursor = None
+    while True:
+        page = query.start_after(cursor) if cursor is not None else query
+        docs = [doc async for doc in page.limit(page_size).stream()]
+        for doc in docs:
+            yield doc
+        if len(docs) < page_size:
+            return
+        cursor = docs[-1]
+
+
+def _owner(doc_ref: Any) -> Optional[str]:
+    """Returns the user who owns an item at `users/{user_id}/{category}/{document_id}`, or None."""
+    user_ref = doc_ref.parent.parent
+    if user_ref is None or user_ref.parent.id != "users" or user_ref.parent.parent is not None:
+        return None
+    return user_ref.id
+
+
+def _rounded(totals: dict[str, Any]) -> dict[str, Any]:
+    return {**totals, "value": round(totals["value"], 2)}
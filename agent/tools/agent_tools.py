@@ -1,13 +1,192 @@
+import asyncio
+import dataclasses
+import inspect
+import logging
+import threading
+from typing import Any, AsyncGenerator, Callable, Optional
+
+from google.adk.agents import BaseAgent
+from google.adk.models.google_llm import Gemini
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.runners import InMemoryRunner
 from google.genai import types
 
+from .catalog import parse_identified
+from .inventory_schema import parse_identification
+from .market_prices import SKIP_PRICE_CACHE, MarketPriceCache
+from .pricing import new_price_entry, parse_price_reply
+from .rate_limit import AdmissionConfig, AdmissionRejected, RateLimiter, admission_controller
+
+logger = logging.getLogger(__name__)
 
-async def auto_save_session_to_memory_callback(callback_context):
-    await callback_context._invocation_context.memory_service.add_session_to_memory(
-        callback_context._invocation_context.session)
-    
-retry_config=types.HttpRetryOptions(
-    attempts=5,  # Maximum retry attempts
-    exp_base=7,  # Delay multiplier
+# Shared by every agent's model. Retries happen in the admission controller (up to 4
+# attempts, full jitter, at most 20 seconds apart), where all sessions see the 429s.
+admission_config = AdmissionConfig(
+    initial_concurrency=8,
+    max_concurrency=64,
+    attempts=4,
     initial_delay=1,
-    http_status_codes=[429, 500, 503, 504], # Retry on these HTTP errors
-)
\ No newline at end of file
+    max_delay=20,
+    failure_threshold=8,
+    open_seconds=30,
+)
+
+
+def model_admission(rate_per_minute: Optional[float] = None) -> AdmissionConfig:
+    """Returns the shared admission settings, limited to `rate_per_minute` calls per model if given."""
+    return dataclasses.replace(admission_config, rate_per_minute=rate_per_minute)
+
+
+class AdmittedGemini(Gemini):
+    """
+    A `Gemini` model whose calls, including their Google Search grounding, go through the
+    process-wide admission controller of the model instead of retrying on their own.
+    """
+
+    admission: AdmissionConfig = admission_config
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        controller = admission_controller(llm_request.model or self.model, self.admission)
+        try:
+            async for response in controller.stream(
+                    lambda: super(AdmittedGemini, self).generate_content_async(llm_request, stream)):
+                yield response
+        except AdmissionRejected as e:
+            yield LlmResponse(error_code="MODEL_OVERLOADED", error_message=str(e))
+
+
+async def run_agent_once(
+    runner: InMemoryRunner,
+    prompt: str,
+    user_id: str = "system",
+    state: Optional[dict[str, Any]] = None,
+) -> str:
+    """Runs an agent on a single prompt in a throwaway session and returns its final text."""
+    session = await runner.session_service.create_session(
+        app_name=runner.app_name, user_id=user_id, state=state)
+    message = types.Content(role="user", parts=[types.Part(text=prompt)])
+    text = ""
+    try:
+        async for event in runner.run_async(
+                user_id=user_id, session_id=session.id, new_message=message):
+            if event.is_final_response() and event.content and event.content.parts:
+                text = "".join(part.text or "" for part in event.content.parts)
+    finally:
+        await runner.session_service.delete_session(
+            app_name=runner.app_name, user_id=user_id, session_id=session.id)
+    return text
+
+
+class AgentPriceFetcher:
+    """Looks up an item's market value by running the value agent outside of a chat turn."""
+
+    def __init__(
+        self,
+        agent: BaseAgent,
+        price_cache: Optional[MarketPriceCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+    ):
+        """
+        Initializes the price fetcher.
+
+        Args:
+            agent: The agent that finds the market value of an item, i.e. `value_agent`.
+            price_cache: Optional cross-user price table. The agent only runs for items
+                whose price is missing or expired there.
+            rate_limiter: Optional limit on agent runs; prices served from `price_cache`
+                do not count against it.
+        """
+        self.runner = InMemoryRunner(agent=agent, app_name=agent.name)
+        self.price_cache = price_cache
+        self.rate_limiter = rate_limiter
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+
+    async def fetch_async(self, item: dict[str, Any]) -> Optional[float]:
+        """Returns the estimated value of the item in USD, or None if none was found."""
+        if self.price_cache is None:
+            return await self._run_agent(item)
+        return await self.price_cache.get_or_fetch(item, lambda: self._run_agent(item))
+
+    async def _run_agent(self, item: dict[str, Any]) -> Optional[float]:
+        prompt = (
+            f"Find the current market value of this item. "
+            f"Title: {item.get('Title')}; UPC: {item.get('UPC')}; "
+            f"Format: {item.get('Format')}; Condition: {item.get('Condition')}. "
+            f"End your reply with the line 'VALUE: $12.99' holding the single estimated value in USD, "
+            f"or 'VALUE: NONE' if you could not find a reliable value."
+        )
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire()
+        # The price table was already consulted, so the agent's own callbacks skip it.
+        state = {SKIP_PRICE_CACHE: True} if self.price_cache is not None else None
+        answer = await run_agent_once(self.runner, prompt, state=state)
+        return parse_price_reply(answer)
+
+    def __call__(self, item: dict[str, Any]) -> Optional[float]:
+        # Called from worker threads, which have no running event loop of their own. All calls
+        # share one loop, so the runner's clients are not rebuilt for a new loop every time.
+        return asyncio.run_coroutine_threadsafe(self.fetch_async(item), self._event_loop()).result()
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        """Returns the fetcher's event loop, started in a daemon thread on first use."""
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name=f"{self.runner.app_name}-prices", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+
+class AgentIdentifier:
+    """Identifies an item by running the identifier agent outside of a chat turn."""
+
+    def __init__(self, agent: BaseAgent):
+        """
+        Initializes the identifier.
+
+        Args:
+            agent: The agent that identifies an item and finds its UPC, i.e. `identifier_agent`.
+        """
+        self.runner = InMemoryRunner(agent=agent, app_name=agent.name)
+
+    async def identify_async(self, query: str) -> dict[str, str]:
+        """Returns the `UPC`, `SourceURL` and possibly `Title` found for the query; missing keys were not found."""
+        prompt = (
+            f"Identify this item and return its UPC and blu-ray.com URL: {query}. "
+            f"If several versions match, return only the most likely one."
+        )
+        answer = await run_agent_once(self.runner, prompt)
+        products = parse_identified(answer)
+        return products[0] if products else parse_identification(answer)
+
+
+async def enrich_record(
+    record: dict[str, Any],
+    identifier: Optional[AgentIdentifier] = None,
+    price_fetcher: Optional[AgentPriceFetcher] = None,
+) -> dict[str, Any]:
+    """Fills in a record's missing UPC/URL and price using the agents that are given."""
+    title = record.get("Title")
+    try:
+        if identifier and title and not record.get("UPC"):
+            query = " ".join(str(record[key]) for key in ("Title", "Format", "Condition") if record.get(key))
+            record.update(await identifier.identify_async(query or str(title)))
+        if price_fetcher and not record.get("PriceHistory") and record.get("UPC"):
+            value = await price_fetcher.fetch_async(record)
+            if value is not None:
+                record["PriceHistory"] = [new_price_entry(value)]
+    except Exception as e:
+        # Enrichment is best effort; validation reports anything still missing.
+        logger.warning("Could not enrich '%s': %s", title, e)
+    return record
+
+
+async def call_tool(method: Callable[..., Any], **kwargs: Any) -> Any:
+    """Calls a sync or async tool method without blocking the event loop."""
+    if inspect.iscoroutinefunction(method):
+        return await method(**kwargs)
+    return await asyncio.to_thread(method, **kwargs)
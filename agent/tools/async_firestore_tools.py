@@ -0,0 +1,75 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+The inventory tools on Firestore for asyncio agents.
+
+`AsyncFirestoreTools` runs each tool of `FirestoreTools` in a worker thread, so tool calls
+never block the event loop and one replica can serve many sessions concurrently. The tools
+are the same `InventoryTools` methods, with the same names, arguments, docstrings and results.
+"""
+
+import asyncio
+import functools
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Optional
+
+from .firestore_tools import FirestoreTools
+from .inventory_cache import InventoryCache
+from .inventory_tools import PriceFetcher
+
+
+class AsyncFirestoreTools:
+    """`FirestoreTools` whose tools are coroutine functions that run in worker threads."""
+
+    def __init__(
+        self,
+        project_id: str,
+        database: str,
+        price_fetcher: Optional[PriceFetcher] = None,
+        max_workers: int = 8,
+        price_max_age: timedelta = timedelta(days=1),
+        cache: Optional[InventoryCache] = None,
+    ):
+        """
+        Initializes the tools with the process-wide shared `Client`, created on first use.
+
+        Args:
+            project_id: The Google Cloud project ID.
+            database: The name of the Firestore database.
+            price_fetcher: Looks up the current market value of an item in USD. Used by
+                `value_portfolio` to refresh stale prices; called from worker threads.
+            max_workers: The maximum number of concurrent price lookups.
+            price_max_age: How old a price may be before it is considered stale.
+            cache: Optional read-through cache for inventory reads. Writes made through
+                these tools invalidate the affected entries.
+        """
+        self.tools = FirestoreTools(project_id, database, price_fetcher, max_workers, price_max_age, cache)
+        self.db = self.tools.db
+        self.storage = self.tools.storage
+        for tool in self.tools.get_tools():
+            setattr(self, tool.__name__, _in_thread(tool))
+
+    def get_tools(self) -> list[Callable]:
+        """Returns a list of all tool methods."""
+        return [getattr(self, tool.__name__) for tool in self.tools.get_tools()]
+
+
+def _in_thread(tool: Callable[..., Any]) -> Callable[..., Awaitable[Any]]:
+    """Wraps a blocking tool in a coroutine function with its signature and docstring, for ADK to register."""
+    @functools.wraps(tool)
+    async def run(*args: Any, **kwargs: Any) -> Any:
+        return await asyncio.to_thread(tool, *args, **kwargs)
+    return run
@@ -0,0 +1,124 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Adds several items in one step: every item is identified and valued concurrently, and
+the results are written with one batched write per category.
+
+Adding ten titles (or a photo of a shelf) then takes about as long as adding the
+slowest of them, instead of ten sequential identify, value and save round trips.
+"""
+
+import asyncio
+from datetime import date
+from typing import Any, Callable, Optional
+
+from google.adk.tools import ToolContext
+
+from .agent_tools import AgentIdentifier, AgentPriceFetcher, call_tool, enrich_record
+from .inventory_schema import canonicalize_fields, validate_item
+from .pricing import latest_price
+
+
+class BatchAdder:
+    """A tool that identifies, values and adds several items at once."""
+
+    def __init__(
+        self,
+        firestore_tools: Any,
+        identifier: Optional[AgentIdentifier] = None,
+        price_fetcher: Optional[AgentPriceFetcher] = None,
+        concurrency: int = 8,
+    ):
+        """
+        Initializes the batch adder.
+
+        Args:
+            firestore_tools: A `FirestoreTools` or `AsyncFirestoreTools` instance that writes the items.
+            identifier: Finds the UPC and blu-ray.com URL of items added without a UPC.
+            price_fetcher: Values items added without a `PriceHistory`.
+            concurrency: The maximum number of items identified and valued at the same time.
+        """
+        self.firestore_tools = firestore_tools
+        self.identifier = identifier
+        self.price_fetcher = price_fetcher
+        self.concurrency = concurrency
+
+    async def batch_add_items(
+        self,
+        items: list[dict[str, Any]],
+        tool_context: ToolContext,
+        collection_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> dict[str, Any]:
+        """
+        Identifies, values and adds several items to the inventory at once.
+        Use this instead of calling the identifier, value and inventory agents item by item
+        whenever the user adds more than one item, e.g. a list of titles or a photo of a shelf.
+
+        Args:
+            items: One object per item with its `Title`, `Format` and `Condition`, plus `Quantity`,
+                `UPC` or `Category` if known.
+            collection_id: The inventory category (e.g., 'dvd', 'bluray') of items without a `Category`.
+            user_id: The ID of the user. If not provided, it will be inferred from the session.
+            tool_context: The context of the tool invocation.
+        """
+        try:
+            user_id = user_id or tool_context.state.get("user_id") or "1"
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def enrich(item: dict[str, Any]) -> dict[str, Any]:
+                async with semaphore:
+                    return await enrich_record(canonicalize_fields(item), self.identifier, self.price_fetcher)
+
+            # Enrichment never raises, so one item that cannot be identified does not fail the others.
+            records = await asyncio.gather(*(enrich(item) for item in items))
+
+            today = date.today().isoformat()
+            results: list[Optional[dict[str, Any]]] = [None] * len(records)
+            documents: dict[str, list[tuple[int, dict[str, Any]]]] = {}
+            for index, record in enumerate(records):
+                category = str(record.pop("Category", None) or collection_id or "")
+                item, errors = validate_item(record, today)
+                if not category:
+                    errors.append("missing Category")
+                if errors:
+                    results[index] = {"Title": record.get("Title"), "status": "error", "error": "; ".join(errors)}
+                else:
+                    documents.setdefault(category, []).append((index, item))
+
+            writes = await asyncio.gather(*(
+                call_tool(self.firestore_tools.bulk_add_documents, collection_id=category,
+                          documents=[item for _, item in entries], tool_context=tool_context, user_id=user_id)
+                for category, entries in documents.items()
+            ))
+            for (category, entries), written in zip(documents.items(), writes):
+                for position, (index, item) in enumerate(entries):
+                    result = (
+                        {"status": "error", "error": written["error"]} if "error" in written
+                        else written["results"][position]
+                    )
+                    results[index] = {
+                        "Title": item["Title"], "UPC": item["UPC"], "category": category,
+                        "value": latest_price(item), **result,
+                    }
+
+            added = sum(1 for result in results if result["status"] == "added")
+            return {"added": added, "failed": len(results) - added, "items": results}
+        except Exception as e:
+            return {"error": f"An unexpected error occurred while adding the items: {e}"}
+
+    def get_tools(self) -> list[Callable]:
+        """Returns a list of all tool methods."""
+        return [self.batch_add_items]
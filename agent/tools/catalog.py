@@ -0,0 +1,266 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Shared product catalog that lets identifier_agent skip repeat lookups."""
+
+import logging
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.cloud import firestore
+from google.genai import types
+
+from .inventory_schema import normalize_upc
+from .pricing import parse_date
+
+logger = logging.getLogger(__name__)
+
+# identifier_agent ends its answer with one such line per identified version.
+_IDENTIFIED = re.compile(r"^\W*IDENTIFIED:\s*(.+?)\s*\|\s*([\d\- ]+?)\s*\|\s*(\S*)\s*$", re.MULTILINE)
+_CATALOG_ANSWER_PREFIX = "Identified from the product catalog:"
+_UPC_IN_QUERY = re.compile(r"(?<!\d)\d{12,13}(?!\d)")
+
+# Spellings of a disc format mapped to one token; also used by the title search keys.
+FORMAT_SYNONYMS = (
+    (re.compile(r"\b(?:4k\s*)?ultra\s*hd\b|\buhd\b|\b4k\b"), " 4k "),
+    (re.compile(r"\bblu\W?ray\b|\bbd\b"), " bluray "),
+    (re.compile(r"\bd\.?v\.?d\b"), " dvd "),
+)
+# Words that describe the request or the copy rather than the product.
+_STOPWORDS = frozenset((
+    "a", "an", "the", "and", "of", "for", "to", "in", "on", "is", "it", "this", "my", "me", "please",
+    "add", "identify", "find", "look", "up", "what", "whats", "upc", "item", "copy",
+    "condition", "new", "used", "sealed", "mint",
+))
+
+
+def normalize_query_key(text: str) -> str:
+    """
+    Normalizes a title/format query so that equivalent phrasings share one key.
+
+    For example "Inception 4K UHD (New)" and "inception ultra hd" both become "4k inception".
+    """
+    text = text.lower()
+    for pattern, replacement in FORMAT_SYNONYMS:
+        text = pattern.sub(replacement, text)
+    tokens = {token for token in re.findall(r"[a-z0-9]+", text) if token not in _STOPWORDS}
+    return " ".join(sorted(tokens))
+
+
+def parse_identified(text: str) -> list[dict[str, str]]:
+    """Parses the `IDENTIFIED: <title> | <UPC> | <URL>` lines of an identifier_agent answer."""
+    products = []
+    for title, upc, url in _IDENTIFIED.findall(text or ""):
+        upc = normalize_upc(upc)
+        if upc:
+            products.append({"Title": title, "UPC": upc, "SourceURL": url})
+    return products
+
+
+class ProductCatalog:
+    """
+    A cross-user catalog of identified products, keyed by UPC, by normalized query and by
+    the perceptual hashes of photos they were identified from.
+
+    Entries live in a top-level Firestore collection, fronted by an in-process LRU. An
+    entry older than `refresh_after` counts as a miss, so the agent re-identifies the
+    product and the entry is rewritten.
+    """
+
+    def __init__(
+        self,
+        db: firestore.AsyncClient,
+        collection: str = "catalog",
+        refresh_after: timedelta = timedelta(days=90),
+        max_entries: int = 10000,
+    ):
+        """
+        Initializes the catalog.
+
+        Args:
+            db: The Firestore client holding the catalog collection.
+            collection: The name of the top-level catalog collection.
+            refresh_after: How long an identification is reused before it is looked up again.
+            max_entries: The maximum number of entries kept in the in-process LRU.
+        """
+        self.db = db
+        self.collection = collection
+        self.refresh_after = refresh_after
+        self.max_entries = max_entries
+        self._memory: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    async def lookup(self, query: str) -> Optional[dict[str, Any]]:
+        """Returns the fresh catalog entry matching a UPC or title/format query, if any."""
+        upc_match = _UPC_IN_QUERY.search(query)
+        if upc_match:
+            memory_key = f"upc:{upc_match.group(0)}"
+        else:
+            memory_key = f"title:{normalize_query_key(query)}"
+            if memory_key == "title:":
+                return None
+
+        product = self._remember(memory_key)
+        if product is None:
+            catalog = self.db.collection(self.collection)
+            if upc_match:
+                doc = await catalog.document(upc_match.group(0)).get()
+                product = doc.to_dict() if doc.exists else None
+            else:
+                query_key = memory_key.removeprefix("title:")
+                query_ref = catalog.where("QueryKeys", "array_contains", query_key).limit(1)
+                docs = [doc async for doc in query_ref.stream()]
+                product = docs[0].to_dict() if docs else None
+            if product is not None:
+                self._remember(memory_key, product)
+
+        if product is None or not self._is_fresh(product):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return product
+
+    async def store(self, query: str, product: dict[str, Any]) -> None:
+        """Saves an identified product under its UPC and the normalized query."""
+        query_key = normalize_query_key(query)
+        entry = {
+            "Title": product.get("Title"),
+            "UPC": product["UPC"],
+            "SourceURL": product.get("SourceURL"),
+            "cached_at": datetime.now(timezone.utc),
+        }
+        update = dict(entry)
+        if query_key:
+            update["QueryKeys"] = firestore.ArrayUnion([query_key])
+        await self.db.collection(self.collection).document(product["UPC"]).set(update, merge=True)
+        self.stores += 1
+        self._remember(f"upc:{product['UPC']}", entry)
+        if query_key:
+            self._remember(f"title:{query_key}", entry)
+
+    async def lookup_image(self, image_hash: str) -> Optional[dict[str, Any]]:
+        """Returns the fresh catalog entry identified from a photo with exactly this perceptual hash, if any."""
+        memory_key = f"image:{image_hash}"
+        product = self._remember(memory_key)
+        if product is None:
+            query_ref = self.db.collection(self.collection).where("ImageHashes", "array_contains", image_hash).limit(1)
+            docs = [doc async for doc in query_ref.stream()]
+            product = docs[0].to_dict() if docs else None
+            if product is not None:
+                self._remember(memory_key, product)
+
+        if product is None or not self._is_fresh(product):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return product
+
+    async def store_image(self, image_hash: str, product: dict[str, Any]) -> None:
+        """Records that a photo with this perceptual hash shows an identified product."""
+        entry = {
+            "Title": product.get("Title"),
+            "UPC": product["UPC"],
+            "SourceURL": product.get("SourceURL"),
+            "cached_at": datetime.now(timezone.utc),
+        }
+        await self.db.collection(self.collection).document(product["UPC"]).set(
+            {**entry, "ImageHashes": firestore.ArrayUnion([image_hash])}, merge=True)
+        self.stores += 1
+        self._remember(f"upc:{product['UPC']}", entry)
+        self._remember(f"image:{image_hash}", entry)
+
+    async def before_agent_callback(self, callback_context: CallbackContext) -> Optional[types.Content]:
+        """Answers from the catalog and skips the agent run on a hit."""
+        query = text_of(callback_context.user_content)
+        if query is None:
+            return None
+        try:
+            product = await self.lookup(query)
+        except Exception:
+            # The catalog is an optimization; fall back to a full identification.
+            return None
+        if product is None:
+            return None
+        return types.Content(role="model", parts=[types.Part(text=(
+            f"{_CATALOG_ANSWER_PREFIX} {product.get('Title')}, "
+            f"UPC {product['UPC']}, {product.get('SourceURL') or 'no blu-ray.com URL on record'}.\n"
+            f"IDENTIFIED: {product.get('Title')} | {product['UPC']} | {product.get('SourceURL') or ''}"
+        ))])
+
+    async def after_agent_callback(self, callback_context: CallbackContext) -> None:
+        """Stores the agent's answer when it identified exactly one product."""
+        query = text_of(callback_context.user_content)
+        if query is None:
+            return None
+        session = callback_context._invocation_context.session
+        answer = next((
+            text_of(event.content) for event in reversed(session.events)
+            if event.author == callback_context.agent_name and text_of(event.content)
+        ), None)
+        if answer is None or answer.startswith(_CATALOG_ANSWER_PREFIX):
+            return None
+        products = parse_identified(answer)
+        if len(products) == 1:
+            try:
+                await self.store(query, products[0])
+            except Exception as e:
+                # The answer is already given; the next identification of the product stores it.
+                logger.warning("Could not store '%s' in the product catalog: %s", products[0].get("UPC"), e)
+        return None
+
+    def stats(self) -> dict[str, Any]:
+        """Returns hit/miss counters; every hit is an identification that skipped the model."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "memory_entries": len(self._memory),
+        }
+
+    def _is_fresh(self, product: dict[str, Any]) -> bool:
+        cached_at = parse_date(product.get("cached_at"))
+        return cached_at is not None and datetime.now(timezone.utc) - cached_at <= self.refresh_after
+
+    def _remember(self, key: str, product: Optional[dict[str, Any]] = None) -> Optional[dict[str, Any]]:
+        """Reads (product omitted) or writes an entry of the in-process LRU."""
+        with self._lock:
+            if product is None:
+                product = self._memory.get(key)
+                if product is not None:
+                    self._memory.move_to_end(key)
+                return product
+            self._memory[key] = product
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+            return product
+
+
+def text_of(content: Optional[types.Content]) -> Optional[str]:
+    """Returns the text of a text-only message; None if it is empty or includes images."""
+    if content is None or not content.parts:
+        return None
+    if any(part.inline_data or part.file_data for part in content.parts):
+        return None
+    text = "".join(part.text or "" for part in content.parts).strip()
+    return text or None
@@ -0,0 +1,156 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Process-wide registry of Firestore clients shared by all agents and tools.
+
+Agents and tools hold a `LazyClient` instead of a client, so importing them neither
+discovers credentials nor opens a channel; the shared client is created on first use.
+"""
+
+import threading
+from typing import Any, Callable, Optional
+
+from google.cloud import firestore
+
+_lock = threading.Lock()
+_clients: dict[tuple[str, str], firestore.Client] = {}
+_async_clients: dict[tuple[str, str], firestore.AsyncClient] = {}
+_lazy_clients: list["LazyClient"] = []
+_hooks: list[Callable[[Any], None]] = []
+
+
+def get_firestore_client(project_id: str, database: str) -> firestore.Client:
+    """
+    Returns the shared blocking `Client` for a database, creating it on first use.
+
+    Unlike the `AsyncClient`, it is not bound to an event loop, so it can be used from
+    worker threads and from loops created with `asyncio.run`.
+
+    Args:
+        project_id: The Google Cloud project ID.
+        database: The name of the Firestore database.
+
+    Raises:
+        ValueError: If no project ID is given, instead of falling back to the credentials' default project.
+    """
+    _check_project(project_id)
+    key = (project_id, database)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = firestore.Client(project=project_id, database=database)
+            _clients[key] = client
+            _run_hooks(client)
+        return client
+
+
+def get_async_firestore_client(project_id: str, database: str) -> firestore.AsyncClient:
+    """
+    Returns the shared `AsyncClient` for a database, creating it on first use.
+
+    Every agent in the process reuses the same client, and therefore the same gRPC
+    channel, instead of opening one per tool instance.
+
+    Args:
+        project_id: The Google Cloud project ID.
+        database: The name of the Firestore database.
+
+    Raises:
+        ValueError: If no project ID is given, instead of falling back to the credentials' default project.
+    """
+    _check_project(project_id)
+    key = (project_id, database)
+    with _lock:
+        client = _async_clients.get(key)
+        if client is None:
+            client = firestore.AsyncClient(project=project_id, database=database)
+            _async_clients[key] = client
+            _run_hooks(client)
+        return client
+
+
+def _check_project(project_id: Optional[str]) -> None:
+    if not project_id:
+        raise ValueError("No Google Cloud project is configured. Set the PROJECT_ID environment variable.")
+
+
+class LazyClient:
+    """
+    Stands in for a shared Firestore client and creates it on first use.
+
+    Every attribute is forwarded to the real client, so a `LazyClient` can be used
+    wherever the code only calls methods such as `collection` or `transaction`.
+    """
+
+    def __init__(self, get_client: Callable[[str, str], Any], project_id: str, database: str):
+        self._get_client = get_client
+        self.project_id = project_id
+        self.database = database
+        self._client: Optional[Any] = None
+
+    def resolve(self) -> Any:
+        """Returns the shared client, creating it if this is its first use."""
+        if self._client is None:
+            self._client = self._get_client(self.project_id, self.database)
+        return self._client
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.resolve(), name)
+
+
+def lazy_firestore_client(project_id: str, database: str) -> LazyClient:
+    """Returns a stand-in for `get_firestore_client(project_id, database)` that creates it on first use."""
+    return _register(LazyClient(get_firestore_client, project_id, database))
+
+
+def lazy_async_firestore_client(project_id: str, database: str) -> LazyClient:
+    """Returns a stand-in for `get_async_firestore_client(project_id, database)` that creates it on first use."""
+    return _register(LazyClient(get_async_firestore_client, project_id, database))
+
+
+def add_client_hook(hook: Callable[[Any], None]) -> None:
+    """
+    Calls `hook` with every shared client, now for those already created and later for new ones.
+
+    Args:
+        hook: Called with each `Client` and `AsyncClient`, e.g. to instrument it.
+    """
+    with _lock:
+        _hooks.append(hook)
+        existing = [*_clients.values(), *_async_clients.values()]
+    for client in existing:
+        hook(client)
+
+
+def warm_up_clients() -> None:
+    """
+    Creates every client that a `LazyClient` stands in for, discovering credentials ahead
+    of the first request. Channels are still opened on first use, on the serving event loop.
+    """
+    with _lock:
+        lazy_clients = list(_lazy_clients)
+    for client in lazy_clients:
+        client.resolve()
+
+
+def _register(client: LazyClient) -> LazyClient:
+    with _lock:
+        _lazy_clients.append(client)
+    return client
+
+
+def _run_hooks(client: Any) -> None:
+    for hook in _hooks:
+        hook(client)
@@ -12,225 +12,238 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+"""
+The inventory tools on Firestore.
+
+`FirestoreStorage` carries out the reads, queries and transactions of `InventoryTools` with
+the synchronous `Client`. `AsyncFirestoreTools` runs the same tools in worker threads.
+"""
+
+from datetime import timedelta
 from google.cloud import firestore
 from typing import Any, Callable, Optional
-from google.adk.tools import ToolContext
 
+from .clients import lazy_firestore_client
+from .inventory_cache import InventoryCache
+from .inventory_tools import (
+    MAX_BATCH_SIZE,
+    InventoryTools,
+    PriceFetcher,
+    _reduce_items,
+    _reducer_fields,
+)
+from .portfolio_summary import SUMMARY_FIELD, SummaryDelta, read_summary
+from .price_history import HISTORY_COLLECTION, entry_id
+from .storage import Condition, InventoryStorage, StorageTransaction, T
 
-class FirestoreTools:
-    """A class that provides tools for interacting with a Firestore database."""
 
-    def __init__(self, project_id: str, database: str):
+class FirestoreStorage(InventoryStorage):
+    """Stores the inventory in Firestore, with items at `users/{user_id}/{category}/{document_id}`."""
+
+    def __init__(self, db: firestore.Client):
         """
-        Initializes the Firestore client.
+        Initializes the storage.
 
         Args:
-            project_id: The Google Cloud project ID.
-            database: The name of the Firestore database.
+            db: The Firestore client.
         """
-        self.db = firestore.Client(project=project_id, database=database)
+        self.db = db
 
-    def get_document(
-        self,
-        collection_id: str,
-        document_id: str,
-        tool_context: ToolContext,
-        user_id: Optional[str] = None,
-    ) -> dict[str, Any]:
-        """
-        Fetches a document from a specified Firestore path.
+    def get(
+        self, user_id: str, collection_id: str, document_id: str, fields: Optional[list[str]] = None
+    ) -> Optional[dict[str, Any]]:
+        doc = self._document(user_id, collection_id, document_id).get(field_paths=fields)
+        return doc.to_dict() if doc.exists else None
 
-        Args:
-            collection_id: The ID of the inventory category (e.g., 'dvd', 'figures').
-            document_id: The ID of the document to retrieve.
-            user_id: The ID of the user. If not provided, it will be inferred from the session.
-            tool_context: The context of the tool invocation.
-        """
-        user_id = user_id or tool_context.state.get("user_id") or "1"
-        document_path = f"users/{user_id}/{collection_id}/{document_id}"
-        doc_ref = self.db.document(document_path)
-        doc = doc_ref.get()
-        return doc.to_dict() if doc.exists else {"error": "Document not found."}
+    def users(self) -> list[str]:
+        # Lists missing user documents too, which only hold inventory subcollections.
+        return sorted(doc_ref.id for doc_ref in self.db.collection("users").list_documents())
 
-    def add_document(
-        self,
-        collection_id: str,
-        data: dict[str, Any],
-        tool_context: ToolContext,
-        user_id: Optional[str] = None,
-        document_id: Optional[str] = None,
-    ) -> str:
-        """
-        Adds a new document to a Firestore collection. If no document_id is provided, one will be auto-generated.
+    def categories(self, user_id: str) -> list[str]:
+        return sorted(c.id for c in self._user(user_id).collections())
 
-        Args:
-            collection_id: The ID of the inventory category (e.g., 'dvd', 'figures').
-            data: A dictionary containing the data for the new document.
-            user_id: The ID of the user. If not provided, it will be inferred from the session.
-            document_id: The ID for the new document. If omitted, a random ID will be generated.
-            tool_context: The context of the tool invocation.
-        """
-        try:
-            user_id = user_id or tool_context.state.get("user_id") or "1"
-            collection_path = f"users/{user_id}/{collection_id}"
-            doc_ref = self.db.collection(collection_path).document(document_id)
-            doc_ref.set(data)
-            return f"Successfully added document '{doc_ref.id}' to collection '{collection_path}'."
-        except Exception as e:
-            return f"An unexpected error occurred while adding the document: {e}"
-
-    def update_document(
-        self,
-        collection_id: str,
-        document_id: str,
-        data: dict[str, Any],
-        tool_context: ToolContext,
-        user_id: Optional[str] = None,
-    ) -> str:
-        """
-        Updates an existing document in Firestore, merging the new data.
+    def cursor(self, user_id: str, collection_id: str, document_id: str) -> Optional[Any]:
+        doc = self._document(user_id, collection_id, document_id).get()
+        return doc if doc.exists else None
 
-        Args:
-            collection_id: The ID of the inventory category (e.g., 'dvd', 'figures').
-            document_id: The ID of the document to update.
-            data: A dictionary containing the fields to update.
-            user_id: The ID of the user. If not provided, it will be inferred from the session.
-            tool_context: The context of the tool invocation.
-        """
-        try:
-            user_id = user_id or tool_context.state.get("user_id") or "1"
-            document_path = f"users/{user_id}/{collection_id}/{document_id}"
-            self.db.document(document_path).set(data, merge=True)
-            return f"Successfully updated document at '{document_path}'."
-        except Exception as e:
-            return f"An unexpected error occurred while updating the document: {e}"
-
-    def delete_document(
+    def query(
         self,
+        user_id: str,
         collection_id: str,
-        document_id: str,
-        tool_context: ToolContext,
-        user_id: Optional[str] = None,
-    ) -> str:
-        """
-        Deletes a document from Firestore.
-
-        Args:
-            collection_id: The ID of the inventory category (e.g., 'dvd', 'figures').
-            document_id: The ID of the document to delete.
-            user_id: The ID of the user. If not provided, it will be inferred from the session.
-            tool_context: The context of the tool invocation.
-        """
+        condition: Optional[Condition] = None,
+        fields: Optional[list[str]] = None,
+        order_field: Optional[str] = None,
+        cursor: Optional[Any] = None,
+        limit: Optional[int] = None,
+    ) -> list[Any]:
+        query = _where(self._user(user_id).collection(collection_id), condition)
+        return list(_ordered_query(query, fields, order_field, cursor, limit).stream())
+
+    def aggregate(
+        self, user_id: str, collection_id: str, condition: Optional[Condition], sum_field: Optional[str]
+    ) -> dict[str, Any]:
+        query = _where(self._user(user_id).collection(collection_id), condition)
         try:
-            user_id = user_id or tool_context.state.get("user_id") or "1"
-            document_path = f"users/{user_id}/{collection_id}/{document_id}"
-            doc_ref = self.db.document(document_path)
-            if not doc_ref.get().exists:
-                return f"Error: Document '{document_id}' not found."
-            doc_ref.delete()
-            return f"Successfully deleted document at '{document_path}'."
-        except Exception as e:
-            return f"An unexpected error occurred while deleting the document: {e}"
-
-    def find_document_by_field(
-        self,
-        collection_id: str,
-        field: str,
-        value: Any,
-        tool_context: ToolContext,
-        user_id: Optional[str] = None,
-    ) -> list[dict[str, Any]]:
-        """
-        Finds documents in a collection by matching a field with a specific value.
-        Use this to find the ID of a document when you only know its title or another property.
-
-        Args:
-            collection_id: The ID of the inventory category to search in (e.g., 'dvd', 'figures').
-            field: The document field to search on (e.g., 'title', 'name').
-            value: The value to match.
-            user_id: The ID of the user. If not provided, it will be inferred from the session.
-            tool_context: The context of the tool invocation.
-        """
-        user_id = user_id or tool_context.state.get("user_id") or "1"
-        collection_path = f"users/{user_id}/{collection_id}"
-        query = self.db.collection(collection_path).where(field, "==", value)
-        results = query.stream()
-        return [{"id": doc.id, "data": doc.to_dict()} for doc in results]
+            return _aggregation_result(_aggregation_query(query, sum_field).get(), sum_field)
+        except Exception:
+            # E.g. an emulator without sum/avg support; the reducer computes the same totals.
+            docs = query.select(_reducer_fields(sum_field)).stream()
+            return _reduce_items((doc.to_dict() for doc in docs), False, sum_field)
+
+    def price_history(self, user_id: str, collection_id: str, document_id: str, limit: int) -> list[dict[str, Any]]:
+        query = (
+            self._document(user_id, collection_id, document_id).collection(HISTORY_COLLECTION)
+            .order_by("date_checked", direction=firestore.Query.DESCENDING)
+            .limit(limit)
+        )
+        return [entry.to_dict() for entry in query.stream()]
+
+    def read_summary(self, user_id: str) -> Optional[dict[str, Any]]:
+        return read_summary(self._user(user_id).get().to_dict())
+
+    def set_summary(self, user_id: str, summary: dict[str, Any]) -> None:
+        self._user(user_id).set(summary, merge=[SUMMARY_FIELD])
+
+    def transaction(self, write: Callable[[StorageTransaction], T]) -> T:
+        @firestore.transactional
+        def run(transaction: firestore.Transaction) -> T:
+            return write(_FirestoreTransaction(self, transaction))
+
+        return run(self.db.transaction())
+
+    def delete_price_history(self, user_id: str, collection_id: str, document_ids: list[str]) -> None:
+        # Firestore does not delete subcollections with their document.
+        batch, pending = self.db.batch(), 0
+        for document_id in document_ids:
+            history = self._document(user_id, collection_id, document_id).collection(HISTORY_COLLECTION)
+            for entry_ref in history.list_documents():
+                batch.delete(entry_ref)
+                pending += 1
+                if pending == MAX_BATCH_SIZE:
+                    batch.commit()
+                    batch, pending = self.db.batch(), 0
+        if pending:
+            batch.commit()
+
+    def new_document_id(self) -> str:
+        return self.db.collection("users").document().id
+
+    def _user(self, user_id: str) -> Any:
+        return self.db.collection("users").document(user_id)
+
+    def _document(self, user_id: str, collection_id: str, document_id: str) -> Any:
+        return self.db.document(f"users/{user_id}/{collection_id}/{document_id}")
+
+    def _entry(self, user_id: str, collection_id: str, document_id: str, entry: dict[str, Any]) -> Any:
+        return self._document(user_id, collection_id, document_id).collection(HISTORY_COLLECTION).document(
+            entry_id(entry))
+
+
+class _FirestoreTransaction(StorageTransaction):
+    """A `StorageTransaction` on a Firestore transaction."""
+
+    def __init__(self, storage: FirestoreStorage, transaction: firestore.Transaction):
+        self.storage = storage
+        self.transaction = transaction
+
+    def get_all(
+        self, user_id: str, collection_id: str, document_ids: list[str], fields: Optional[list[str]] = None
+    ) -> dict[str, dict[str, Any]]:
+        if not document_ids:
+            return {}
+        refs = [self.storage._document(user_id, collection_id, document_id) for document_id in document_ids]
+        docs = self.storage.db.get_all(refs, field_paths=fields, transaction=self.transaction)
+        return {doc.id: doc.to_dict() for doc in docs if doc.exists}
+
+    def set(
+        self, user_id: str, collection_id: str, document_id: str, data: dict[str, Any], merge: bool = False
+    ) -> None:
+        self.transaction.set(self.storage._document(user_id, collection_id, document_id), data, merge=merge)
+
+    def delete(self, user_id: str, collection_id: str, document_id: str) -> None:
+        self.transaction.delete(self.storage._document(user_id, collection_id, document_id))
+
+    def add_price_entry(self, user_id: str, collection_id: str, document_id: str, entry: dict[str, Any]) -> None:
+        self.transaction.set(self.storage._entry(user_id, collection_id, document_id, entry), entry)
+
+    def apply_summary(self, user_id: str, delta: SummaryDelta) -> None:
+        update = delta.update()
+        if update is not None:
+            self.transaction.set(self.storage._user(user_id), update, merge=True)
+
+
+class FirestoreTools(InventoryTools):
+    """A class that provides tools for interacting with a Firestore database."""
 
-    def query_collection(
+    def __init__(
         self,
-        collection_id: str,
-        field: str,
-        operator: str,
-        value: Any,
-        tool_context: ToolContext,
-        user_id: Optional[str] = None,
-    ) -> list[dict[str, Any]]:
-        """
-        Performs a simple query on a Firestore collection.
-
-        Args:
-            collection_id: The ID of the inventory category to query (e.g., 'dvd', 'figures').
-            field: The document field to filter on.
-            operator: The comparison operator (e.g., '==', '<', '>=').
-            value: The value to compare against.
-            user_id: The ID of the user. If not provided, it will be inferred from the session.
-            tool_context: The context of the tool invocation.
-        """
-        user_id = user_id or tool_context.state.get("user_id") or "1"
-        collection_path = f"users/{user_id}/{collection_id}"
-        query = self.db.collection(collection_path).where(field, operator, value)
-        results = query.stream()
-        return [doc.to_dict() for doc in results]
-
-    def list_inventory_categories(
-        self, tool_context: ToolContext, user_id: Optional[str] = None
-    ) -> list[str]:
-        """
-        Lists all inventory categories (subcollections) for a given user.
-
-        Args:
-            user_id: The ID of the user. If not provided, it will be inferred from the session.
-            tool_context: The context of the tool invocation.
-        """
-        user_id = user_id or tool_context.state.get("user_id") or "1"
-        user_doc_ref = self.db.collection("users").document(user_id)
-        collections = user_doc_ref.collections()
-        return [c.id for c in collections]
-
-    def get_all_user_inventory(
-        self, tool_context: ToolContext, user_id: Optional[str] = None
-    ) -> dict[str, list[dict[str, Any]]]:
+        project_id: str,
+        database: str,
+        price_fetcher: Optional[PriceFetcher] = None,
+        max_workers: int = 8,
+        price_max_age: timedelta = timedelta(days=1),
+        cache: Optional[InventoryCache] = None,
+    ):
         """
-        Fetches all inventory items across all categories for a given user.
-        Use this tool when the user asks for a summary of their items.
+        Initializes the tools with the process-wide shared `Client`, created on first use.
 
         Args:
-            user_id: The ID of the user. If not provided, it will be inferred from the session.
-            tool_context: The context of the tool invocation.
-        """
-        user_id = user_id or tool_context.state.get("user_id") or "1"
-
-        user_doc_ref = self.db.collection("users").document(user_id)
-        collections = user_doc_ref.collections()
-
-        inventory: dict[str, list[dict[str, Any]]] = {}
-        for collection in collections:
-            category_id = collection.id
-            docs = collection.stream()
-            inventory[category_id] = [doc.to_dict() for doc in docs]
-
-        return inventory if inventory else {"message": "No inventory found for this user."}
-
-    def get_tools(self) -> list[Callable]:
-        """Returns a list of all tool methods."""
-        return [
-            self.get_document,
-            self.add_document,
-            self.update_document,
-            self.delete_document,
-            self.query_collection,
-            self.list_inventory_categories,
-            self.get_all_user_inventory,
-            self.find_document_by_field,
-        ]
+            project_id: The Google Cloud project ID.
+            database: The name of the Firestore database.
+            price_fetcher: Looks up the current market value of an item in USD. Used by
+                `value_portfolio` to refresh stale prices; returns None if no value was found.
+            max_workers: The maximum number of concurrent price lookups.
+            price_max_age: How old a price may be before it is considered stale.
+            cache: Optional read-through cache for inventory reads. Writes made through
+                these tools invalidate the affected entries.
+        """
+        self.db = lazy_firestore_client(project_id, database)
+        super().__init__(FirestoreStorage(self.db), price_fetcher, max_workers, price_max_age, cache)
+
+
+def _where(query: Any, condition: Optional[Condition]) -> Any:
+    """Applies an optional `where` filter to a query."""
+    return query.where(*condition) if condition is not None else query
+
+
+def _ordered_query(
+    query: Any,
+    fields: Optional[list[str]],
+    order_field: Optional[str] = None,
+    cursor: Any = None,
+    limit: Optional[int] = None,
+) -> Any:
+    """Projects a query and orders it by document ID, after `order_field` if given, so it can be paged."""
+    if fields:
+        query = query.select(fields)
+    if order_field:
+        query = query.order_by(order_field)
+    query = query.order_by(firestore.FieldPath.document_id())
+    if cursor is not None:
+        query = query.start_after(cursor)
+    return query.limit(limit) if limit is not None else query
+
+
+def _aggregation_query(query: Any, sum_field: Optional[str]) -> Any:
+    """
+    Builds a server-side aggregation of the item count and quantity, plus `sum_field` if given.
+
+    The sum skips items without a numeric `Quantity`, which the other totals count as one;
+    the tools store every quantity as a number, and `python -m agent.migrate quantities`
+    converts items written before they did.
+    """
+    aggregation = query.count(alias="items").sum("Quantity", alias="quantity")
+    if sum_field:
+        aggregation = aggregation.sum(sum_field, alias="total").avg(sum_field, alias="average")
+    return aggregation
+
+
+def _aggregation_result(result: Any, sum_field: Optional[str]) -> dict[str, Any]:
+    """Converts the result of `_aggregation_query` into per-category totals."""
+    values = {aggregate.alias: aggregate.value for aggregate in result[0]}
+    totals: dict[str, Any] = {"items": int(values["items"]), "quantity": int(values.get("quantity") or 0)}
+    if sum_field:
+        average = values.get("average")
+        totals[f"{sum_field}_total"] = round(values.get("total") or 0, 2)
+        totals[f"{sum_field}_average"] = round(average, 2) if average is not None else None
+    return totals
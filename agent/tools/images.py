@@ -0,0 +1,210 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Shrinks uploaded photos before they reach a model and recognizes photos that were
+identified before.
+
+Gemini bills an image by the 768x768 tiles it covers, so a 12-megapixel phone photo costs
+about 24 times the tokens of the same photo at 768 pixels, at which a cover title is still
+legible. Every model request has its photos downsized and recompressed to JPEG; the
+original stays in the session.
+
+Each photo also gets a perceptual hash (dHash). A photo with exactly the hash of one that
+a product was identified from before is annotated with that product, so the orchestrator
+can skip `identifier_agent`. Near matches are not used: similar covers of different
+products (e.g. the editions of a series) can differ in only a few bits.
+"""
+
+import asyncio
+import hashlib
+import io
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, NamedTuple, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.genai import types
+from PIL import Image, ImageOps
+
+from .catalog import ProductCatalog, parse_identified
+
+logger = logging.getLogger(__name__)
+
+# The longest side of a photo sent to a model: one 768x768 tile.
+MAX_IMAGE_SIDE = 768
+JPEG_QUALITY = 85
+
+_MATCH_PREFIX = "[This photo matches a previously identified product:"
+
+
+class ProcessedImage(NamedTuple):
+    data: bytes
+    mime_type: str
+    image_hash: str
+
+
+def shrink_image(
+    data: bytes, mime_type: str, max_side: int = MAX_IMAGE_SIDE, quality: int = JPEG_QUALITY
+) -> tuple[bytes, str]:
+    """
+    Downsizes a photo so that its longest side is at most `max_side` and recompresses it.
+
+    Returns:
+        The new image bytes and MIME type. A photo that already fits is only kept as the
+        JPEG if that is smaller.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        resized = max(image.size) > max_side
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        output = io.BytesIO()
+        image.convert("RGB").save(output, format="JPEG", quality=quality, optimize=True)
+    shrunk = output.getvalue()
+    return (shrunk, "image/jpeg") if resized or len(shrunk) < len(data) else (data, mime_type)
+
+
+def perceptual_hash(data: bytes) -> str:
+    """Returns the 64-bit difference hash (dHash) of an image as 16 hex digits."""
+    with Image.open(io.BytesIO(data)) as image:
+        pixels = list(ImageOps.exif_transpose(image).convert("L").resize((9, 8), Image.Resampling.LANCZOS).getdata())
+    bits = 0
+    for row in range(8):
+        for column in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + column] > pixels[row * 9 + column + 1])
+    return f"{bits:016x}"
+
+
+class ImagePreprocessor:
+    """Model and agent callbacks that shrink photos and reuse identifications of known photos."""
+
+    def __init__(
+        self,
+        catalog: Optional[ProductCatalog] = None,
+        max_side: int = MAX_IMAGE_SIDE,
+        quality: int = JPEG_QUALITY,
+        max_entries: int = 256,
+    ):
+        """
+        Initializes the preprocessor.
+
+        Args:
+            catalog: Optional product catalog that remembers which product a photo showed.
+            max_side: The longest side, in pixels, of a photo sent to a model.
+            quality: The JPEG quality of the recompressed photos.
+            max_entries: The number of processed photos kept in memory. A photo is resent
+                with every model call of a conversation, so each is processed only once.
+        """
+        self.catalog = catalog
+        self.max_side = max_side
+        self.quality = quality
+        self.max_entries = max_entries
+        self._processed: OrderedDict[str, ProcessedImage] = OrderedDict()
+        self._matches: OrderedDict[str, Optional[dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def before_model_callback(self, callback_context: CallbackContext, llm_request: LlmRequest) -> None:
+        """Shrinks the photos in a model request and annotates those showing a known product."""
+        for index, content in enumerate(llm_request.contents or []):
+            if not content.parts or not any(_is_image(part) for part in content.parts):
+                continue
+            parts = []
+            for part in content.parts:
+                if not _is_image(part):
+                    parts.append(part)
+                    continue
+                try:
+                    image = await self.process(part.inline_data.data, part.inline_data.mime_type)
+                except Exception:
+                    # Not an image the preprocessor can read; the model gets it unchanged.
+                    parts.append(part)
+                    continue
+                parts.append(types.Part(inline_data=types.Blob(data=image.data, mime_type=image.mime_type)))
+                product = await self._match(image.image_hash)
+                if product is not None:
+                    parts.append(types.Part(text=(
+                        f"{_MATCH_PREFIX} {product.get('Title')}, UPC {product['UPC']}.]\n"
+                        f"IDENTIFIED: {product.get('Title')} | {product['UPC']} | {product.get('SourceURL') or ''}"
+                    )))
+            # A new content, so the photos stored in the session stay untouched.
+            llm_request.contents[index] = types.Content(role=content.role, parts=parts)
+        return None
+
+    async def after_agent_callback(self, callback_context: CallbackContext) -> None:
+        """Remembers the product identified in a turn whose message held exactly one photo."""
+        if self.catalog is None or callback_context.user_content is None:
+            return None
+        images = [part for part in callback_context.user_content.parts or [] if _is_image(part)]
+        if len(images) != 1:
+            return None
+        invocation = callback_context._invocation_context
+        products = [
+            product
+            for event in invocation.session.events if event.invocation_id == invocation.invocation_id
+            for response in event.get_function_responses() if response.name == "identifier_agent"
+            for product in parse_identified(str((response.response or {}).get("result", "")))
+        ]
+        if len({product["UPC"] for product in products}) != 1:
+            return None
+        try:
+            image = await self.process(images[0].inline_data.data, images[0].inline_data.mime_type)
+            await self.catalog.store_image(image.image_hash, products[0])
+            with self._lock:
+                self._matches[image.image_hash] = products[0]
+        except Exception as e:
+            logger.warning("Could not remember the photo of UPC %s: %s", products[0]["UPC"], e)
+        return None
+
+    async def process(self, data: bytes, mime_type: str) -> ProcessedImage:
+        """Shrinks and hashes a photo, reusing the result for a photo processed before."""
+        key = hashlib.sha1(data).hexdigest()
+        with self._lock:
+            image = self._processed.get(key)
+            if image is not None:
+                self._processed.move_to_end(key)
+                return image
+        image = await asyncio.to_thread(self._process, data, mime_type)
+        with self._lock:
+            self._processed[key] = image
+            while len(self._processed) > self.max_entries:
+                self._processed.popitem(last=False)
+        return image
+
+    def _process(self, data: bytes, mime_type: str) -> ProcessedImage:
+        shrunk, mime_type = shrink_image(data, mime_type, self.max_side, self.quality)
+        return ProcessedImage(shrunk, mime_type, perceptual_hash(data))
+
+    async def _match(self, image_hash: str) -> Optional[dict[str, Any]]:
+        """Looks up a photo in the catalog once per process, including misses."""
+        if self.catalog is None:
+            return None
+        with self._lock:
+            if image_hash in self._matches:
+                return self._matches[image_hash]
+        try:
+            product = await self.catalog.lookup_image(image_hash)
+        except Exception:
+            # The catalog is an optimization; the photo is identified as usual.
+            return None
+        with self._lock:
+            self._matches[image_hash] = product
+            while len(self._matches) > self.max_entries:
+                self._matches.popitem(last=False)
+        return product
+
+
+def _is_image(part: types.Part) -> bool:
+    return bool(part.inline_data and part.inline_data.data and (part.inline_data.mime_type or "").startswith("image/"))
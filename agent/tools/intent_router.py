@@ -0,0 +1,217 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Answers simple inventory commands without running the orchestrator model.
+
+Messages such as "show me all my stuff", "how many Blu-rays do I have", "do I have
+Inception" or "delete Inception" are recognized by rules and sent straight to the
+matching `FirestoreTools` method. Anything else, including commands whose target is
+ambiguous, falls through to the full `master_agent` run. Deletes are irreversible, so the
+router only runs one whose title names exactly one item; a fuzzy or shared title is left
+to the orchestrator, which confirms the item with the user first.
+"""
+
+import asyncio
+import re
+from typing import Any, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.genai import types
+
+from .agent_tools import call_tool
+from .catalog import text_of
+from .title_search import title_tokens
+
+# The most items listed in a fast-path answer; the orchestrator pages through larger inventories.
+MAX_LISTED_ITEMS = 100
+
+_END = r"\s*[.!?]*$"
+_LIST_ALL = re.compile(
+    r"^(?:please\s+)?(?:(?:show|list|display|give)(?:\s+me)?\s+(?:all\s+(?:of\s+)?)?my\s+"
+    r"(?:stuff|items|things|inventory|collection)|what\s+do\s+i\s+(?:have|own))" + _END
+)
+_LIST_CATEGORIES = re.compile(
+    r"^(?:(?:what|which)\s+categories\s+do\s+i\s+have|(?:show|list)(?:\s+me)?\s+my\s+categories)" + _END
+)
+_COUNT = re.compile(r"^how\s+many\s+(?P<category>[\w\s-]+?)\s+do\s+i\s+(?:have|own)(?:\s+in\s+total)?" + _END)
+_FIND = re.compile(
+    r"^(?:do\s+i\s+(?:have|own)|find|look\s+up|search\s+for)\s+(?:a\s+copy\s+of\s+|my\s+)?"
+    r"[\"']?(?P<title>.+?)[\"']?" + _END
+)
+_DELETE = re.compile(
+    r"^(?:please\s+)?(?:delete|remove)\s+(?:my\s+)?[\"']?(?P<title>.+?)[\"']?"
+    r"(?:\s+from\s+my\s+(?:inventory|collection))?" + _END
+)
+
+# Words that make a message more than a plain lookup (e.g. "find the value of X").
+_NOT_SIMPLE = re.compile(r"\b(?:value|worth|price|prices|upc|identify|add|update|change|move|and)\b")
+# Titles that refer back to the conversation, which only the orchestrator can resolve.
+_REFERENCES = frozenset(("it", "this", "that", "them", "these", "those", "one", "everything", "all"))
+# Words for the whole inventory in "how many ... do I have".
+_ALL_ITEMS = frozenset(("items", "things", "movies", "discs", "titles", "products"))
+
+
+class IntentRouter:
+    """Routes recognizable inventory commands directly to the Firestore tools."""
+
+    def __init__(self, firestore_tools: Any):
+        """
+        Initializes the router.
+
+        Args:
+            firestore_tools: A `FirestoreTools` or `AsyncFirestoreTools` instance.
+        """
+        self.firestore_tools = firestore_tools
+
+    async def before_agent_callback(self, callback_context: CallbackContext) -> Optional[types.Content]:
+        """Answers a recognized command directly and skips the orchestrator run; None otherwise."""
+        text = text_of(callback_context.user_content)
+        if text is None:
+            return None
+        try:
+            answer = await self.route(text, callback_context)
+        except Exception:
+            # The router is an optimization; the orchestrator handles anything it cannot.
+            return None
+        if answer is None:
+            return None
+        return types.Content(role="model", parts=[types.Part(text=answer)])
+
+    async def route(self, text: str, tool_context: Any) -> Optional[str]:
+        """Executes a recognized command and returns the answer, or None to fall back to the orchestrator."""
+        text = " ".join(text.lower().split())
+        if _LIST_ALL.match(text):
+            return await self._list_all(tool_context)
+        if _LIST_CATEGORIES.match(text):
+            return await self._list_categories(tool_context)
+        if _NOT_SIMPLE.search(text):
+            return None
+        match = _COUNT.match(text)
+        if match:
+            return await self._count(match["category"], tool_context)
+        match = _DELETE.match(text)
+        if match and match["title"] not in _REFERENCES:
+            return await self._delete(match["title"], tool_context)
+        match = _FIND.match(text)
+        if match and match["title"] not in _REFERENCES:
+            return await self._find(match["title"], tool_context)
+        return None
+
+    async def _list_all(self, tool_context: Any) -> Optional[str]:
+        result = await call_tool(
+            self.firestore_tools.get_all_user_inventory, tool_context=tool_context, limit=MAX_LISTED_ITEMS)
+        if "message" in result:
+            return "You don't have any items in your inventory yet."
+        if "inventory" not in result:
+            return None
+        lines = []
+        for category_id, items in result["inventory"].items():
+            lines.append(f"**{category_id}** ({len(items)})")
+            lines.extend(f"- {_describe(item)}" for item in items)
+        if result.get("next_start_after"):
+            lines.append(f"Showing the first {MAX_LISTED_ITEMS} items; ask to see more.")
+        return "\n".join(lines)
+
+    async def _list_categories(self, tool_context: Any) -> str:
+        categories = await call_tool(self.firestore_tools.list_inventory_categories, tool_context=tool_context)
+        if not categories:
+            return "You don't have any inventory categories yet."
+        return "Your inventory categories: " + ", ".join(sorted(categories)) + "."
+
+    async def _count(self, noun: str, tool_context: Any) -> Optional[str]:
+        collection_id = None
+        if noun not in _ALL_ITEMS:
+            categories = await call_tool(self.firestore_tools.list_inventory_categories, tool_context=tool_context)
+            collection_id = _match_category(noun, categories)
+            if collection_id is None:
+                # E.g. a format or genre rather than a category; the orchestrator can filter for it.
+                return None
+        result = await call_tool(
+            self.firestore_tools.aggregate_inventory, tool_context=tool_context, collection_id=collection_id)
+        if "totals" not in result:
+            return None
+        items, quantity = result["totals"].get("items", 0), result["totals"].get("quantity", 0)
+        scope = f"in '{collection_id}'" if collection_id else "in your inventory"
+        copies = f" ({quantity} copies in total)" if quantity != items else ""
+        return f"You have {items} {'item' if items == 1 else 'items'} {scope}{copies}."
+
+    async def _find(self, title: str, tool_context: Any) -> Optional[str]:
+        matches = await self._matches(title, tool_context)
+        if not matches:
+            return None
+        lines = [f"Found {len(matches)} matching {'item' if len(matches) == 1 else 'items'} for '{title}':"]
+        lines.extend(
+            f"- {_describe(match['data'])} in '{category_id}' (id: {match['id']})"
+            for category_id, match in matches
+        )
+        return "\n".join(lines)
+
+    async def _delete(self, title: str, tool_context: Any) -> Optional[str]:
+        matches = await self._matches(title, tool_context)
+        exact = [(category_id, match) for category_id, match in matches if _same_title(title, match["data"])]
+        if len(exact) != 1:
+            # A near match (e.g. "Toy Story 2" for "Toy Story") or several copies of the
+            # title: the orchestrator asks which item is meant before deleting anything.
+            return None
+        category_id, best = exact[0]
+        result = await call_tool(
+            self.firestore_tools.delete_document,
+            collection_id=category_id, document_id=best["id"], tool_context=tool_context)
+        if not result.startswith("Successfully"):
+            return None
+        return f"Deleted '{best['data'].get('Title')}' from '{category_id}'."
+
+    async def _matches(self, title: str, tool_context: Any) -> list[tuple[str, dict[str, Any]]]:
+        """Searches every category for a title, returning (category, match) pairs, best first."""
+        categories = await call_tool(self.firestore_tools.list_inventory_categories, tool_context=tool_context)
+        results = await asyncio.gather(*(
+            call_tool(self.firestore_tools.find_document_by_field, collection_id=category_id,
+                      field="Title", value=title, tool_context=tool_context, limit=3)
+            for category_id in categories
+        ))
+        # Fallback matches of items without search keys have no score, but equal the title.
+        matches = [
+            (category_id, {**match, "score": match.get("score", 1.0)})
+            for category_id, category_matches in zip(categories, results)
+            for match in category_matches
+        ]
+        return sorted(matches, key=lambda pair: -pair[1]["score"])[:5]
+
+
+def _same_title(title: str, item: dict[str, Any]) -> bool:
+    """Returns True if an item's title is the requested one, ignoring case, punctuation and format spelling."""
+    return bool(title_tokens(title)) and title_tokens(title) == title_tokens(item.get("Title") or "")
+
+
+def _normalize(word: str) -> str:
+    word = re.sub(r"[^a-z0-9]", "", word.lower())
+    return word[:-1] if word.endswith("s") else word
+
+
+def _match_category(noun: str, categories: list[str]) -> Optional[str]:
+    """Returns the category a noun such as "Blu-rays" or "dvds" refers to, if any."""
+    wanted = _normalize(noun)
+    return next((category for category in categories if _normalize(category) == wanted), None)
+
+
+def _describe(item: dict[str, Any]) -> str:
+    """Describes an item summary in one line, e.g. "Inception (Blu-ray, New) x2 - $12.50"."""
+    details = ", ".join(str(item[key]) for key in ("Format", "Condition") if item.get(key))
+    text = str(item.get("Title") or "Untitled") + (f" ({details})" if details else "")
+    if (item.get("Quantity") or 1) != 1:
+        text += f" x{item['Quantity']}"
+    if item.get("LatestPrice") is not None:
+        text += f" - ${item['LatestPrice']:.2f}"
+    return text
@@ -0,0 +1,212 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Per-user, in-process read-through cache for inventory tool results.
+
+Invalidation is process-local: only writes made through the tools that share a cache drop
+its entries. Writes from anywhere else (the price refresh worker, `agent.inventory_io`,
+`agent.migrate`, `agent.rebuild_summaries`, other replicas) are only seen once the cached
+reads expire, so keep the TTL short.
+"""
+
+import copy
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, NamedTuple, Optional
+
+
+class CacheKey(NamedTuple):
+    """Identifies a cached read by the user, category and document it depends on."""
+
+    user_id: str
+    collection_id: Optional[str]
+    document_id: Optional[str]
+    call: str
+
+
+class _Entry(NamedTuple):
+    value: Any
+    size: int
+    expires_at: float
+
+
+class InventoryCache:
+    """A TTL + LRU cache bounded by an approximate memory budget."""
+
+    def __init__(self, ttl_seconds: float = 30, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Initializes the cache.
+
+        Args:
+            ttl_seconds: How long a cached read stays valid. Also the longest a read can be
+                stale after a write made outside of this process's tools.
+            max_bytes: Approximate memory budget; least recently used entries are evicted beyond it.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[CacheKey, _Entry] = OrderedDict()
+        self._keys_by_user: dict[str, set[CacheKey]] = {}
+        self._generations: dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: CacheKey) -> tuple[bool, Any]:
+        """Returns (True, value) on a hit and (False, None) on a miss or an expired entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, copy.deepcopy(entry.value)
+
+    def generation(self, user_id: str) -> int:
+        """Returns a token that changes whenever the user's cached reads are invalidated."""
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def put(self, key: CacheKey, value: Any, generation: int) -> None:
+        """
+        Stores a read result unless the user's data was written since the read started.
+
+        Args:
+            key: The key of the read.
+            value: The result of the read.
+            generation: The value of `generation(key.user_id)` taken before the read.
+        """
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if self._generations.get(key.user_id, 0) != generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(copy.deepcopy(value), size, time.monotonic() + self.ttl_seconds)
+            self._keys_by_user.setdefault(key.user_id, set()).add(key)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(
+        self,
+        user_id: str,
+        collection_id: Optional[str] = None,
+        document_id: Optional[str] = None,
+    ) -> None:
+        """
+        Drops every cached read that may observe a write to the given user, category or document.
+
+        Reads of the whole user (e.g. `list_inventory_categories`) are dropped on any write
+        for that user, reads of a category on any write to it, and reads of a single
+        document only on a write to that document.
+
+        Args:
+            user_id: The user that was written to.
+            collection_id: The category that was written to, or None for the whole user.
+            document_id: The document that was written to, or None for the whole category.
+        """
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            for key in list(self._keys_by_user.get(user_id, ())):
+                if collection_id is not None and key.collection_id not in (None, collection_id):
+                    continue
+                if document_id is not None and key.document_id not in (None, document_id):
+                    continue
+                self._remove(key)
+                self.invalidations += 1
+
+    def stats(self) -> dict[str, Any]:
+        """Returns hit/miss counters; every hit is a Firestore read that was avoided."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def _remove(self, key: CacheKey) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        user_keys = self._keys_by_user.get(key.user_id)
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                del self._keys_by_user[key.user_id]
+
+
+def cached_read(scope: str) -> Callable[[Callable], Callable]:
+    """
+    Caches the result of a read tool method in the instance's `cache`, if it has one.
+
+    Keeps the signature and docstring of the tool method, so the wrapped method can still
+    be registered as an ADK tool.
+
+    Args:
+        scope: What the read depends on: 'user', 'collection' or 'document'. Determines
+            which writes invalidate it.
+    """
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        def make_key(self, args, kwargs) -> CacheKey:
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            arguments.pop("self")
+            tool_context = arguments.pop("tool_context")
+            user_id = arguments.pop("user_id", None) or tool_context.state.get("user_id") or "1"
+            collection_id = arguments.pop("collection_id") if scope != "user" else None
+            document_id = arguments.pop("document_id") if scope == "document" else None
+            call = f"{func.__name__}:{json.dumps(arguments, sort_keys=True, default=str)}"
+            return CacheKey(user_id, collection_id, document_id, call)
+
+        def cacheable(result: Any) -> bool:
+            return not (isinstance(result, dict) and "error" in result)
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if self.cache is None:
+                return func(self, *args, **kwargs)
+            key = make_key(self, args, kwargs)
+            hit, value = self.cache.get(key)
+            if hit:
+                return value
+            generation = self.cache.generation(key.user_id)
+            result = func(self, *args, **kwargs)
+            if cacheable(result):
+                self.cache.put(key, result, generation)
+            return result
+        return wrapper
+
+    return decorator
@@ -0,0 +1,143 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""The inventory item schema described in the inventory_agent instruction, in code."""
+
+import json
+import math
+import re
+from typing import Any, Optional
+
+from .pricing import parse_price
+
+REQUIRED_FIELDS = ("Title", "CreatedDate", "UpdatedDate", "UPC", "Format", "Condition", "Quantity")
+OPTIONAL_FIELDS = (
+    "PriceHistory", "SourceURL", "StorageLocation", "PurchasePrice", "PurchaseDate", "Notes",
+)
+FIELDS = REQUIRED_FIELDS + OPTIONAL_FIELDS
+# The fields read for summaries of an inventory; `PriceHistory` is reduced to the latest price.
+SUMMARY_FIELDS = ("Title", "UPC", "Format", "Condition", "Quantity", "PriceHistory")
+
+# Maps loosely written column names (e.g. "upc", "source_url", "Purchase Price") to schema fields.
+_FIELD_ALIASES = {re.sub(r"[^a-z]", "", field.lower()): field for field in FIELDS}
+_FIELD_ALIASES.update({"name": "Title", "url": "SourceURL", "qty": "Quantity", "location": "StorageLocation"})
+
+_UPC = re.compile(r"(?<!\d)(\d{12,13})(?!\d)")
+_BLU_RAY_URL = re.compile(r"https?://(?:www\.)?blu-ray\.com/[^\s)\]>\"']+")
+
+
+def normalize_upc(value: Any) -> Optional[str]:
+    """Returns the digits of a UPC/EAN code, or None if it is not 8 to 14 digits long."""
+    if value is None:
+        return None
+    digits = re.sub(r"\D", "", str(value))
+    return digits if 8 <= len(digits) <= 14 else None
+
+
+def parse_quantity(value: Any) -> Optional[int]:
+    """Returns a quantity as an int, or None if it is not a whole number of zero or more (e.g. "x", 2.5, -1)."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        try:
+            value = float(value.strip())
+        except ValueError:
+            return None
+    if not isinstance(value, (int, float)) or not math.isfinite(value) or value < 0 or value != int(value):
+        return None
+    return int(value)
+
+
+def parse_identification(text: str) -> dict[str, str]:
+    """Extracts the `UPC` and blu-ray.com `SourceURL` from an identifier agent's response."""
+    found: dict[str, str] = {}
+    upc = _UPC.search(text or "")
+    if upc:
+        found["UPC"] = upc.group(1)
+    url = _BLU_RAY_URL.search(text or "")
+    if url:
+        found["SourceURL"] = url.group(0).rstrip(".,;")
+    return found
+
+
+def canonicalize_fields(row: dict[str, Any]) -> dict[str, Any]:
+    """Renames loosely written keys (e.g. "upc", "Purchase Price") to schema field names."""
+    return {
+        _FIELD_ALIASES.get(re.sub(r"[^a-z]", "", str(key).lower()), key): value
+        for key, value in row.items() if key is not None
+    }
+
+
+def validate_item(row: dict[str, Any], today: str) -> tuple[dict[str, Any], list[str]]:
+    """
+    Maps a raw record onto the inventory schema and validates it.
+
+    Args:
+        row: The raw record, e.g. a CSV row or a JSON object. Column names are matched loosely.
+        today: The ISO date used for missing `CreatedDate` and `UpdatedDate` values.
+
+    Returns:
+        The normalized item and a list of validation errors (empty if the item is valid).
+    """
+    item: dict[str, Any] = {}
+    errors: list[str] = []
+    for key, value in canonicalize_fields(row).items():
+        if key not in FIELDS:
+            errors.append(f"unknown field '{key}'")
+        elif value not in (None, ""):
+            item[key] = value.strip() if isinstance(value, str) else value
+
+    item.setdefault("CreatedDate", today)
+    item.setdefault("UpdatedDate", today)
+
+    if "UPC" in item:
+        upc = normalize_upc(item["UPC"])
+        if upc is None:
+            errors.append(f"invalid UPC '{item['UPC']}'")
+        else:
+            item["UPC"] = upc
+
+    if "Quantity" in item:
+        quantity = parse_quantity(item["Quantity"])
+        if quantity is None or quantity < 1:
+            errors.append(f"invalid Quantity '{item['Quantity']}'")
+        else:
+            item["Quantity"] = quantity
+    else:
+        item["Quantity"] = 1
+
+    if "PurchasePrice" in item:
+        price = parse_price(item["PurchasePrice"])
+        if price is None:
+            errors.append(f"invalid PurchasePrice '{item['PurchasePrice']}'")
+        else:
+            item["PurchasePrice"] = price
+
+    if "PriceHistory" in item:
+        history = item["PriceHistory"]
+        if isinstance(history, str):
+            try:
+                history = json.loads(history)
+            except ValueError:
+                history = None
+        if not isinstance(history, list) or not all(
+            isinstance(entry, dict) and "value" in entry and "date_checked" in entry
+            for entry in history
+        ):
+            errors.append("PriceHistory must be a list of objects with 'value' and 'date_checked'")
+        else:
+            item["PriceHistory"] = history
+
+    errors.extend(f"missing {field}" for field in REQUIRED_FIELDS if field not in item)
+    return item, errors
@@ -0,0 +1,1138 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The inventory tools, written once on top of an `InventoryStorage`.
+
+`FirestoreTools` and `SqliteTools` are these tools on a Firestore and a SQLite storage.
+Every write goes through a storage transaction that reads the items it changes first, so
+the portfolio summary and the compact price fields are computed from what is actually
+stored.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Iterable, Iterator, Optional
+from google.adk.tools import ToolContext
+
+from .inventory_cache import InventoryCache, cached_read
+from .inventory_schema import SUMMARY_FIELDS, parse_quantity
+from .portfolio_summary import SUMMARY_INPUT_FIELDS, SummaryDelta, merge_item, rebuild_summary
+from .price_history import ROLLUP_FIELD, append_price, compact_price_write, needs_compaction, price_entries
+from .pricing import is_price_stale, new_price_entry, parse_price, rollup_portfolio, summarize_prices
+from .storage import Condition, InventoryStorage, StorageTransaction
+from .title_search import (
+    MAX_CANDIDATES,
+    MAX_SCANNED_CANDIDATES,
+    MIN_SCORE,
+    SEARCH_KEYS_FIELD,
+    is_title_field,
+    query_keys,
+    similarity,
+    with_search_keys,
+    without_search_keys,
+)
+
+# Firestore rejects batches with more than 500 writes.
+MAX_BATCH_SIZE = 500
+# Item writes per batch, leaving room for the portfolio summary update.
+WRITES_PER_BATCH = MAX_BATCH_SIZE - 1
+# Price checks per batch: each writes the item and an entry in its raw history.
+PRICES_PER_BATCH = WRITES_PER_BATCH // 2
+
+# The default and maximum number of items returned by one page of a read tool.
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# The fields read before a write: the summary inputs plus the rollup the write extends.
+_WRITE_INPUT_FIELDS = [*SUMMARY_INPUT_FIELDS, ROLLUP_FIELD]
+
+# The fields a title search reads from each candidate.
+_TITLE_SEARCH_FIELDS = [*SUMMARY_FIELDS, SEARCH_KEYS_FIELD]
+
+# Firestore requires queries with these operators to be ordered by the filtered field first.
+_RANGE_OPERATORS = frozenset(("<", "<=", ">", ">=", "!=", "not-in"))
+
+PriceFetcher = Callable[[dict[str, Any]], Optional[float]]
+
+logger = logging.getLogger(__name__)
+
+
+class InventoryTools:
+    """The inventory tools agents call, on top of any `InventoryStorage`."""
+
+    def __init__(
+        self,
+        storage: InventoryStorage,
+        price_fetcher: Optional[PriceFetcher] = None,
+        max_workers: int = 8,
+        price_max_age: timedelta = timedelta(days=1),
+        cache: Optional[InventoryCache] = None,
+    ):
+        """
+        Initializes the tools.
+
+        Args:
+            storage: The database the inventory is stored in.
+            price_fetcher: Looks up the current market value of an item in USD. Used by
+                `value_portfolio` to refresh stale prices; returns None if no value was found.
+            max_workers: The maximum number of concurrent price lookups.
+            price_max_age: How old a price may be before it is considered stale.
+            cache: Optional read-through cache for inventory reads. Writes made through
+                these tools invalidate the affected entries.
+        """
+        self.storage = storage
+        self.price_fetcher = price_fetcher
+        self.max_workers = max_workers
+        self.price_max_age = price_max_age
+        self.cache = cache
+
+    @cached_read("document")
+    def get_document(
+        self,
+        collection_id: str,
+        document_id: str,
+        tool_context: ToolContext,
+        user_id: Optional[str] = None,
+    ) -> dict[str, Any]:
+        """
+        Fetches a document from a specified inventory path.
+
+        Args:
+            collection_id: The ID of the inventory category (e.g., 'dvd', 'figures').
+            document_id: The ID of the document to retrieve.
+            user_id: The ID of the user. If not provided, it will be inferred from the session.
+            tool_context: The context of the tool invocation.
+        """
+        user_id = user_id or tool_context.state.get("user_id") or "1"
+        data = self.storage.get(user_id, collection_id, document_id)
+        return without_search_keys(data) if data is not None else {"error": "Document not found."}
+
+    @cached_read("document")
+    def get_price_history(
+        self,
+        collection_id: str,
+        document_id: str,
+        tool_context: ToolContext,
+        user_id: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> dict[str, Any]:
+        """
+        Fetches every recorded price check of an item, newest first, and its price rollup.
+        Items only keep their latest prices in `PriceHistory`, so use this tool when the user
+        asks about older prices or how an item's value has changed over time.
+
+        Args:
+            collection_id: The ID of the inventory category (e.g., 'dvd', 'figures').
+            document_id: The ID of the item.
+            user_id: The ID of the user. If not provided, it will be inferred from the session.
+            limit: The maximum number of price checks to return (at most 500).
+            tool_context: The context of the tool invocation.
+        """
+        try:
+            user_id = user_id or tool_context.state.get("user_id") or "1"
+            item = self.storage.get(user_id, collection_id, document_id, ["PriceHistory", ROLLUP_FIELD])
+            if item is None:
+                return {"error": "Document not found."}
+            if needs_compaction(item):
+                # Items not migrated yet still hold their whole history in `PriceHistory`.
+                history = price_entries(item.get("PriceHistory"))[::-1][:_page_size(limit)]
+            else:
+                history = self.storage.price_history(user_id, collection_id, document_id, _page_size(limit))
+            return {"history": history, "rollup": item.get(ROLLUP_FIELD)}
+        except Exception as e:
+            return {"error": f"An unexpected error occurred while fetching the price history: {e}"}
+
+    def add_document(
+        self,
+        collection_id: str,
+        data: dict[str, Any],
+        tool_context: ToolContext,
+        user_id: Optional[str] = None,
+        document_id: Optional[str] = None,
+    ) -> str:
+        """
+        Adds a new document to a collection. If no document_id is provided, one will be auto-generated.
+
+        Args:
+            collection_id: The ID of the inventory category (e.g., 'dvd', 'figures').
+            data: A dictionary containing the data for the new document.
+            user_id: The ID of the user. If not provided, it will be inferred from the session.
+            document_id: The ID for the new document. If omitted, a random ID will be generated.
+            tool_context: The context of the tool invocation.
+        """
+        try:
+            error = _quantity_error(data)
+            if error:
+                return f"Error: {error}."
+            user_id = user_id or tool_context.state.get("user_id") or "1"
+            document_id = document_id or self.storage.new_document_id()
+            self._write_with_summary(user_id, collection_id, document_id, with_search_keys(data))
+            self._invalidate(user_id, collection_id, document_id)
+            return f"Successfully added document '{document_id}' to collection 'users/{user_id}/{collection_id}'."
+        except Exception as e:
+            return f"An unexpected error occurred while adding the document: {e}"
+
+    def update_document(
+        self,
+        collection_id: str,
+        document_id: str,
+        data: dict[str, Any],
+        tool_context: ToolContext,
+        user_id: Optional[str] = None,
+    ) -> str:
+        """
+        Updates an existing document, merging the new data.
+
+        Args:
+            collection_id: The ID of the inventory category (e.g., 'dvd', 'figures').
+            document_id: The ID of the document to update.
+            data: A dictionary containing the fields to update.
+            user_id: The ID of the user. If not provided, it will be inferred from the session.
+            tool_context: The context of the tool invocation.
+        """
+        try:
+            error = _quantity_error(data)
+            if error:
+                return f"Error: {error}."
+            user_id = user_id or tool_context.state.get("user_id") or "1"
+            self._write_with_summary(user_id, collection_id, document_id, with_search_keys(data), merge=True)
+            self._invalidate(user_id, collection_id, document_id)
+            return f"Successfully updated document at 'users/{user_id}/{collection_id}/{document_id}'."
+        except Exception as e:
+            return f"An unexpected error occurred while updating the document: {e}"
+
+    def delete_document(
+        self,
+        collection_id: str,
+        document_id: str,
+        tool_context: ToolContext,
+        user_id: Optional[str] = None,
+    ) -> str:
+        """
+        Deletes a document.
+
+        Args:
+            collection_id: The ID of the inventory category (e.g., 'dvd', 'figures').
+            document_id: The ID of the document to delete.
+            user_id: The ID of the user. If not provided, it will be inferred from the session.
+            tool_context: The context of the tool invocation.
+        """
+        try:
+            user_id = user_id or tool_context.state.get("user_id") or "1"
+            if not self._write_with_summary(user_id, collection_id, document_id, None):
+                return f"Error: Document '{document_id}' not found."
+            self.storage.delete_price_history(user_id, collection_id, [document_id])
+            self._invalidate(user_id, collection_id, document_id)
+            return f"Successfully deleted document at 'users/{user_id}/{collection_id}/{document_id}'."
+        except Exception as e:
+            return f"An unexpected error occurred while deleting the document: {e}"
+
+    def bulk_add_documents(
+        self,
+        collection_id: str,
+        documents: list[dict[str, Any]],
+        tool_context: ToolContext,
+        user_id: Optional[str] = None,
+    ) -> dict[str, Any]:
+        """
+        Adds several new documents to a collection at once. Document IDs are auto-generated.
+        Use this instead of calling `add_document` repeatedly when adding more than one item.
+
+        Args:
+            collection_id: The ID of the inventory category (e.g., 'dvd', 'figures').
+            documents: A list of dictionaries, each containing the data for one new document.
+            user_id: The ID of the user. If not provided, it will be inferred from the session.
+            tool_context: The context of the tool invocation.
+        """
+        try:
+            user_id = user_id or tool_context.state.get("user_id") or "1"
+            writes = [(self.storage.new_document_id(), with_search_keys(data)) for data in documents]
+            results = self._write_in_batches(user_id, collection_id, writes, "added")
+            for result in results:
+                self._invalidate(user_id, collection_id, result["document_id"])
+            return _bulk_summary(results)
+        except Exception as e:
+            return {"error": f"An unexpected error occurred while adding the documents: {e}"}
+
+    def bulk_update_documents(
+        self,
+        collection_id: str,
+        updates: list[dict[str, Any]],
+        tool_context: ToolContext,
+        user_id: Optional[str] = None,
+    ) -> dict[str, Any]:
+        """
+        Updates several existing documents at once, merging the new data into each.
+        Use this instead of calling `update_document` repeatedly when updating more than one item.
+
+        Args:
+            collection_id: The ID of the inventory category (e.g., 'dvd', 'figures').
+            updates: A list of objects, each with a `document_id` and a `data` dictionary of fields to update.
+            user_id: The ID of the user. If not provided, it will be inferred from the session.
+            tool_context: The context of the tool invocation.
+        """
+        try:
+            user_id = user_id or tool_context.state.get("user_id") or "1"
+            writes, rejected = _update_writes(updates)
+            results = self._write_in_batches(user_id, collection_id, writes, "updated", merge=True)
+            for result in results:
+                self._invalidate(user_id, collection_id, result["document_id"])
+            return _bulk_summary([*results, *rejected])
+        except Exception as e:
+            return {"error": f"An unexpected error occurred while updating the documents: {e}"}
+
+    def bulk_delete_documents(
+        self,
+        collection_id: str,
+        document_ids: list[str],
+        tool_context: ToolContext,
+        user_id: Optional[str] = None,
+    ) -> dict[str, Any]:
+        """
+        Deletes several documents at once.
+        Use this instead of calling `delete_document` repeatedly when deleting more than one item.
+
+        Args:
+            collection_id: The ID of the inventory category (e.g., 'dvd', 'figures').
+            document_ids: The IDs of the documents to delete.
+            user_id: The ID of the user. If not provided, it will be inferred from the session.
+            tool_context: The context of the tool invocation.
+        """
+        try:
+            user_id = user_id or tool_context.state.get("user_id") or "1"
+            writes = [(document_id, None) for document_id in document_ids]
+            results = self._write_in_batches(user_id, collection_id, writes, "deleted")
+            self.storage.delete_price_history(user_id, collection_id, sorted(_succeeded(results)))
+            for result in results:
+                self._invalidate(user_id, collection_id, result["document_id"])
+            return _bulk_summary(results)
+        except Exception as e:
+            return {"error": f"An unexpected error occurred while deleting the documents: {e}"}
+
+    @cached_read("collection")
+    def find_document_by_field(
+        self,
+        collection_id: str,
+        field: str,
+        value: Any,
+        tool_context: ToolContext,
+        user_id: Optional[str] = None,
+        limit: int = 5,
+    ) -> list[dict[str, Any]]:
+        """
+        Finds documents in a collection by matching a field with a specific value.
+        Use this to find the ID of a document when you only know its title or another property.
+        Titles are matched fuzzily: typos and missing words (e.g., '4K') still match, and the
+        best candidates are returned first with a `score` between 0 and 1. If too many items
+        share words with the title to rank them all, the matches are marked `partial`; a more
+        specific title narrows the search.
+
+        Args:
+            collection_id: The ID of the inventory category to search in (e.g., 'dvd', 'figures').
+            field: The document field to search on (e.g., 'title', 'name').
+            value: The value to match.
+            user_id: The ID of the user. If not provided, it will be inferred from the session.
+            limit: The maximum number of title matches to return.
+            tool_context: The context of the tool invocation.
+        """
+        user_id = user_id or tool_context.state.get("user_id") or "1"
+        if is_title_field(field) and isinstance(value, str) and query_keys(value):
+            search = _TitleSearch(value, limit)
+            while search.reading():
+                search.add_page(self.storage.query(
+                    user_id, collection_id, search.condition, _TITLE_SEARCH_FIELDS,
+                    cursor=search.cursor, limit=MAX_CANDIDATES))
+            if search.truncated:
+                # The exact title is ranked even if it was not among the candidates read.
+                search.add_exact(self.storage.query(user_id, collection_id, search.exact_condition, _TITLE_SEARCH_FIELDS))
+            matches = search.matches()
+            if matches:
+                return matches
+            # Items written before search keys existed are still found by their exact title.
+            field = "Title"
+        return _field_matches(self.storage.query(user_id, collection_id, (field, "==", value)))
+
+    @cached_read("collection")
+    def query_collection(
+        self,
+        collection_id: str,
+        field: str,
+        operator: str,
+        value: Any,
+        tool_context: ToolContext,
+        user_id: Optional[str] = None,
+        fields: Optional[list[str]] = None,
+        summary: bool = False,
+        limit: int = DEFAULT_PAGE_SIZE,
+        start_after: Optional[str] = None,
+    ) -> dict[str, Any]:
+        """
+        Performs a simple query on a collection and returns one page of matching items.
+        If `next_start_after` in the result is set, more items match; pass it as `start_after` to get them.
+
+        Args:
+            collection_id: The ID of the inventory category to query (e.g., 'dvd', 'figures').
+            field: The document field to filter on.
+            operator: The comparison operator (e.g., '==', '<', '>=').
+            value: The value to compare against.
+            user_id: The ID of the user. If not provided, it will be inferred from the session.
+            fields: Only return these fields of each item (e.g., ['Title', 'Quantity']). All fields if omitted.
+            summary: If True, returns each item's latest price instead of its full `PriceHistory`.
+            limit: The maximum number of items to return (at most 500).
+            start_after: The `next_start_after` value of the previous page.
+            tool_context: The context of the tool invocation.
+        """
+        user_id = user_id or tool_context.state.get("user_id") or "1"
+        limit = _page_size(limit)
+        cursor = None
+        if start_after:
+            cursor = self.storage.cursor(user_id, collection_id, start_after)
+            if cursor is None:
+                return _missing_cursor(start_after)
+        docs = self.storage.query(
+            user_id, collection_id, (field, operator, value), _page_fields(fields, summary),
+            order_field=_order_field(field, operator), cursor=cursor, limit=limit + 1,
+        )
+        return _page_result(docs, limit, summary)
+
+    @cached_read("user")
+    def list_inventory_categories(
+        self, tool_context: ToolContext, user_id: Optional[str] = None
+    ) -> list[str]:
+        """
+        Lists all inventory categories (subcollections) for a given user.
+
+        Args:
+            user_id: The ID of the user. If not provided, it will be inferred from the session.
+            tool_context: The context of the tool invocation.
+        """
+        user_id = user_id or tool_context.state.get("user_id") or "1"
+        return self.storage.categories(user_id)
+
+    @cached_read("user")
+    def get_all_user_inventory(
+        self,
+        tool_context: ToolContext,
+        user_id: Optional[str] = None,
+        summary: bool = True,
+        fields: Optional[list[str]] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        start_after: Optional[str] = None,
+    ) -> dict[str, Any]:
+        """
+        Fetches one page of inventory items across all categories for a given user.
+        Use this tool when the user asks for a summary of their items.
+        If `next_start_after` in the result is set, the user has more items; pass it as `start_after` to get them.
+
+        Args:
+            user_id: The ID of the user. If not provided, it will be inferred from the session.
+            summary: If True (the default), returns the title, UPC, format, condition, quantity and latest
+                price of each item. Set to False to return every field, including the full `PriceHistory`.
+            fields: Only return these fields of each item (e.g., ['Title', 'Quantity']). Ignored in summary mode.
+            limit: The maximum number of items to return (at most 500).
+            start_after: The `next_start_after` value of the previous page.
+            tool_context: The context of the tool invocation.
+        """
+        user_id = user_id or tool_context.state.get("user_id") or "1"
+        page = _InventoryPage(self.storage.categories(user_id), summary, limit, start_after)
+        for category_id in page.categories:
+            cursor = None
+            if page.cursor_id(category_id):
+                cursor = self.storage.cursor(user_id, category_id, page.cursor_id(category_id))
+                if cursor is None:
+                    return _missing_cursor(start_after)
+            docs = self.storage.query(
+                user_id, category_id, fields=_page_fields(fields, summary), cursor=cursor, limit=page.limit + 1)
+            if not page.add(category_id, docs):
+                break
+        return page.result()
+
+    @cached_read("user")
+    def aggregate_inventory(
+        self,
+        tool_context: ToolContext,
+        user_id: Optional[str] = None,
+        collection_id: Optional[str] = None,
+        field: Optional[str] = None,
+        operator: str = "==",
+        value: Any = None,
+        include_value: bool = False,
+        sum_field: Optional[str] = None,
+    ) -> dict[str, Any]:
+        """
+        Counts items and totals their quantities per category without fetching the items themselves.
+        Use this tool for questions like "how many Blu-rays do I own" or "what are my DVDs worth".
+
+        Args:
+            user_id: The ID of the user. If not provided, it will be inferred from the session.
+            collection_id: Only aggregate this inventory category (e.g., 'dvd'). All categories if omitted.
+            field: An optional document field to filter on (e.g., 'Format').
+            operator: The comparison operator for `field` (e.g., '==', '>=').
+            value: The value to compare `field` against.
+            include_value: If True, also totals each item's latest price times its quantity.
+            sum_field: An optional numeric field (e.g., 'PurchasePrice') to total and average.
+            tool_context: The context of the tool invocation.
+        """
+        try:
+            user_id = user_id or tool_context.state.get("user_id") or "1"
+            categories = [collection_id] if collection_id else self.storage.categories(user_id)
+            condition = (field, operator, value) if field else None
+            results = {
+                category_id: self._aggregate(user_id, category_id, condition, include_value, sum_field)
+                for category_id in categories
+            }
+            return _aggregation_summary(results)
+        except Exception as e:
+            return {"error": f"An unexpected error occurred while aggregating the inventory: {e}"}
+
+    def value_portfolio(
+        self,
+        tool_context: ToolContext,
+        user_id: Optional[str] = None,
+        refresh: bool = False,
+    ) -> dict[str, Any]:
+        """
+        Calculates the current total value of a user's inventory with a per-category breakdown.
+        Prices older than one day are refreshed automatically and saved to each item's price history.
+        Use this tool when the user asks what their items or assets are worth.
+
+        Args:
+            user_id: The ID of the user. If not provided, it will be inferred from the session.
+            refresh: If True, refreshes the price of every item, even recently checked ones.
+            tool_context: The context of the tool invocation.
+        """
+        try:
+            user_id = user_id or tool_context.state.get("user_id") or "1"
+            now = datetime.now(timezone.utc)
+
+            # Without a price fetcher nothing can be refreshed, so the stored summary is the answer.
+            answer_from_summary = self.price_fetcher is None and not refresh
+            if answer_from_summary:
+                summary = self.storage.read_summary(user_id)
+                if summary is not None:
+                    return _stored_valuation(summary)
+
+            items = [
+                (category_id, doc.id, doc.to_dict())
+                for category_id in self.storage.categories(user_id)
+                for doc in self.storage.query(user_id, category_id)
+            ]
+            if not items:
+                return {"message": "No inventory found for this user."}
+
+            prices, failed = self._fetch_prices(_stale_items(items, refresh, self.price_max_age, now))
+            written, unwritten = write_prices(self.storage, user_id, prices, now)
+            for category_id, document_id in written:
+                self._invalidate(user_id, category_id, document_id)
+            titles = {
+                (category_id, document_id): data.get("Title") or document_id for category_id, document_id, data in items
+            }
+            failed += [titles[key] for key in unwritten]
+
+            if answer_from_summary:
+                # The user has no summary yet, so seed it from this full scan.
+                self.storage.set_summary(user_id, rebuild_summary((category_id, data) for category_id, _, data in items))
+            return _valuation(items, written, failed, now)
+        except Exception as e:
+            return {"error": f"An unexpected error occurred while valuing the inventory: {e}"}
+
+    def _aggregate(
+        self,
+        user_id: str,
+        collection_id: str,
+        condition: Optional[Condition],
+        include_value: bool,
+        sum_field: Optional[str],
+    ) -> dict[str, Any]:
+        """Aggregates one category in the database, or in process when the latest prices are needed."""
+        if not include_value:
+            return self.storage.aggregate(user_id, collection_id, condition, sum_field)
+        docs = self.storage.query(user_id, collection_id, condition, _reducer_fields(sum_field))
+        return _reduce_items((doc.to_dict() for doc in docs), include_value, sum_field)
+
+    def _write_with_summary(
+        self,
+        user_id: str,
+        collection_id: str,
+        document_id: str,
+        data: Optional[dict[str, Any]],
+        merge: bool = False,
+    ) -> bool:
+        """
+        Sets, merges or (if `data` is None) deletes a document and applies the change to the
+        user's portfolio summary in the same transaction. New `PriceHistory` entries are
+        compacted into the item's rollup and appended to its raw history in that transaction too.
+
+        Returns:
+            Whether the document existed before the write. A missing document is not deleted.
+        """
+        def write(transaction: StorageTransaction) -> bool:
+            old_items = transaction.get_all(user_id, collection_id, [document_id], _WRITE_INPUT_FIELDS)
+            _write_planned(transaction, user_id, collection_id, [(document_id, data)], old_items, merge)
+            return document_id in old_items
+
+        return self.storage.transaction(write)
+
+    def _write_in_batches(
+        self,
+        user_id: str,
+        collection_id: str,
+        writes: list[tuple[str, Optional[dict[str, Any]]]],
+        status: str,
+        merge: bool = False,
+    ) -> list[dict[str, Any]]:
+        """
+        Writes documents in transactions of up to `WRITES_PER_BATCH` writes, each with its
+        change to the portfolio summary and the new `PriceHistory` entries of its items.
+
+        Updates (`merge`) and deletes (`None` data) only apply to documents that exist; the
+        others are reported as not found. A failed transaction marks only its own items as
+        errors; earlier ones stay committed.
+        """
+        results: list[dict[str, Any]] = []
+        for chunk in _chunks(writes):
+
+            def write(transaction: StorageTransaction) -> _PlannedWrites:
+                old_items = {}
+                if _reads_before_writing(chunk, merge):
+                    old_items = transaction.get_all(
+                        user_id, collection_id, [document_id for document_id, _ in chunk], _WRITE_INPUT_FIELDS)
+                return _write_planned(transaction, user_id, collection_id, chunk, old_items, merge, status)
+
+            try:
+                results.extend(self.storage.transaction(write).results)
+            except Exception as e:
+                results.extend(_failed_results(chunk, e))
+        return results
+
+    def _invalidate(
+        self, user_id: str, collection_id: Optional[str] = None, document_id: Optional[str] = None
+    ) -> None:
+        """Drops cached reads affected by a write to the given user, category or document."""
+        if self.cache is not None:
+            self.cache.invalidate(user_id, collection_id, document_id)
+
+    def _fetch_prices(
+        self, stale: list[tuple[str, str, dict[str, Any]]]
+    ) -> tuple[dict[tuple[str, str], float], list[str]]:
+        """Looks up fresh prices for stale items through a bounded worker pool, keyed by (category, document ID)."""
+        if not stale or self.price_fetcher is None:
+            return _fetched_prices(stale, [None] * len(stale))
+
+        def fetch(data: dict[str, Any]) -> Optional[float]:
+            try:
+                return parse_price(self.price_fetcher(data))
+            except Exception as e:
+                logger.warning("Could not value '%s': %s", data.get("Title"), e)
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            values = list(pool.map(fetch, [data for _, _, data in stale]))
+        return _fetched_prices(stale, values)
+
+    def get_tools(self) -> list[Callable]:
+        """Returns a list of all tool methods."""
+        return [
+            self.get_document,
+            self.get_price_history,
+            self.add_document,
+            self.update_document,
+            self.delete_document,
+            self.query_collection,
+            self.list_inventory_categories,
+            self.get_all_user_inventory,
+            self.aggregate_inventory,
+            self.find_document_by_field,
+            self.value_portfolio,
+            self.bulk_add_documents,
+            self.bulk_update_documents,
+            self.bulk_delete_documents,
+        ]
+
+
+class _PlannedWrites:
+    """The writes, summary change, raw price history and per-item results of one bulk write chunk."""
+
+    def __init__(self):
+        self.writes: list[tuple[str, Optional[dict[str, Any]]]] = []
+        self.delta = SummaryDelta()
+        self.history: list[tuple[str, dict[str, Any]]] = []
+        self.results: list[dict[str, Any]] = []
+
+
+def _chunks(writes: list[tuple[str, Optional[dict[str, Any]]]]) -> Iterator[list[tuple[str, Optional[dict[str, Any]]]]]:
+    """
+    Splits writes into chunks that fit in one transaction with the summary update.
+
+    Each item counts as one write plus one per `PriceHistory` entry it may add to its raw
+    history. An item with more entries than fit in a transaction is written on its own.
+    """
+    chunk: list[tuple[str, Optional[dict[str, Any]]]] = []
+    size = 0
+    for document_id, data in writes:
+        history = (data or {}).get("PriceHistory")
+        weight = 1 + (len(history) if isinstance(history, list) else 0)
+        if chunk and size + weight > WRITES_PER_BATCH:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append((document_id, data))
+        size += weight
+    if chunk:
+        yield chunk
+
+
+def _reads_before_writing(chunk: list[tuple[str, Optional[dict[str, Any]]]], merge: bool) -> bool:
+    """Whether a chunk updates or deletes items, which are read first; new items are not."""
+    return merge or any(data is None for _, data in chunk)
+
+
+def _planned_writes(
+    collection_id: str,
+    chunk: list[tuple[str, Optional[dict[str, Any]]]],
+    old_items: dict[str, dict[str, Any]],
+    status: str,
+    merge: bool = False,
+) -> _PlannedWrites:
+    """
+    Plans writes from the items as they were read, with their change to the portfolio summary.
+
+    Updates (`merge`) and deletes (None data) only apply to items that exist; the others are
+    reported as not found. Writes with an invalid `Quantity` are reported as errors.
+
+    Args:
+        collection_id: The category that is written to.
+        chunk: (document ID, data) pairs; None data deletes the document.
+        old_items: The items before the writes, keyed by document ID; missing items do not exist.
+        status: The status of a successful write in the results (e.g., 'added').
+        merge: Whether the data is merged into the existing items.
+    """
+    planned = _PlannedWrites()
+    for document_id, data in chunk:
+        old = old_items.get(document_id)
+        if (merge or data is None) and old is None:
+            planned.results.append({"document_id": document_id, "status": "not_found"})
+            continue
+        error = _quantity_error(data)
+        if error:
+            planned.results.append({"document_id": document_id, "status": "error", "error": error})
+            continue
+        if data is None:
+            planned.delta.add(collection_id, old, None)
+        else:
+            data, added = compact_price_write(old, _with_quantity(data, merge))
+            planned.delta.add(collection_id, old, merge_item(old, data) if merge else data)
+            planned.history.extend((document_id, entry) for entry in added)
+        planned.writes.append((document_id, data))
+        planned.results.append({"document_id": document_id, "status": status})
+    return planned
+
+
+def _quantity_error(data: Optional[dict[str, Any]]) -> Optional[str]:
+    """Returns why the `Quantity` of a write is rejected, or None if it is missing or a whole number."""
+    if data is None or data.get("Quantity") is None or parse_quantity(data["Quantity"]) is not None:
+        return None
+    return f"invalid Quantity '{data['Quantity']}': it must be a whole number of zero or more"
+
+
+def _with_quantity(data: dict[str, Any], merge: bool) -> dict[str, Any]:
+    """
+    Stores `Quantity` as a number, defaulting to one; invalid values are rejected by
+    `_quantity_error` before the write.
+
+    Database sums skip missing and non-numeric values, so they only agree with the
+    portfolio summary and the in-process totals if every stored quantity is a number.
+    """
+    if merge and "Quantity" not in data:
+        return data
+    quantity = data.get("Quantity")
+    return {**data, "Quantity": 1 if quantity is None else parse_quantity(quantity)}
+
+
+def _write_planned(
+    transaction: StorageTransaction,
+    user_id: str,
+    collection_id: str,
+    chunk: list[tuple[str, Optional[dict[str, Any]]]],
+    old_items: dict[str, dict[str, Any]],
+    merge: bool,
+    status: str = "written",
+) -> _PlannedWrites:
+    """
+    Plans writes from the items read in a transaction, then makes them, their new raw
+    `PriceHistory` entries and their summary change in it.
+    """
+    planned = _planned_writes(collection_id, chunk, old_items, status, merge)
+    for document_id, data in planned.writes:
+        if data is None:
+            transaction.delete(user_id, collection_id, document_id)
+        else:
+            transaction.set(user_id, collection_id, document_id, data, merge=merge)
+    for document_id, entry in planned.history:
+        transaction.add_price_entry(user_id, collection_id, document_id, entry)
+    transaction.apply_summary(user_id, planned.delta)
+    return planned
+
+
+def _page_size(limit: Any) -> int:
+    """Clamps a requested page size to between 1 and `MAX_PAGE_SIZE`."""
+    try:
+        return min(max(int(limit), 1), MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+
+
+def _page_fields(fields: Optional[list[str]], summary: bool) -> Optional[list[str]]:
+    """Returns the fields a page of items reads: the summary fields, the requested ones, or all (None)."""
+    if summary:
+        return list(SUMMARY_FIELDS)
+    return fields or None
+
+
+def _page_items(docs: list[Any], summary: bool) -> list[dict[str, Any]]:
+    """Converts a page of document snapshots to items that carry their document ID."""
+    items = [{"id": doc.id, **without_search_keys(doc.to_dict())} for doc in docs]
+    return [summarize_prices(item) for item in items] if summary else items
+
+
+def _page_result(docs: list[Any], limit: int, summary: bool) -> dict[str, Any]:
+    """Shapes a page read with one document more than `limit`, which tells whether there is a next page."""
+    return {
+        "items": _page_items(docs[:limit], summary),
+        "next_start_after": docs[limit - 1].id if len(docs) > limit else None,
+    }
+
+
+def _missing_cursor(start_after: str) -> dict[str, Any]:
+    return {"error": f"Document '{start_after}' to start after was not found."}
+
+
+def _order_field(field: str, operator: str) -> Optional[str]:
+    """Returns the field a filtered query must be ordered by first, if any."""
+    return field if operator in _RANGE_OPERATORS else None
+
+
+class _InventoryPage:
+    """
+    Assembles one page of `get_all_user_inventory` from the categories read in turn.
+
+    The caller reads `limit + 1` documents of each category in `categories`, starting after
+    `cursor_id(category)` if it returns an ID, and passes them to `add` until it returns False.
+    """
+
+    def __init__(self, categories: Iterable[str], summary: bool, limit: Any, start_after: Optional[str]):
+        self.summary = summary
+        self.limit = _page_size(limit)
+        self.start_after = start_after
+        self.start_category, _, self.start_id = (start_after or "").partition("/")
+        self.categories = sorted(category_id for category_id in categories if category_id >= self.start_category)
+        self.inventory: dict[str, list[dict[str, Any]]] = {}
+        self.next_start_after: Optional[str] = None
+
+    def cursor_id(self, category_id: str) -> Optional[str]:
+        """Returns the document a category is read after, or None to read it from the start."""
+        return self.start_id if category_id == self.start_category and self.start_id else None
+
+    def add(self, category_id: str, docs: list[Any]) -> bool:
+        """Adds the documents read from a category; returns False once the page is full."""
+        if docs[:self.limit]:
+            self.inventory[category_id] = _page_items(docs[:self.limit], self.summary)
+        if len(docs) > self.limit:
+            self.next_start_after = f"{category_id}/{docs[self.limit - 1].id}"
+            return False
+        self.limit -= len(docs)
+        if self.limit == 0 and category_id != self.categories[-1]:
+            self.next_start_after = f"{category_id}/{docs[-1].id}"
+            return False
+        return True
+
+    def result(self) -> dict[str, Any]:
+        if not self.inventory and not self.start_after:
+            return {"message": "No inventory found for this user."}
+        return {"inventory": self.inventory, "next_start_after": self.next_start_after}
+
+
+def _reducer_fields(sum_field: Optional[str]) -> list[str]:
+    """Returns the fields the in-process reducer needs, so nothing else is read."""
+    return ["Quantity", "PriceHistory"] + ([sum_field] if sum_field else [])
+
+
+def _reduce_items(
+    items: Iterable[dict[str, Any]], include_value: bool, sum_field: Optional[str]
+) -> dict[str, Any]:
+    """Computes the same per-category totals as a database aggregation from the items themselves."""
+    items = list(items)
+    rollup = rollup_portfolio(("", item) for item in items)["categories"].get("") or {
+        "items": 0, "quantity": 0, "value": 0.0, "unpriced": 0,
+    }
+    totals: dict[str, Any] = {"items": rollup["items"], "quantity": rollup["quantity"]}
+    if include_value:
+        totals.update(value=rollup["value"], unpriced=rollup["unpriced"])
+    if sum_field:
+        # Like Firestore's sum and avg, ignore values that are not numbers.
+        numbers = [
+            item[sum_field] for item in items
+            if isinstance(item.get(sum_field), (int, float)) and not isinstance(item.get(sum_field), bool)
+        ]
+        totals[f"{sum_field}_total"] = round(sum(numbers), 2)
+        totals[f"{sum_field}_average"] = round(sum(numbers) / len(numbers), 2) if numbers else None
+    return totals
+
+
+def _aggregation_summary(categories: dict[str, dict[str, Any]]) -> dict[str, Any]:
+    """Adds the totals of all categories to the per-category results; averages are per category only."""
+    totals: dict[str, Any] = {}
+    for category in categories.values():
+        for key, value in category.items():
+            if not key.endswith("_average"):
+                totals[key] = totals.get(key, 0) + (value or 0)
+    for key in ("value", *(key for key in totals if key.endswith("_total"))):
+        if key in totals:
+            totals[key] = round(totals[key], 2)
+    return {"currency": "USD", "totals": totals, "categories": categories}
+
+
+def write_prices(
+    storage: InventoryStorage, user_id: str, prices: dict[tuple[str, str], float], now: datetime
+) -> tuple[dict[tuple[str, str], dict[str, Any]], list[tuple[str, str]]]:
+    """
+    Appends new prices to items' compact price fields and raw history, with their change to the
+    portfolio summary, in transactions of up to `PRICES_PER_BATCH` items of one category.
+
+    The items are read inside their transaction, so a concurrent write to one of them makes the
+    transaction retry instead of a price entry being lost. A failed transaction only fails its
+    own items; earlier ones stay committed.
+
+    Args:
+        storage: The database the items are stored in.
+        user_id: The user who owns the items.
+        prices: The new prices, keyed by (category, document ID).
+        now: The time the prices were checked.
+
+    Returns:
+        The price fields written to each item, keyed by (category, document ID), and the keys
+        of the items whose transaction failed. Items deleted since they were read are in neither.
+    """
+    by_category: dict[str, list[tuple[str, float]]] = {}
+    for (collection_id, document_id), value in prices.items():
+        by_category.setdefault(collection_id, []).append((document_id, value))
+
+    written: dict[tuple[str, str], dict[str, Any]] = {}
+    failed: list[tuple[str, str]] = []
+    for collection_id, category_prices in by_category.items():
+        for start in range(0, len(category_prices), PRICES_PER_BATCH):
+            chunk = category_prices[start:start + PRICES_PER_BATCH]
+
+            def write(transaction: StorageTransaction) -> dict[str, dict[str, Any]]:
+                old_items = transaction.get_all(
+                    user_id, collection_id, [document_id for document_id, _ in chunk], _WRITE_INPUT_FIELDS)
+                updates: dict[str, dict[str, Any]] = {}
+                delta = SummaryDelta()
+                for document_id, value in chunk:
+                    if document_id not in old_items:
+                        continue
+                    entry = new_price_entry(value, now)
+                    updates[document_id] = _priced_item(collection_id, old_items[document_id], entry, now, delta)
+                    transaction.set(user_id, collection_id, document_id, updates[document_id], merge=True)
+                    transaction.add_price_entry(user_id, collection_id, document_id, entry)
+                transaction.apply_summary(user_id, delta)
+                return updates
+
+            try:
+                updates = storage.transaction(write)
+            except Exception as e:
+                logger.warning("Could not write %d prices to 'users/%s/%s': %s", len(chunk), user_id, collection_id, e)
+                failed += [(collection_id, document_id) for document_id, _ in chunk]
+                continue
+            written.update(((collection_id, document_id), update) for document_id, update in updates.items())
+    return written, failed
+
+
+def _priced_item(
+    collection_id: str, item: dict[str, Any], entry: dict[str, Any], now: datetime, delta: SummaryDelta
+) -> dict[str, Any]:
+    """Returns the fields to update on an item for a new price check; its summary change is added to `delta`."""
+    prices_after = append_price(item, entry)
+    delta.add(collection_id, item, {**item, **prices_after})
+    return {**prices_after, "UpdatedDate": now.date().isoformat()}
+
+
+def _title_condition(value: str) -> Condition:
+    """Returns the filter for the items sharing a trigram with a title."""
+    return (SEARCH_KEYS_FIELD, "array_contains_any", query_keys(value))
+
+
+class _TitleSearch:
+    """
+    Pages through the candidates of a fuzzy title search and ranks them.
+
+    While `reading()`, the caller reads up to `MAX_CANDIDATES` items matching `condition`
+    in document ID order, after `cursor` if set, and passes them to `add_page`. Reading stops
+    once `limit` items have exactly the title, since nothing read later can rank above them,
+    or after `MAX_SCANNED_CANDIDATES` items; the search is then `truncated`, and the caller
+    adds the items matching `exact_condition` with `add_exact`.
+    """
+
+    def __init__(self, value: str, limit: int):
+        self.value = value
+        self.limit = limit
+        self.condition = _title_condition(value)
+        self.exact_condition: Condition = ("Title", "==", value)
+        self.cursor: Optional[Any] = None
+        self.truncated = True
+        self._candidates: list[tuple[str, dict[str, Any]]] = []
+        self._exact = 0
+
+    def reading(self) -> bool:
+        return self.truncated and len(self._candidates) < MAX_SCANNED_CANDIDATES
+
+    def add_page(self, docs: list[Any]) -> None:
+        page = [(doc.id, doc.to_dict()) for doc in docs]
+        self._candidates += page
+        self._exact += _exact_titles(self.value, page)
+        if len(docs) < MAX_CANDIDATES or self._exact >= max(int(self.limit), 1):
+            self.truncated = False
+        else:
+            self.cursor = docs[-1]
+
+    def add_exact(self, docs: list[Any]) -> None:
+        self._candidates += [(doc.id, doc.to_dict()) for doc in docs]
+
+    def matches(self) -> list[dict[str, Any]]:
+        """Returns the best matches, marked `partial` if the search was truncated."""
+        matches = _ranked_matches(self.value, dict(self._candidates).items(), self.limit)
+        return _partial(matches) if self.truncated else matches
+
+
+def _field_matches(docs: Iterable[Any]) -> list[dict[str, Any]]:
+    """Shapes the results of an exact field lookup."""
+    return [{"id": doc.id, "data": without_search_keys(doc.to_dict())} for doc in docs]
+
+
+def _exact_titles(value: str, docs: Iterable[tuple[str, dict[str, Any]]]) -> int:
+    """Counts the candidates whose title has exactly the trigrams of `value`."""
+    return sum(similarity(value, data.get(SEARCH_KEYS_FIELD)) == 1.0 for _, data in docs)
+
+
+def _partial(matches: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Marks the matches of a search that could not rank every candidate."""
+    return [{**match, "partial": True} for match in matches]
+
+
+def _ranked_matches(value: str, docs: Iterable[tuple[str, dict[str, Any]]], limit: int) -> list[dict[str, Any]]:
+    """Ranks title search candidates by similarity to the query, keeping the best `limit` matches."""
+    scored = [(similarity(value, data.get(SEARCH_KEYS_FIELD)), doc_id, data) for doc_id, data in docs]
+    scored = sorted((match for match in scored if match[0] >= MIN_SCORE), key=lambda match: -match[0])
+    return [
+        {"id": doc_id, "score": round(score, 3), "data": summarize_prices(without_search_keys(data))}
+        for score, doc_id, data in scored[:max(int(limit), 1)]
+    ]
+
+
+def _failed_results(chunk: list[tuple[str, Any]], error: Exception) -> list[dict[str, Any]]:
+    """Builds the per-item results of a chunk of writes that failed together."""
+    return [{"document_id": document_id, "status": "error", "error": str(error)} for document_id, _ in chunk]
+
+
+def _update_writes(updates: list[Any]) -> tuple[list[tuple[str, dict[str, Any]]], list[dict[str, Any]]]:
+    """
+    Splits the entries of `bulk_update_documents` into (document ID, data) writes and the
+    per-item errors of entries without a `document_id` or with `data` that is not an object.
+    """
+    writes, rejected = [], []
+    for update in updates:
+        if not isinstance(update, dict):
+            rejected.append({"document_id": None, "status": "error",
+                             "error": "each update must be an object with a 'document_id' and 'data'"})
+            continue
+        document_id, data = update.get("document_id"), update.get("data")
+        if not isinstance(document_id, str) or not document_id:
+            rejected.append({"document_id": document_id, "status": "error", "error": "missing 'document_id'"})
+        elif data is not None and not isinstance(data, dict):
+            rejected.append({"document_id": document_id, "status": "error",
+                             "error": "'data' must be an object of fields to update"})
+        else:
+            writes.append((document_id, with_search_keys(data or {})))
+    return writes, rejected
+
+
+def _stale_items(
+    items: list[tuple[str, str, dict[str, Any]]], refresh: bool, max_age: timedelta, now: datetime
+) -> list[tuple[str, str, dict[str, Any]]]:
+    """Returns the (category, document ID, data) of the items whose price is refreshed."""
+    return [item for item in items if refresh or is_price_stale(item[2], max_age, now)]
+
+
+def _fetched_prices(
+    stale: list[tuple[str, str, dict[str, Any]]], values: list[Optional[float]]
+) -> tuple[dict[tuple[str, str], float], list[str]]:
+    """
+    Pairs the prices looked up for stale items with the items.
+
+    Returns:
+        The prices found, keyed by (category, document ID), and the titles of the items without one.
+    """
+    prices: dict[tuple[str, str], float] = {}
+    failed: list[str] = []
+    for (category_id, document_id, data), value in zip(stale, values):
+        if value is None:
+            failed.append(data.get("Title") or document_id)
+        else:
+            prices[category_id, document_id] = value
+    return prices, failed
+
+
+def _stored_valuation(summary: dict[str, Any]) -> dict[str, Any]:
+    """Completes a stored portfolio summary as the result of `value_portfolio`."""
+    summary.update({"refreshed": 0, "not_refreshed": []})
+    return summary
+
+
+def _valuation(
+    items: list[tuple[str, str, dict[str, Any]]],
+    written: dict[tuple[str, str], dict[str, Any]],
+    failed: list[str],
+    now: datetime,
+) -> dict[str, Any]:
+    """
+    Values every item, with the price fields just written applied to them.
+
+    Args:
+        items: The (category, document ID, data) of every item the user owns.
+        written: The price fields written to refreshed items, keyed by (category, document ID).
+        failed: The titles of the items whose price could not be refreshed.
+        now: The time of the valuation.
+    """
+    for category_id, document_id, data in items:
+        if (category_id, document_id) in written:
+            data.update(written[category_id, document_id])
+    summary = rollup_portfolio((category_id, data) for category_id, _, data in items)
+    summary.update({
+        "as_of": now.isoformat(timespec="seconds"),
+        "refreshed": len(written),
+        "not_refreshed": failed[:20],
+    })
+    return summary
+
+
+def _succeeded(results: list[dict[str, Any]]) -> set[str]:
+    """Returns the IDs of the documents a bulk write succeeded for."""
+    return {result["document_id"] for result in results if result["status"] not in ("error", "not_found")}
+
+
+def _bulk_summary(results: list[dict[str, Any]]) -> dict[str, Any]:
+    """Summarizes the per-item results of a bulk write."""
+    succeeded = sum(1 for result in results if result["status"] not in ("error", "not_found"))
+    return {"succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
@@ -0,0 +1,259 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Cross-user market price table that lets value_agent skip repeat eBay lookups."""
+
+import asyncio
+import logging
+import re
+import threading
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.cloud import firestore
+from google.genai import types
+
+from .catalog import text_of
+from .inventory_schema import normalize_upc
+from .pricing import parse_date, parse_price_reply
+
+logger = logging.getLogger(__name__)
+
+# Session state key set by callers that consult the price table themselves.
+SKIP_PRICE_CACHE = "skip_market_price_cache"
+
+_PRICE_CACHE_ANSWER_PREFIX = "Market value from the shared price table:"
+_UPC_IN_QUERY = re.compile(r"(?<!\d)\d{12,13}(?!\d)")
+_NEW_CONDITION = re.compile(r"\b(?:new|sealed|mint)\b", re.IGNORECASE)
+_USED_CONDITION = re.compile(r"\b(?:used|pre-?owned|opened|open box)\b", re.IGNORECASE)
+
+
+def normalize_condition(value: Any) -> str:
+    """Buckets a free-text condition into "new", "used" or "any" (unknown)."""
+    text = str(value or "")
+    # "Used - like new" is a used copy, so check for used first.
+    if _USED_CONDITION.search(text):
+        return "used"
+    if _NEW_CONDITION.search(text):
+        return "new"
+    return "any"
+
+
+def price_key(upc: Any, condition: Any) -> Optional[str]:
+    """Returns the price table document ID for a UPC and condition, or None without a valid UPC."""
+    upc = normalize_upc(upc)
+    return f"{upc}_{normalize_condition(condition)}" if upc else None
+
+
+class MarketPriceCache:
+    """
+    A cross-user table of market prices, keyed by UPC and condition.
+
+    Entries live in a top-level Firestore collection. An entry older than `max_age`
+    counts as a miss, so the price is looked up again and the entry is rewritten.
+    Concurrent lookups of the same key, from any thread or event loop, share a single
+    in-flight fetch.
+    """
+
+    def __init__(
+        self,
+        db: firestore.Client,
+        collection: str = "market_prices",
+        max_age: timedelta = timedelta(days=1),
+    ):
+        """
+        Initializes the price table.
+
+        Args:
+            db: The blocking Firestore client holding the price collection. It is used from
+                worker threads, so lookups work from any event loop.
+            collection: The name of the top-level price collection.
+            max_age: How long a price is reused before it is looked up again.
+        """
+        self.db = db
+        self.collection = collection
+        self.max_age = max_age
+        self._inflight: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.stores = 0
+
+    def lookup(self, upc: Any, condition: Any) -> Optional[dict[str, Any]]:
+        """Returns the fresh price entry for a UPC and condition, if any."""
+        key = price_key(upc, condition)
+        if key is None:
+            return None
+        doc = self.db.collection(self.collection).document(key).get()
+        entry = doc.to_dict() if doc.exists else None
+        if entry is None or not self._is_fresh(entry):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def store(self, upc: Any, condition: Any, value: float) -> None:
+        """Saves a freshly checked price for a UPC and condition."""
+        key = price_key(upc, condition)
+        if key is None:
+            return
+        self.db.collection(self.collection).document(key).set({
+            "UPC": normalize_upc(upc),
+            "Condition": normalize_condition(condition),
+            "value": round(value, 2),
+            "checked_at": datetime.now(timezone.utc),
+        })
+        self.stores += 1
+
+    async def get_or_fetch(
+        self, item: dict[str, Any], fetch: Callable[[], Awaitable[Any]]
+    ) -> Optional[float]:
+        """
+        Returns the item's price from the table, calling `fetch` only on a miss or an expired entry.
+
+        Args:
+            item: The inventory item; its `UPC` and `Condition` select the entry.
+            fetch: Coroutine function that looks up the price, e.g. by running value_agent.
+                It returns a price in USD, the value agent's reply text, or None. Replies are
+                parsed with `parse_price_reply`, and only a price is stored.
+        """
+        key = price_key(item.get("UPC"), item.get("Condition"))
+        if key is None:
+            return _fetched_price(await fetch())
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self.shared += 1
+        if not owner:
+            return await asyncio.wrap_future(future)
+
+        try:
+            value = await self._fetch_through(item, fetch)
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, value=value)
+        return value
+
+    async def before_agent_callback(self, callback_context: CallbackContext) -> Optional[types.Content]:
+        """Answers from the price table and skips the agent run on a hit."""
+        query = self._chat_query(callback_context)
+        if query is None:
+            return None
+        upc, condition = query
+        try:
+            entry = await asyncio.to_thread(self.lookup, upc, condition)
+        except Exception:
+            # The table is an optimization; fall back to a full valuation.
+            return None
+        if entry is None:
+            return None
+        return types.Content(role="model", parts=[types.Part(text=(
+            f"{_PRICE_CACHE_ANSWER_PREFIX} ${entry['value']:.2f} for UPC {entry['UPC']} "
+            f"({entry['Condition']} condition), checked {parse_date(entry['checked_at']).date().isoformat()}.\n"
+            f"VALUE: ${entry['value']:.2f}"
+        ))])
+
+    async def after_agent_callback(self, callback_context: CallbackContext) -> None:
+        """Stores the price the agent found for a UPC named in the request."""
+        query = self._chat_query(callback_context)
+        if query is None:
+            return None
+        session = callback_context._invocation_context.session
+        answer = next((
+            text_of(event.content) for event in reversed(session.events)
+            if event.author == callback_context.agent_name and text_of(event.content)
+        ), None)
+        if answer is None or answer.startswith(_PRICE_CACHE_ANSWER_PREFIX):
+            return None
+        # Bare numbers in an answer are often UPCs or years, so only the `VALUE:` line counts.
+        value = parse_price_reply(answer)
+        if value is not None:
+            try:
+                await asyncio.to_thread(self.store, *query, value)
+            except Exception as e:
+                # The answer is already given; the next valuation of the UPC stores it.
+                logger.warning("Could not store the market price of UPC %s: %s", query[0], e)
+        return None
+
+    def stats(self) -> dict[str, Any]:
+        """Returns hit/miss counters; every hit or shared fetch is a valuation that skipped the model."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "shared": self.shared,
+            "stores": self.stores,
+            "inflight": len(self._inflight),
+        }
+
+    async def _fetch_through(
+        self, item: dict[str, Any], fetch: Callable[[], Awaitable[Any]]
+    ) -> Optional[float]:
+        """Reads the table and falls back to `fetch`, storing what it finds."""
+        upc, condition = item.get("UPC"), item.get("Condition")
+        try:
+            entry = await asyncio.to_thread(self.lookup, upc, condition)
+        except Exception:
+            entry = None
+        if entry is not None:
+            return float(entry["value"])
+        value = _fetched_price(await fetch())
+        if value is not None:
+            try:
+                await asyncio.to_thread(self.store, upc, condition, value)
+            except Exception as e:
+                logger.warning("Could not store the market price of UPC %s: %s", upc, e)
+        return value
+
+    def _settle(
+        self, key: str, future: Future, value: Optional[float] = None, error: Optional[BaseException] = None
+    ) -> None:
+        """Hands the result of an in-flight fetch to every waiter and forgets it."""
+        with self._lock:
+            self._inflight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(value)
+
+    def _chat_query(self, callback_context: CallbackContext) -> Optional[tuple[str, str]]:
+        """Returns the UPC and condition named in a chat request, unless the caller skips the table."""
+        if callback_context.state.get(SKIP_PRICE_CACHE):
+            return None
+        query = text_of(callback_context.user_content)
+        upc_match = _UPC_IN_QUERY.search(query or "")
+        if upc_match is None:
+            return None
+        return upc_match.group(0), normalize_condition(query)
+
+    def _is_fresh(self, entry: dict[str, Any]) -> bool:
+        checked_at = parse_date(entry.get("checked_at"))
+        return checked_at is not None and datetime.now(timezone.utc) - checked_at <= self.max_age
+
+
+def _fetched_price(result: Any) -> Optional[float]:
+    """Returns the price a fetch found: a positive number as is, text only through its `VALUE:` line."""
+    if isinstance(result, bool) or result is None:
+        return None
+    value = float(result) if isinstance(result, (int, float)) else parse_price_reply(str(result))
+    return value if value is not None and value > 0 else None
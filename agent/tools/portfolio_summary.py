@@ -0,0 +1,141 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The per-user portfolio summary stored on the `users/{user_id}` document.
+
+Writes to the inventory apply the change they make to the item counts, quantities and
+latest-value sums as `Increment` deltas, so the summary never has to be recomputed.
+`rebuild_summary` recomputes it from scratch to repair drift. Deltas applied before the
+first rebuild only describe part of the inventory, so a summary is only trusted once it
+has been rebuilt (it then has a `built_at` time).
+"""
+
+from typing import Any, Iterable, Optional
+
+from google.cloud import firestore
+
+from .pricing import item_quantity, latest_price, rollup_portfolio
+
+SUMMARY_FIELD = "PortfolioSummary"
+# The item fields that affect the summary; reading only these is enough to compute a delta.
+SUMMARY_INPUT_FIELDS = ["Quantity", "PriceHistory"]
+
+_TOTALS = ("items", "quantity", "value", "unpriced")
+
+
+def item_totals(item: Optional[dict[str, Any]]) -> dict[str, float]:
+    """Returns what a single item (or None for no item) contributes to the summary."""
+    if item is None:
+        return dict.fromkeys(_TOTALS, 0)
+    quantity = item_quantity(item)
+    price = latest_price(item)
+    return {
+        "items": 1,
+        "quantity": quantity,
+        "value": price * quantity if price is not None else 0.0,
+        "unpriced": 1 if price is None else 0,
+    }
+
+
+def merge_item(old: Optional[dict[str, Any]], data: dict[str, Any]) -> dict[str, Any]:
+    """Returns the item as it is after `set(data, merge=True)`, for the top-level fields of the schema."""
+    return {**(old or {}), **data}
+
+
+class SummaryDelta:
+    """Accumulates the per-category changes that a set of writes makes to one user's summary."""
+
+    def __init__(self):
+        self.categories: dict[str, dict[str, float]] = {}
+
+    def add(
+        self, collection_id: str, old: Optional[dict[str, Any]], new: Optional[dict[str, Any]]
+    ) -> None:
+        """
+        Records a write to one item.
+
+        Args:
+            collection_id: The inventory category of the item.
+            old: The item before the write, or None if it did not exist.
+            new: The item after the write, or None if it was deleted.
+        """
+        before, after = item_totals(old), item_totals(new)
+        change = self.categories.setdefault(collection_id, dict.fromkeys(_TOTALS, 0))
+        for key in _TOTALS:
+            change[key] += after[key] - before[key]
+
+    def update(self) -> Optional[dict[str, Any]]:
+        """Returns the data to `set(..., merge=True)` on the user document, or None if nothing changed."""
+        categories: dict[str, dict[str, Any]] = {}
+        total: dict[str, float] = dict.fromkeys(_TOTALS, 0)
+        for collection_id, change in self.categories.items():
+            change = {key: round(value, 2) for key, value in change.items() if round(value, 2)}
+            if change:
+                categories[collection_id] = {key: firestore.Increment(value) for key, value in change.items()}
+                for key, value in change.items():
+                    total[key] += value
+        if not categories:
+            return None
+        return {SUMMARY_FIELD: {
+            "categories": categories,
+            "total": {key: firestore.Increment(round(value, 2)) for key, value in total.items() if value},
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        }}
+
+
+def rebuild_summary(inventory: Iterable[tuple[str, dict[str, Any]]]) -> dict[str, Any]:
+    """
+    Computes a user's summary from scratch.
+
+    Args:
+        inventory: (category, item data) pairs for every item the user owns.
+
+    Returns:
+        The data to `set(..., merge=[SUMMARY_FIELD])` on the user document, which replaces the
+        whole summary, including categories that no longer exist.
+    """
+    rollup = rollup_portfolio(inventory)
+    return {SUMMARY_FIELD: {
+        "categories": rollup["categories"],
+        "total": {key: sum(c[key] for c in rollup["categories"].values()) for key in _TOTALS},
+        "built_at": firestore.SERVER_TIMESTAMP,
+        "updated_at": firestore.SERVER_TIMESTAMP,
+    }}
+
+
+def read_summary(user_data: Optional[dict[str, Any]]) -> Optional[dict[str, Any]]:
+    """Formats the summary stored on a user document like `rollup_portfolio`; None if there is none yet."""
+    summary = (user_data or {}).get(SUMMARY_FIELD)
+    if not summary or not summary.get("built_at"):
+        return None
+    categories = {
+        collection_id: {
+            "items": int(totals.get("items", 0)),
+            "quantity": int(totals.get("quantity", 0)),
+            "value": round(totals.get("value", 0.0), 2),
+            "unpriced": int(totals.get("unpriced", 0)),
+        }
+        for collection_id, totals in (summary.get("categories") or {}).items()
+        if totals.get("items")
+    }
+    total = summary.get("total") or {}
+    return {
+        "currency": "USD",
+        "total_value": round(total.get("value", 0.0), 2),
+        "total_items": int(total.get("items", 0)),
+        "total_quantity": int(total.get("quantity", 0)),
+        "categories": categories,
+        "as_of": summary["updated_at"].isoformat(timespec="seconds") if summary.get("updated_at") else None,
+    }
@@ -0,0 +1,139 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compact price storage: a bounded `PriceHistory` and a `PriceRollup` on the item, with
+every raw price check in an append-only `price_history` subcollection of the item.
+
+A converted item's `PriceHistory` keeps only its last `RECENT_PRICES` entries, so everything that
+reads the latest price keeps working while the document stays the same size however
+long the item is tracked. `PriceRollup` holds the count, minimum and maximum of all
+checks plus daily and weekly points (the last check of each day or ISO week).
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from typing import Any, Iterable, Optional
+
+from .pricing import parse_date, parse_price
+
+HISTORY_COLLECTION = "price_history"
+ROLLUP_FIELD = "PriceRollup"
+
+RECENT_PRICES = 10
+DAILY_POINTS = 30
+WEEKLY_POINTS = 52
+
+
+def entry_id(entry: dict[str, Any]) -> str:
+    """Returns a deterministic document ID for a raw price check, so re-appending it is a no-op."""
+    key = f"{entry.get('date_checked')}|{entry.get('value')}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+
+
+def _checked(entry: dict[str, Any]) -> datetime:
+    return parse_date(entry.get("date_checked")) or datetime.min.replace(tzinfo=timezone.utc)
+
+
+def price_entries(history: Any) -> list[dict[str, Any]]:
+    """Returns the well-formed entries of a `PriceHistory` list, oldest first."""
+    entries = [entry for entry in history or [] if isinstance(entry, dict) and "value" in entry]
+    return sorted(entries, key=_checked)
+
+
+def _add_point(points: list[dict[str, Any]], key: str, period: str, value: float, keep: int) -> None:
+    """Sets the value of a period in a list of points sorted by period, keeping the last `keep`."""
+    for point in points:
+        if point[key] == period:
+            point["value"] = value
+            break
+    else:
+        points.append({key: period, "value": value})
+        points.sort(key=lambda point: point[key])
+    del points[:-keep]
+
+
+def roll_up_prices(rollup: Optional[dict[str, Any]], entries: Iterable[dict[str, Any]]) -> dict[str, Any]:
+    """Returns a `PriceRollup` with the given price checks folded in."""
+    rollup = {
+        "count": 0, "min": None, "max": None, "first_checked": None, "daily": [], "weekly": [],
+        **(rollup or {}),
+    }
+    rollup["daily"] = [dict(point) for point in rollup["daily"]]
+    rollup["weekly"] = [dict(point) for point in rollup["weekly"]]
+    for entry in price_entries(entries):
+        value = parse_price(entry.get("value"))
+        if value is None:
+            continue
+        rollup["count"] += 1
+        rollup["min"] = value if rollup["min"] is None else min(rollup["min"], value)
+        rollup["max"] = value if rollup["max"] is None else max(rollup["max"], value)
+        checked = parse_date(entry.get("date_checked"))
+        if checked is None:
+            continue
+        if rollup["first_checked"] is None or checked < parse_date(rollup["first_checked"]):
+            rollup["first_checked"] = checked.isoformat(timespec="seconds")
+        year, week, _ = checked.isocalendar()
+        _add_point(rollup["daily"], "date", checked.date().isoformat(), value, DAILY_POINTS)
+        _add_point(rollup["weekly"], "week", f"{year}-W{week:02d}", value, WEEKLY_POINTS)
+    return rollup
+
+
+def append_price(item: dict[str, Any], entry: dict[str, Any]) -> dict[str, Any]:
+    """Returns the price fields of an item after appending one price check."""
+    history = price_entries(list(item.get("PriceHistory") or []) + [entry])
+    if needs_compaction(item):
+        # Only `migrate price-history` trims an old item, after copying its entries to the raw history.
+        return {"PriceHistory": history}
+    return {
+        "PriceHistory": history[-RECENT_PRICES:],
+        ROLLUP_FIELD: roll_up_prices(item.get(ROLLUP_FIELD), [entry]),
+    }
+
+
+def compact_price_write(
+    old: Optional[dict[str, Any]], data: dict[str, Any]
+) -> tuple[dict[str, Any], list[dict[str, Any]]]:
+    """
+    Compacts the `PriceHistory` an agent or an import writes to an item.
+
+    Entries that the item did not have yet are folded into its `PriceRollup`, and the
+    written `PriceHistory` is trimmed to the last `RECENT_PRICES` entries. Items still in
+    the old format are written unchanged until `migrate price-history` converts them.
+
+    Args:
+        old: The item before the write (at least its `PriceHistory` and `PriceRollup`), or None.
+        data: The data being written.
+
+    Returns:
+        The data to write instead, and the new entries to append to the raw history.
+    """
+    if not isinstance(data.get("PriceHistory"), list):
+        return data, []
+    if old is not None and needs_compaction(old):
+        return data, []
+    known = {entry_id(entry) for entry in price_entries((old or {}).get("PriceHistory"))}
+    history = price_entries(data["PriceHistory"])
+    added = [entry for entry in history if entry_id(entry) not in known]
+    return {
+        **data,
+        "PriceHistory": history[-RECENT_PRICES:],
+        ROLLUP_FIELD: roll_up_prices((old or {}).get(ROLLUP_FIELD), added),
+    }, added
+
+
+def needs_compaction(item: dict[str, Any]) -> bool:
+    """Returns True if an item still stores its prices in the old, unbounded format."""
+    history = item.get("PriceHistory") or []
+    return bool(history) and (ROLLUP_FIELD not in item or len(history) > RECENT_PRICES)
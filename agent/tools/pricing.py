@@ -0,0 +1,177 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Helpers for reading and valuing the `PriceHistory` of inventory items."""
+
+import re
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Iterable, Optional
+
+_DOLLAR_AMOUNT = re.compile(r"\$\s*(\d{1,3}(?:,\d{3})+|\d+)(\.\d+)?")
+_STORED_AMOUNT = re.compile(r"^\s*\$?\s*(\d{1,3}(?:,\d{3})+|\d+)(\.\d+)?\s*(?:USD)?\s*$", re.IGNORECASE)
+_VALUE_LINE = re.compile(r"^\W*VALUE:\s*(.*)$", re.IGNORECASE | re.MULTILINE)
+_DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%B %d, %Y", "%b %d, %Y")
+
+
+def parse_price(value: Any) -> Optional[float]:
+    """
+    Parses a stored price: a number, or a text that is only an amount such as "$12.99",
+    "12.99" or "12 USD".
+
+    Agent replies are not parsed here, since a bare number in prose is as likely a year or
+    a UPC as a price; use `parse_price_reply` for them.
+    """
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _STORED_AMOUNT.match(str(value))
+    if not match:
+        return None
+    return float(match.group(1).replace(",", "") + (match.group(2) or ""))
+
+
+def parse_dollar_amount(text: str) -> Optional[float]:
+    """Parses the first "$"-prefixed amount in a text, ignoring bare numbers."""
+    match = _DOLLAR_AMOUNT.search(text or "")
+    if not match:
+        return None
+    return float(match.group(1).replace(",", "") + (match.group(2) or ""))
+
+
+def parse_price_reply(text: str) -> Optional[float]:
+    """
+    Parses the value agent's estimate from the `VALUE: $12.99` line that ends its reply.
+
+    Replies without that line, or with `VALUE: NONE`, have no price, whatever other
+    numbers they mention.
+    """
+    lines = _VALUE_LINE.findall(text or "")
+    return parse_dollar_amount(lines[-1]) if lines else None
+
+
+def parse_date(value: Any) -> Optional[datetime]:
+    """Parses a `date_checked` value into a timezone-aware UTC datetime."""
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day, tzinfo=timezone.utc)
+    if not isinstance(value, str) or not value.strip():
+        return None
+    text = value.strip()
+    try:
+        parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        parsed = None
+        for fmt in _DATE_FORMATS:
+            try:
+                parsed = datetime.strptime(text, fmt)
+                break
+            except ValueError:
+                continue
+    if parsed is None:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def latest_price_entry(item: dict[str, Any]) -> Optional[dict[str, Any]]:
+    """Returns the most recent entry of an item's `PriceHistory`, if any."""
+    history = item.get("PriceHistory") or []
+    entries = [entry for entry in history if isinstance(entry, dict)]
+    if not entries:
+        return None
+    oldest = datetime.min.replace(tzinfo=timezone.utc)
+    # Entries without a parseable date keep their list order and sort first.
+    return max(
+        enumerate(entries),
+        key=lambda pair: (parse_date(pair[1].get("date_checked")) or oldest, pair[0]),
+    )[1]
+
+
+def latest_price(item: dict[str, Any]) -> Optional[float]:
+    """Returns the most recent known value of an item in USD, if any."""
+    entry = latest_price_entry(item)
+    return parse_price(entry.get("value")) if entry else None
+
+
+def is_price_stale(
+    item: dict[str, Any], max_age: timedelta, now: Optional[datetime] = None
+) -> bool:
+    """Returns True if the item has no price or its latest price is older than `max_age`."""
+    entry = latest_price_entry(item)
+    if entry is None or parse_price(entry.get("value")) is None:
+        return True
+    checked = parse_date(entry.get("date_checked"))
+    if checked is None:
+        return True
+    return (now or datetime.now(timezone.utc)) - checked > max_age
+
+
+def item_quantity(item: dict[str, Any]) -> int:
+    """Returns the item's `Quantity`, defaulting to one for missing or malformed values."""
+    try:
+        quantity = int(item.get("Quantity", 1))
+    except (TypeError, ValueError):
+        return 1
+    return max(quantity, 0)
+
+
+def summarize_prices(item: dict[str, Any]) -> dict[str, Any]:
+    """Returns a copy of the item with its `PriceHistory` replaced by the latest price and its date."""
+    summary = {key: value for key, value in item.items() if key != "PriceHistory"}
+    entry = latest_price_entry(item)
+    summary["LatestPrice"] = parse_price(entry.get("value")) if entry else None
+    summary["PriceCheckedDate"] = entry.get("date_checked") if entry else None
+    return summary
+
+
+def new_price_entry(value: float, now: Optional[datetime] = None) -> dict[str, Any]:
+    """Builds a `PriceHistory` entry for a freshly checked price."""
+    checked = now or datetime.now(timezone.utc)
+    return {"value": round(value, 2), "date_checked": checked.isoformat(timespec="seconds")}
+
+
+def rollup_portfolio(
+    inventory: Iterable[tuple[str, dict[str, Any]]]
+) -> dict[str, Any]:
+    """
+    Totals item counts, quantities and latest values per category.
+
+    Args:
+        inventory: (category, item data) pairs.
+    """
+    categories: dict[str, dict[str, Any]] = {}
+    for category, item in inventory:
+        rollup = categories.setdefault(
+            category, {"items": 0, "quantity": 0, "value": 0.0, "unpriced": 0}
+        )
+        quantity = item_quantity(item)
+        price = latest_price(item)
+        rollup["items"] += 1
+        rollup["quantity"] += quantity
+        if price is None:
+            rollup["unpriced"] += 1
+        else:
+            rollup["value"] += price * quantity
+
+    for rollup in categories.values():
+        rollup["value"] = round(rollup["value"], 2)
+
+    return {
+        "currency": "USD",
+        "total_value": round(sum(c["value"] for c in categories.values()), 2),
+        "total_items": sum(c["items"] for c in categories.values()),
+        "total_quantity": sum(c["quantity"] for c in categories.values()),
+        "categories": categories,
+    }
@@ -0,0 +1,325 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Process-wide rate limiting and admission control for search and model calls."""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Iterable, Optional, TypeVar
+
+from opentelemetry import metrics as otel_metrics
+from opentelemetry.metrics import Observation
+
+T = TypeVar("T")
+
+
+class RateLimiter:
+    """
+    Spaces out calls to at most `rate_per_minute`, allowing short bursts of `burst` calls.
+
+    Slots are reserved under a thread lock and waited for outside it, so one limiter can be
+    shared by coroutines on different event loops and threads.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int = 1):
+        """
+        Initializes the rate limiter.
+
+        Args:
+            rate_per_minute: The sustained number of calls allowed per minute.
+            burst: The number of calls that may start back to back after an idle period.
+        """
+        self.interval = 60.0 / rate_per_minute
+        self.burst = max(burst, 1)
+        self._next_free = 0.0
+        self._lock = threading.Lock()
+
+    async def acquire(self) -> None:
+        """Waits until the caller may make its call."""
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _reserve(self) -> float:
+        """Books the next free slot and returns how long to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_free, now - (self.burst - 1) * self.interval)
+            self._next_free = slot + self.interval
+            return max(slot - now, 0.0)
+
+
+# Statuses that mean the model is overloaded, and all statuses worth retrying.
+THROTTLE_STATUSES = frozenset((429, 503))
+RETRYABLE_STATUSES = frozenset((429, 500, 503, 504))
+
+# The concurrency limit is halved at most this often, so one burst of 429s counts once.
+_DECREASE_INTERVAL_SECONDS = 1.0
+
+
+class AdmissionRejected(Exception):
+    """Raised instead of calling a model that is overloaded: its circuit is open or its queue is full."""
+
+
+@dataclass(frozen=True)
+class AdmissionConfig:
+    """How calls to one model are admitted, retried and failed fast."""
+
+    # Token bucket: sustained calls per minute (None for no limit) and the burst allowed.
+    rate_per_minute: Optional[float] = None
+    burst: int = 10
+    # AIMD concurrency: the limit grows by one per `limit` successes and halves on throttling.
+    initial_concurrency: int = 8
+    min_concurrency: int = 1
+    max_concurrency: int = 64
+    # Calls waiting beyond this many are rejected instead of queued.
+    max_queue: int = 256
+    # Retries with full jitter: attempt n waits up to min(max_delay, initial_delay * 2**n) seconds.
+    attempts: int = 4
+    initial_delay: float = 1.0
+    max_delay: float = 20.0
+    # Circuit breaker: this many overloaded attempts in a row fail calls fast for `open_seconds`.
+    failure_threshold: int = 8
+    open_seconds: float = 30.0
+
+
+class AdmissionController:
+    """
+    Admits the calls to one model: a token bucket, an adaptive (AIMD) concurrency limit
+    with a bounded queue, jittered capped retries and a circuit breaker.
+
+    Like `RateLimiter`, its state is guarded by a thread lock, so one controller can be
+    shared by coroutines on different event loops and threads.
+    """
+
+    def __init__(self, name: str, config: AdmissionConfig = AdmissionConfig()):
+        """
+        Initializes the controller.
+
+        Args:
+            name: The model the controller admits calls to, used in messages and metrics.
+            config: The admission, retry and circuit breaker settings.
+        """
+        self.name = name
+        self.config = config
+        self.rate_limiter = RateLimiter(config.rate_per_minute, config.burst) if config.rate_per_minute else None
+        self._lock = threading.Lock()
+        self._limit = float(config.initial_concurrency)
+        self._in_flight = 0
+        self._waiting = 0
+        self._waiters: deque[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+        self._last_decrease = 0.0
+        self._failures = 0
+        self._open_until = 0.0
+        self.throttled = 0
+        self.rejected = 0
+        self.retries = 0
+
+    async def stream(self, call: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """
+        Yields the responses of `call()` once admitted, retrying overloaded calls that have
+        not yielded anything yet.
+
+        Raises:
+            AdmissionRejected: The circuit is open or the queue is full.
+        """
+        for attempt in range(self.config.attempts):
+            await self._admit()
+            yielded = False
+            try:
+                async for response in call():
+                    yielded = True
+                    yield response
+            except Exception as e:
+                status = _status_of(e)
+                self._record(status)
+                if yielded or status not in RETRYABLE_STATUSES or attempt == self.config.attempts - 1:
+                    raise
+            else:
+                self._record(None)
+                return
+            finally:
+                self._release()
+            with self._lock:
+                self.retries += 1
+            await asyncio.sleep(random.uniform(0, min(self.config.max_delay, self.config.initial_delay * 2 ** attempt)))
+
+    def metrics(self) -> dict[str, Any]:
+        """Returns the current queue depth, concurrency and throttling counts."""
+        with self._lock:
+            return {
+                "model": self.name,
+                "queue_depth": self._waiting,
+                "in_flight": self._in_flight,
+                "concurrency_limit": int(self._limit),
+                "circuit_open": self._failures >= self.config.failure_threshold,
+                "throttled": self.throttled,
+                "rejected": self.rejected,
+                "retries": self.retries,
+            }
+
+    async def _admit(self) -> None:
+        self._check_circuit()
+        with self._lock:
+            if self._waiting >= self.config.max_queue:
+                self.rejected += 1
+                raise AdmissionRejected(
+                    f"{self.name} is overloaded: {self._waiting} calls are already waiting. Please try again shortly.")
+            self._waiting += 1
+        try:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire()
+            await self._acquire_slot()
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def _check_circuit(self) -> None:
+        with self._lock:
+            if self._failures < self.config.failure_threshold:
+                return
+            now = time.monotonic()
+            if now >= self._open_until:
+                # Half-open: let one call through to find out whether the model has recovered,
+                # and keep failing the others fast until it has answered.
+                self._open_until = now + self.config.open_seconds
+                return
+            self.rejected += 1
+            retry_in = max(1, round(self._open_until - now))
+        raise AdmissionRejected(
+            f"{self.name} is overloaded and is not being called for now. "
+            f"Please try again in {retry_in} second{'s' if retry_in != 1 else ''}.")
+
+    async def _acquire_slot(self) -> None:
+        with self._lock:
+            if self._in_flight < int(self._limit) and not self._waiters:
+                self._in_flight += 1
+                return
+            loop = asyncio.get_running_loop()
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    granted = False
+                else:
+                    # `_wake` took a slot for this waiter. If the cancellation came first,
+                    # `_grant` gives it back; if the slot was granted first, nobody else will.
+                    granted = not waiter[1].cancelled()
+            if granted:
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._wake()
+
+    def _wake(self) -> None:
+        """Hands free slots to waiters; must be called with the lock held."""
+        while self._waiters and self._in_flight < int(self._limit):
+            loop, future = self._waiters.popleft()
+            self._in_flight += 1
+            loop.call_soon_threadsafe(self._grant, future)
+
+    def _grant(self, future: asyncio.Future) -> None:
+        if future.cancelled():
+            self._release()
+        else:
+            future.set_result(None)
+
+    def _record(self, status: Optional[int]) -> None:
+        """Adapts the limit and the circuit to the outcome of an attempt (None for success)."""
+        with self._lock:
+            if status in THROTTLE_STATUSES:
+                self.throttled += 1
+                now = time.monotonic()
+                if now - self._last_decrease >= _DECREASE_INTERVAL_SECONDS:
+                    self._limit = max(float(self.config.min_concurrency), self._limit / 2)
+                    self._last_decrease = now
+            if status in RETRYABLE_STATUSES:
+                self._failures += 1
+                if self._failures >= self.config.failure_threshold:
+                    self._open_until = time.monotonic() + self.config.open_seconds
+            else:
+                # Any answer, even an error about the request itself, shows the model is reachable.
+                self._failures = 0
+                if status is None:
+                    self._limit = min(float(self.config.max_concurrency), self._limit + 1 / self._limit)
+                    self._wake()
+
+
+_controllers: dict[str, AdmissionController] = {}
+_controllers_lock = threading.Lock()
+
+
+def admission_controller(name: str, config: AdmissionConfig = AdmissionConfig()) -> AdmissionController:
+    """
+    Returns the process-wide controller of a model, creating it on first use.
+
+    Every agent using the model shares it, so all sessions back off together. The config
+    of the first caller is used.
+    """
+    with _controllers_lock:
+        controller = _controllers.get(name)
+        if controller is None:
+            controller = AdmissionController(name, config)
+            _controllers[name] = controller
+        return controller
+
+
+def admission_metrics() -> list[dict[str, Any]]:
+    """Returns the metrics of every model's controller."""
+    with _controllers_lock:
+        controllers = list(_controllers.values())
+    return [controller.metrics() for controller in controllers]
+
+
+def _status_of(error: Exception) -> Optional[int]:
+    """Returns the HTTP status of an API error, if it has one."""
+    for attribute in ("code", "status_code"):
+        status = getattr(error, attribute, None)
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def _observe(metric: str) -> Callable[[Any], Iterable[Observation]]:
+    def callback(options: Any) -> Iterable[Observation]:
+        return [Observation(int(metrics[metric]), {"model": metrics["model"]}) for metrics in admission_metrics()]
+    return callback
+
+
+# Exported through the process's OpenTelemetry meter provider, if one is configured.
+_meter = otel_metrics.get_meter(__name__)
+for _metric, _description in (
+    ("queue_depth", "Model calls waiting for admission."),
+    ("in_flight", "Model calls in progress."),
+    ("concurrency_limit", "Current adaptive concurrency limit."),
+    ("circuit_open", "1 while calls to the model fail fast."),
+):
+    _meter.create_observable_gauge(f"inventory.model.{_metric}", callbacks=[_observe(_metric)], description=_description)
+for _metric, _description in (
+    ("throttled", "Model calls that were throttled (HTTP 429 or 503)."),
+    ("rejected", "Model calls rejected without calling the model."),
+    ("retries", "Model calls retried."),
+):
+    _meter.create_observable_counter(f"inventory.model.{_metric}", callbacks=[_observe(_metric)], description=_description)
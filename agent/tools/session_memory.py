@@ -0,0 +1,186 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Incremental, token-bounded saving of chat sessions to the memory service.
+
+Each turn only the events after the session's high-water mark (`memory_saved_until`
+in the session state) are saved. Images and thoughts are dropped, and bulky tool results
+such as full inventory listings are replaced by an outline of their shape. The save
+runs in the background, off the response path, and a turn that ends while the previous
+save of the same session is still running leaves its events to the next save.
+
+The mark only moves past events once they are saved: a successful save records how far it
+got, and the next turn copies that into the session state. A failed save leaves its events
+to be saved again with the next turn.
+
+Each save is a copy of the session holding only the new events, under its own ID
+(`{session_id}@{timestamp}`). Memory services that key saved sessions by ID, such as
+`InMemoryMemoryService`, therefore keep every part of the conversation instead of each save
+replacing the previous one.
+"""
+
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from typing import Any, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.events import Event
+from google.genai import types
+
+MEMORY_SAVED_UNTIL = "memory_saved_until"
+
+# The most tokens saved per turn (estimated at 4 characters per token); older events are dropped first.
+MAX_MEMORY_TOKENS = 8000
+# Tool results longer than this are replaced by an outline of their shape.
+MAX_TOOL_RESULT_CHARS = 2000
+# The most sessions whose finished save is remembered until their next turn records it.
+MAX_PENDING_MARKS = 10000
+
+logger = logging.getLogger(__name__)
+
+# Sessions with a save in progress, and the running save tasks (kept so they are not garbage collected).
+_saving: set[str] = set()
+_tasks: set[asyncio.Task] = set()
+# The timestamp each session has been saved up to by a finished save, until the next turn records it.
+# Sessions that end never record it, so the oldest marks are evicted; an evicted session's next save
+# repeats the events under the same ID, which replaces them.
+_saved_until: OrderedDict[str, float] = OrderedDict()
+
+
+def outline(value: Any) -> Any:
+    """Describes a bulky tool result by its shape, e.g. {"inventory": "3 fields"}."""
+    if isinstance(value, dict):
+        return {key: _outline_value(item) for key, item in value.items()}
+    return _outline_value(value)
+
+
+def _outline_value(value: Any) -> Any:
+    if isinstance(value, list):
+        return f"{len(value)} items"
+    if isinstance(value, dict):
+        return f"{len(value)} fields"
+    if isinstance(value, str) and len(value) > 200:
+        return value[:200] + "..."
+    return value
+
+
+def compact_event(event: Event) -> Optional[Event]:
+    """Returns a copy of the event with only what is worth remembering, or None if nothing is."""
+    if event.content is None or not event.content.parts:
+        return None
+    parts = []
+    for part in event.content.parts:
+        if part.text and not part.thought:
+            parts.append(types.Part(text=part.text))
+        elif part.function_call:
+            parts.append(part)
+        elif part.function_response:
+            response = part.function_response.response
+            if len(json.dumps(response, default=str)) > MAX_TOOL_RESULT_CHARS:
+                response = {"omitted": "result too large to remember", "outline": outline(response)}
+            parts.append(types.Part(function_response=types.FunctionResponse(
+                id=part.function_response.id, name=part.function_response.name, response=response)))
+        # Images and other inline data are not remembered.
+    if not parts:
+        return None
+    return event.model_copy(update={"content": types.Content(role=event.content.role, parts=parts)})
+
+
+def compact_events(events: list[Event], max_tokens: int = MAX_MEMORY_TOKENS) -> list[Event]:
+    """
+    Compacts events and keeps the newest ones that fit in `max_tokens`, in their original order.
+
+    If the newest event worth remembering does not fit on its own, it is truncated, so the
+    result is only empty if no event is worth remembering.
+    """
+    kept: list[Event] = []
+    budget = max_tokens * 4
+    for event in reversed(events):
+        compacted = compact_event(event)
+        if compacted is None:
+            continue
+        size = _size(compacted.content)
+        if size > budget:
+            if not kept:
+                kept.append(_truncated(compacted, budget))
+            break
+        budget -= size
+        kept.append(compacted)
+    return kept[::-1]
+
+
+def _size(content: types.Content) -> int:
+    return len(content.model_dump_json(exclude_none=True))
+
+
+def _truncated(event: Event, budget: int) -> Event:
+    """Returns a copy of a compacted event cut down to about `budget` characters."""
+    parts = []
+    for part in event.content.parts:
+        if _size(types.Content(role=event.content.role, parts=[*parts, part])) <= budget:
+            parts.append(part)
+        elif part.text:
+            remaining = budget - _size(types.Content(role=event.content.role, parts=parts))
+            if remaining > 0:
+                parts.append(types.Part(text=part.text[:remaining] + "..."))
+    if not parts:
+        parts = [types.Part(text="[omitted: too large to remember]")]
+    return event.model_copy(update={"content": types.Content(role=event.content.role, parts=parts)})
+
+
+async def auto_save_session_to_memory_callback(callback_context: CallbackContext) -> None:
+    """Saves the events since the last save to memory in the background."""
+    invocation_context = callback_context._invocation_context
+    session = invocation_context.session
+    memory_service = invocation_context.memory_service
+    if memory_service is None or session.id in _saving:
+        return None
+
+    saved_until = callback_context.state.get(MEMORY_SAVED_UNTIL) or 0.0
+    saved = _saved_until.pop(session.id, 0.0)
+    if saved > saved_until:
+        saved_until = saved
+        callback_context.state[MEMORY_SAVED_UNTIL] = saved_until
+    new_events = [event for event in session.events if event.timestamp > saved_until and not event.partial]
+    if not new_events:
+        return None
+    events = compact_events(new_events)
+    if not events:
+        # Nothing in these events is worth remembering, so there is nothing to retry either.
+        callback_context.state[MEMORY_SAVED_UNTIL] = new_events[-1].timestamp
+        return None
+
+    _saving.add(session.id)
+    part = session.model_copy(update={"id": f"{session.id}@{new_events[0].timestamp}", "events": events})
+    task = asyncio.create_task(_save(memory_service, session.id, part, new_events[-1].timestamp))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return None
+
+
+async def _save(memory_service: Any, session_id: str, part: Any, until: float) -> None:
+    try:
+        await memory_service.add_session_to_memory(part)
+        _saved_until[session_id] = until
+        _saved_until.move_to_end(session_id)
+        while len(_saved_until) > MAX_PENDING_MARKS:
+            _saved_until.popitem(last=False)
+    except Exception as e:
+        # Memory is best effort; the conversation itself is unaffected, and the next turn retries.
+        logger.warning("Could not save session %s to memory: %s", session_id, e)
+    finally:
+        _saving.discard(session_id)
@@ -0,0 +1,478 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Inventory tools backed by an embedded SQLite database instead of Firestore.
+
+`SqliteTools` are the same `InventoryTools` as `FirestoreTools` on a `SqliteStorage`, for
+single-tenant deployments, local runs and load tests without cloud services. An item is
+a row keyed by the `users/{user_id}/{category}/{document_id}` path of its Firestore
+document, with its fields stored as JSON and indexes on `Title`, `UPC` and `Format`. Raw
+price checks and the portfolio summary live in their own tables.
+
+The database runs in WAL mode, so readers never wait for the writer, and each thread
+uses its own connection.
+"""
+
+import json
+import re
+import secrets
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Iterator, NamedTuple, Optional
+
+from .inventory_cache import InventoryCache
+from .inventory_tools import InventoryTools, PriceFetcher
+from .portfolio_summary import SUMMARY_FIELD, SummaryDelta, read_summary
+from .price_history import entry_id
+from .pricing import item_quantity, parse_date
+from .storage import Condition, InventoryStorage, StorageTransaction, T
+
+# Fields with an index, for lookups by UPC, exact title and format.
+INDEXED_FIELDS = ("Title", "UPC", "Format")
+
+# SQLite limits the number of parameters of one statement.
+_MAX_PARAMETERS = 500
+
+# A dotted field path; quotes would end the JSON path literal it is written into.
+_FIELD_PATH = re.compile(r"^[^.'\"\\]+(\.[^.'\"\\]+)*$")
+
+_OPERATORS = frozenset(("==", "!=", "<", "<=", ">", ">=", "in", "not-in", "array_contains", "array_contains_any"))
+
+
+def _json_path(field: str) -> str:
+    """Returns the SQL literal of the JSON path of a (dotted) field, e.g. `'$."Title"'`."""
+    if not isinstance(field, str) or not _FIELD_PATH.match(field):
+        raise ValueError(f"Invalid field path: {field!r}")
+    return "'$" + "".join(f'."{segment}"' for segment in field.split(".")) + "'"
+
+
+def _field(field: str) -> str:
+    """Returns the SQL expression of a field's value; indexes are declared on the same expression."""
+    return f"json_extract(data, {_json_path(field)})"
+
+
+_INDEXES = "\n".join(
+    f"CREATE INDEX IF NOT EXISTS items_{field.lower()} ON items (user_id, category, {_field(field)});"
+    for field in INDEXED_FIELDS
+)
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    user_id TEXT NOT NULL,
+    category TEXT NOT NULL,
+    document_id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (user_id, category, document_id)
+);
+{_INDEXES}
+CREATE TABLE IF NOT EXISTS price_history (
+    user_id TEXT NOT NULL,
+    category TEXT NOT NULL,
+    document_id TEXT NOT NULL,
+    entry_id TEXT NOT NULL,
+    date_checked TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (user_id, category, document_id, entry_id)
+);
+"""
+
+
+class _Document(NamedTuple):
+    """An item row, with the `id` and `to_dict()` of a Firestore snapshot for the shared helpers."""
+
+    id: str
+    data: dict[str, Any]
+
+    def to_dict(self) -> dict[str, Any]:
+        return dict(self.data)
+
+
+class SqliteStorage(InventoryStorage):
+    """Stores the inventory in a local SQLite database, with one row per item."""
+
+    def __init__(self, path: str):
+        """
+        Initializes the storage. The database and its tables are created on first use.
+
+        Args:
+            path: The database file. Each thread opens its own connection to it, so it
+                cannot be ':memory:'.
+        """
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def get(
+        self, user_id: str, collection_id: str, document_id: str, fields: Optional[list[str]] = None
+    ) -> Optional[dict[str, Any]]:
+        data = _item(self._connection(), user_id, collection_id, document_id)
+        return _project(data, fields) if data is not None and fields else data
+
+    def users(self) -> list[str]:
+        rows = self._connection().execute("SELECT DISTINCT user_id FROM items ORDER BY user_id")
+        return [user_id for user_id, in rows]
+
+    def categories(self, user_id: str) -> list[str]:
+        rows = self._connection().execute(
+            "SELECT DISTINCT category FROM items WHERE user_id = ? ORDER BY category", (user_id,))
+        return [category_id for category_id, in rows]
+
+    def cursor(self, user_id: str, collection_id: str, document_id: str) -> Optional[_Document]:
+        data = _item(self._connection(), user_id, collection_id, document_id)
+        return _Document(document_id, data) if data is not None else None
+
+    def query(
+        self,
+        user_id: str,
+        collection_id: str,
+        condition: Optional[Condition] = None,
+        fields: Optional[list[str]] = None,
+        order_field: Optional[str] = None,
+        cursor: Optional[_Document] = None,
+        limit: Optional[int] = None,
+    ) -> list[_Document]:
+        sql, params = _where(user_id, collection_id, condition)
+        sql = f"SELECT document_id, data FROM items WHERE {sql}"
+        order = "document_id"
+        if order_field:
+            order = f"{_field(order_field)}, document_id"
+            if cursor is not None:
+                sql += f" AND ({_field(order_field)}, document_id) > (?, ?)"
+                params += [_sql_value(_lookup(cursor.data, order_field)), cursor.id]
+        elif cursor is not None:
+            sql += " AND document_id > ?"
+            params.append(cursor.id)
+        sql += f" ORDER BY {order}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = self._connection().execute(sql, params)
+        docs = [_Document(document_id, json.loads(data)) for document_id, data in rows]
+        return [_Document(doc.id, _project(doc.data, fields)) for doc in docs] if fields else docs
+
+    def aggregate(
+        self, user_id: str, collection_id: str, condition: Optional[Condition], sum_field: Optional[str]
+    ) -> dict[str, Any]:
+        # Quantities count like everywhere else; like Firestore's sum and avg, `sum_field`
+        # ignores values that are not numbers.
+        sql = f"SELECT COUNT(*), SUM(item_quantity({_field('Quantity')}))"
+        if sum_field:
+            number = (
+                f"CASE WHEN json_type(data, {_json_path(sum_field)}) IN ('integer', 'real') THEN {_field(sum_field)} END")
+            sql += f", SUM({number}), AVG({number})"
+        where, params = _where(user_id, collection_id, condition)
+        count, quantity, *sums = self._connection().execute(f"{sql} FROM items WHERE {where}", params).fetchone()
+        totals: dict[str, Any] = {"items": int(count), "quantity": int(quantity or 0)}
+        if sum_field:
+            total, average = sums
+            totals[f"{sum_field}_total"] = round(total or 0, 2)
+            totals[f"{sum_field}_average"] = round(average, 2) if average is not None else None
+        return totals
+
+    def price_history(self, user_id: str, collection_id: str, document_id: str, limit: int) -> list[dict[str, Any]]:
+        rows = self._connection().execute(
+            "SELECT data FROM price_history WHERE user_id = ? AND category = ? AND document_id = ?"
+            " ORDER BY date_checked DESC LIMIT ?",
+            (user_id, collection_id, document_id, limit),
+        )
+        return [json.loads(data) for data, in rows]
+
+    def read_summary(self, user_id: str) -> Optional[dict[str, Any]]:
+        return _read_summary(_user(self._connection(), user_id))
+
+    def set_summary(self, user_id: str, summary: dict[str, Any]) -> None:
+        # Times are stored as ISO strings instead of server timestamps.
+        now = datetime.now(timezone.utc).isoformat()
+        with self._transaction() as connection:
+            user = _user(connection, user_id)
+            user[SUMMARY_FIELD] = {**summary[SUMMARY_FIELD], "built_at": now, "updated_at": now}
+            _put_user(connection, user_id, user)
+
+    def transaction(self, write: Callable[[StorageTransaction], T]) -> T:
+        with self._transaction() as connection:
+            return write(_SqliteTransaction(connection))
+
+    def delete_price_history(self, user_id: str, collection_id: str, document_ids: list[str]) -> None:
+        # `_SqliteTransaction.delete` already deleted it with each item.
+        pass
+
+    def new_document_id(self) -> str:
+        # A random 20-character ID, like Firestore's auto-generated IDs.
+        return secrets.token_hex(10)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Returns the calling thread's connection, opening it (and creating the tables) on first use."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Autocommit mode: writes run in explicit `_transaction`s, reads see the latest commit.
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.create_function("item_quantity", 1, _item_quantity, deterministic=True)
+            with self._schema_lock:
+                if not self._schema_ready:
+                    connection.executescript(_SCHEMA)
+                    self._schema_ready = True
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Runs a write transaction that takes the write lock up front, so its reads are not stale."""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+
+class _SqliteTransaction(StorageTransaction):
+    """A `StorageTransaction` on a connection that holds the write lock."""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    def get_all(
+        self, user_id: str, collection_id: str, document_ids: list[str], fields: Optional[list[str]] = None
+    ) -> dict[str, dict[str, Any]]:
+        items: dict[str, dict[str, Any]] = {}
+        for start in range(0, len(document_ids), _MAX_PARAMETERS):
+            chunk = document_ids[start:start + _MAX_PARAMETERS]
+            rows = self.connection.execute(
+                f"SELECT document_id, data FROM items WHERE user_id = ? AND category = ?"
+                f" AND document_id IN ({', '.join('?' * len(chunk))})",
+                (user_id, collection_id, *chunk),
+            )
+            for document_id, data in rows:
+                items[document_id] = _project(json.loads(data), fields) if fields else json.loads(data)
+        return items
+
+    def set(
+        self, user_id: str, collection_id: str, document_id: str, data: dict[str, Any], merge: bool = False
+    ) -> None:
+        key = (user_id, collection_id, document_id)
+        old = _item(self.connection, *key) if merge else None
+        new = _merged(old, data) if old is not None else data
+        self.connection.execute(
+            "INSERT INTO items (user_id, category, document_id, data) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT (user_id, category, document_id) DO UPDATE SET data = excluded.data",
+            (*key, json.dumps(new, default=str)),
+        )
+
+    def delete(self, user_id: str, collection_id: str, document_id: str) -> None:
+        key = (user_id, collection_id, document_id)
+        self.connection.execute("DELETE FROM items WHERE user_id = ? AND category = ? AND document_id = ?", key)
+        self.connection.execute(
+            "DELETE FROM price_history WHERE user_id = ? AND category = ? AND document_id = ?", key)
+
+    def add_price_entry(self, user_id: str, collection_id: str, document_id: str, entry: dict[str, Any]) -> None:
+        self.connection.execute(
+            "INSERT OR IGNORE INTO price_history (user_id, category, document_id, entry_id, date_checked, data)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (user_id, collection_id, document_id, entry_id(entry), entry.get("date_checked"),
+             json.dumps(entry, default=str)),
+        )
+
+    def apply_summary(self, user_id: str, delta: SummaryDelta) -> None:
+        changes = {
+            collection_id: {key: round(value, 2) for key, value in change.items() if round(value, 2)}
+            for collection_id, change in delta.categories.items()
+        }
+        changes = {collection_id: change for collection_id, change in changes.items() if change}
+        if not changes:
+            return
+        user = _user(self.connection, user_id)
+        summary = user.setdefault(SUMMARY_FIELD, {})
+        for collection_id, change in changes.items():
+            category = summary.setdefault("categories", {}).setdefault(collection_id, {})
+            total = summary.setdefault("total", {})
+            for key, value in change.items():
+                category[key] = round(category.get(key, 0) + value, 2)
+                total[key] = round(total.get(key, 0) + value, 2)
+        summary["updated_at"] = datetime.now(timezone.utc).isoformat()
+        _put_user(self.connection, user_id, user)
+
+
+class SqliteTools(InventoryTools):
+    """
+    A variant of `FirestoreTools` that stores the inventory in a local SQLite database.
+
+    The tools are the same `InventoryTools` as `FirestoreTools`, so they have the same
+    names, arguments and results, and item writes keep the same portfolio summary and
+    price history up to date.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        price_fetcher: Optional[PriceFetcher] = None,
+        max_workers: int = 8,
+        price_max_age: timedelta = timedelta(days=1),
+        cache: Optional[InventoryCache] = None,
+    ):
+        """
+        Initializes the tools. The database and its tables are created on first use.
+
+        Args:
+            path: The database file. Each thread opens its own connection to it, so it
+                cannot be ':memory:'.
+            price_fetcher: Looks up the current market value of an item in USD. Used by
+                `value_portfolio` to refresh stale prices; returns None if no value was found.
+            max_workers: The maximum number of concurrent price lookups.
+            price_max_age: How old a price may be before it is considered stale.
+            cache: Optional read-through cache for inventory reads. Writes made through
+                these tools invalidate the affected entries.
+        """
+        self.path = path
+        super().__init__(SqliteStorage(path), price_fetcher, max_workers, price_max_age, cache)
+
+
+def _item(
+    connection: sqlite3.Connection, user_id: str, collection_id: str, document_id: str
+) -> Optional[dict[str, Any]]:
+    row = connection.execute(
+        "SELECT data FROM items WHERE user_id = ? AND category = ? AND document_id = ?",
+        (user_id, collection_id, document_id),
+    ).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def _user(connection: sqlite3.Connection, user_id: str) -> dict[str, Any]:
+    row = connection.execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+    return json.loads(row[0]) if row else {}
+
+
+def _put_user(connection: sqlite3.Connection, user_id: str, data: dict[str, Any]) -> None:
+    connection.execute(
+        "INSERT INTO users (user_id, data) VALUES (?, ?)"
+        " ON CONFLICT (user_id) DO UPDATE SET data = excluded.data",
+        (user_id, json.dumps(data, default=str)),
+    )
+
+
+def _where(user_id: str, collection_id: str, condition: Optional[Condition]) -> tuple[str, list[Any]]:
+    """Returns the SQL and parameters selecting the items of a category that match `condition`."""
+    sql, params = "user_id = ? AND category = ?", [user_id, collection_id]
+    if condition is not None:
+        condition_sql, condition_params = _condition(*condition)
+        sql += f" AND {condition_sql}"
+        params += condition_params
+    return sql, params
+
+
+def _json_types(value: Any) -> tuple[str, ...]:
+    """Returns the SQLite `json_type`s a value compares equal or ordered to in Firestore."""
+    if isinstance(value, bool):
+        return ("true", "false")
+    if isinstance(value, (int, float)):
+        return ("integer", "real")
+    if isinstance(value, str):
+        return ("text",)
+    return ("array",) if isinstance(value, list) else ("object",)
+
+
+def _sql_value(value: Any) -> Any:
+    """Converts a filter value to the SQL value `json_extract` returns for it."""
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, separators=(",", ":"))
+    return value
+
+
+def _condition(field: str, operator: str, value: Any) -> tuple[str, list[Any]]:
+    """
+    Translates a Firestore `where(field, operator, value)` filter into SQL and its parameters.
+
+    As in Firestore, comparisons only match values of the same type, and items without
+    the field never match.
+    """
+    if operator not in _OPERATORS:
+        raise ValueError(f"Unsupported operator: {operator!r}")
+    path = _json_path(field)
+    extracted, json_type = f"json_extract(data, {path})", f"json_type(data, {path})"
+    if operator in ("array_contains", "array_contains_any"):
+        values = [value] if operator == "array_contains" else list(value or [])
+        marks = ", ".join("?" * len(values)) or "NULL"
+        return (
+            f"EXISTS (SELECT 1 FROM json_each(data, {path}) WHERE json_each.value IN ({marks}))",
+            [_sql_value(item) for item in values],
+        )
+    if operator in ("in", "not-in"):
+        values = list(value or [])
+        marks = ", ".join("?" * len(values)) or "NULL"
+        negation = "NOT " if operator == "not-in" else ""
+        return (
+            f"{json_type} != 'null' AND {extracted} {negation}IN ({marks})",
+            [_sql_value(item) for item in values],
+        )
+    if value is None:
+        # Firestore only supports equality filters on null.
+        if operator == "==":
+            return f"{json_type} = 'null'", []
+        return f"{json_type} != 'null'", []
+    same_type = f"{json_type} IN ({', '.join(repr(name) for name in _json_types(value))})"
+    if operator == "!=":
+        return f"{json_type} != 'null' AND NOT ({same_type} AND {extracted} = ?)", [_sql_value(value)]
+    sql_operator = "=" if operator == "==" else operator
+    return f"{same_type} AND {extracted} {sql_operator} ?", [_sql_value(value)]
+
+
+def _item_quantity(value: Any) -> int:
+    """The SQL function `item_quantity` of a `Quantity` read with `json_extract`, which is NULL if missing."""
+    return item_quantity({"Quantity": value})
+
+
+def _lookup(data: dict[str, Any], field: str) -> Any:
+    """Returns the value of a (dotted) field, or None if the item does not have it."""
+    for segment in field.split("."):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(segment)
+    return data
+
+
+def _project(data: dict[str, Any], fields: list[str]) -> dict[str, Any]:
+    """Keeps only the given top-level fields of an item, like a Firestore `select`."""
+    return {field: data[field] for field in fields if field in data}
+
+
+def _merged(old: dict[str, Any], data: dict[str, Any]) -> dict[str, Any]:
+    """Returns an item after `set(data, merge=True)`, which merges nested maps field by field."""
+    merged = dict(old)
+    for key, value in data.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merged(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _read_summary(user_data: dict[str, Any]) -> Optional[dict[str, Any]]:
+    """`read_summary` for a user row, whose times are stored as ISO strings."""
+    summary = user_data.get(SUMMARY_FIELD)
+    if not summary:
+        return None
+    return read_summary({SUMMARY_FIELD: {**summary, "updated_at": parse_date(summary.get("updated_at"))}})
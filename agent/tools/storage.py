@@ -0,0 +1,150 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The storage interface the inventory tools are written against.
+
+An item lives at `users/{user_id}/{category}/{document_id}`, with its raw price checks
+next to it and a portfolio summary per user. `InventoryTools` decides what to read and
+write; an `InventoryStorage` carries it out on one database: `FirestoreStorage` and
+`SqliteStorage`.
+
+Documents returned by reads have the `id` and `to_dict()` of a Firestore snapshot, and a
+document returned by `cursor` or `query` can be passed back as the `cursor` of a query.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Optional, TypeVar
+
+from .portfolio_summary import SummaryDelta
+
+# A Firestore `where(field, operator, value)` filter, e.g. ("Format", "==", "Blu-ray").
+Condition = tuple[str, str, Any]
+
+T = TypeVar("T")
+
+
+class StorageTransaction(ABC):
+    """The reads and writes of one atomic transaction. All reads come before the first write."""
+
+    @abstractmethod
+    def get_all(
+        self, user_id: str, collection_id: str, document_ids: list[str], fields: Optional[list[str]] = None
+    ) -> dict[str, dict[str, Any]]:
+        """Returns the documents that exist, keyed by ID, with only `fields` if given."""
+
+    @abstractmethod
+    def set(
+        self, user_id: str, collection_id: str, document_id: str, data: dict[str, Any], merge: bool = False
+    ) -> None:
+        """Writes a document, or merges `data` into it like Firestore's `set(..., merge=True)`."""
+
+    @abstractmethod
+    def delete(self, user_id: str, collection_id: str, document_id: str) -> None:
+        """Deletes a document; its raw price history may be left to `InventoryStorage.delete_price_history`."""
+
+    @abstractmethod
+    def add_price_entry(self, user_id: str, collection_id: str, document_id: str, entry: dict[str, Any]) -> None:
+        """Appends a price check to an item's raw history; appending the same check twice is a no-op."""
+
+    @abstractmethod
+    def apply_summary(self, user_id: str, delta: SummaryDelta) -> None:
+        """Adds the changes recorded in `delta` to the user's portfolio summary."""
+
+
+class InventoryStorage(ABC):
+    """The reads, queries and transactions the inventory tools need from a database."""
+
+    @abstractmethod
+    def get(
+        self, user_id: str, collection_id: str, document_id: str, fields: Optional[list[str]] = None
+    ) -> Optional[dict[str, Any]]:
+        """Returns a document, with only `fields` if given, or None if it does not exist."""
+
+    @abstractmethod
+    def users(self) -> list[str]:
+        """Returns the IDs of the users with an inventory, sorted."""
+
+    @abstractmethod
+    def categories(self, user_id: str) -> list[str]:
+        """Returns the user's inventory categories, sorted."""
+
+    @abstractmethod
+    def cursor(self, user_id: str, collection_id: str, document_id: str) -> Optional[Any]:
+        """Returns a document to pass as the `cursor` of `query`, or None if it does not exist."""
+
+    @abstractmethod
+    def query(
+        self,
+        user_id: str,
+        collection_id: str,
+        condition: Optional[Condition] = None,
+        fields: Optional[list[str]] = None,
+        order_field: Optional[str] = None,
+        cursor: Optional[Any] = None,
+        limit: Optional[int] = None,
+    ) -> list[Any]:
+        """
+        Returns the documents of a category that match `condition`, in document ID order.
+
+        Args:
+            user_id: The user who owns the category.
+            collection_id: The category to read.
+            condition: An optional filter.
+            fields: Only read these fields of each document. All fields if omitted.
+            order_field: Order by this field first, as Firestore requires for range filters.
+            cursor: A document from `cursor` or from an earlier page; results start after it.
+            limit: The most documents to return.
+        """
+
+    @abstractmethod
+    def aggregate(
+        self, user_id: str, collection_id: str, condition: Optional[Condition], sum_field: Optional[str]
+    ) -> dict[str, Any]:
+        """
+        Counts the matching items of a category and totals their quantities without reading them.
+
+        Returns:
+            `items` and `quantity`, plus `{sum_field}_total` and `{sum_field}_average` if
+            `sum_field` is given, computed by the database where it can.
+        """
+
+    @abstractmethod
+    def price_history(self, user_id: str, collection_id: str, document_id: str, limit: int) -> list[dict[str, Any]]:
+        """Returns the newest `limit` raw price checks of an item, newest first."""
+
+    @abstractmethod
+    def read_summary(self, user_id: str) -> Optional[dict[str, Any]]:
+        """Returns the user's stored portfolio summary as formatted by `read_summary`, or None."""
+
+    @abstractmethod
+    def set_summary(self, user_id: str, summary: dict[str, Any]) -> None:
+        """Replaces the user's portfolio summary with the result of `rebuild_summary`."""
+
+    @abstractmethod
+    def transaction(self, write: Callable[[StorageTransaction], T]) -> T:
+        """
+        Runs `write` in a transaction and returns its result.
+
+        `write` may run more than once if the transaction is retried, so it must not have
+        side effects besides its calls on the transaction.
+        """
+
+    @abstractmethod
+    def delete_price_history(self, user_id: str, collection_id: str, document_ids: list[str]) -> None:
+        """Deletes the raw price history of deleted items, unless `StorageTransaction.delete` already did."""
+
+    @abstractmethod
+    def new_document_id(self) -> str:
+        """Returns a new random document ID."""
@@ -0,0 +1,406 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Latency, Firestore RPC and token instrumentation of the agents and their tools.
+
+ADK already opens an OpenTelemetry span for every agent run (`invoke_agent`), model
+call (`call_llm`) and tool call (`execute_tool`). `Telemetry` adds ADK callbacks that
+measure each of them and attach what the spans lack as `inventory.*` attributes: the
+Firestore RPCs, documents read and written, payload sizes, token usage and Google
+Search queries. Each measurement can also be written as one JSON line to a local file.
+
+Firestore work is attributed through a context variable, so the RPCs of a tool call are
+counted on its span and on every enclosing span (for example the agent that called it).
+A model or tool call that raises is closed by the error callbacks, with the error's type.
+"""
+
+import contextvars
+import inspect
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+from opentelemetry import trace
+
+from .clients import LazyClient
+
+# The Firestore RPCs that are counted, and those whose streamed responses carry documents.
+_RPCS = frozenset((
+    "get_document", "list_documents", "create_document", "update_document", "delete_document",
+    "batch_get_documents", "begin_transaction", "commit", "rollback", "run_query",
+    "run_aggregation_query", "list_collection_ids", "batch_write",
+))
+_STREAMING_RPCS = frozenset((
+    "batch_get_documents", "run_query", "run_aggregation_query", "list_documents", "list_collection_ids",
+))
+_SINGLE_WRITE_RPCS = frozenset(("create_document", "update_document", "delete_document"))
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Span:
+    """One measured agent run, model call or tool call."""
+
+    kind: str
+    name: str
+    agent: Optional[str] = None
+    invocation_id: Optional[str] = None
+    started: float = field(default_factory=time.perf_counter)
+    duration_ms: Optional[float] = None
+    rpcs: int = 0
+    documents_read: int = 0
+    documents_written: int = 0
+    request_bytes: Optional[int] = None
+    response_bytes: Optional[int] = None
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+    thought_tokens: int = 0
+    search_queries: int = 0
+    answered_by_callback: bool = False
+    error: Optional[str] = None
+    parent: Optional["Span"] = field(default=None, repr=False)
+
+    def add(self, **counts: int) -> None:
+        """Adds to counters of this span and of every enclosing span."""
+        span: Optional[Span] = self
+        while span is not None:
+            for name, count in counts.items():
+                setattr(span, name, getattr(span, name) + count)
+            span = span.parent
+
+    def to_record(self) -> dict[str, Any]:
+        record = {f.name: getattr(self, f.name) for f in fields(self) if f.name not in ("started", "parent")}
+        record["parent"] = self.parent.name if self.parent else None
+        return {key: value for key, value in record.items() if value not in (None, 0, False)}
+
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("telemetry_span", default=None)
+
+
+class Telemetry:
+    """Measures agent runs, model calls, tool calls and Firestore RPCs."""
+
+    def __init__(self, json_path: Optional[str] = None):
+        """
+        Initializes the instrumentation.
+
+        Args:
+            json_path: Optional file that every finished span is appended to as a JSON line.
+                Spans are always attached to the current OpenTelemetry span.
+        """
+        self.json_path = json_path
+        self._open: dict[tuple, Span] = {}
+        self._instrumented: set[int] = set()
+        self._lock = threading.Lock()
+
+    def instrument_agent(self, agent: Any) -> None:
+        """Adds the measuring callbacks to an agent, its sub-agents and the agents it uses as tools."""
+        if id(agent) in self._instrumented:
+            return
+        self._instrumented.add(id(agent))
+        agent.before_agent_callback = self._before_agent(_callbacks(agent.before_agent_callback))
+        agent.after_agent_callback = self._after_agent(_callbacks(agent.after_agent_callback))
+        agent.before_model_callback = [self._before_model, *_callbacks(agent.before_model_callback)]
+        agent.after_model_callback = [self._after_model, *_callbacks(agent.after_model_callback)]
+        agent.before_tool_callback = [self._before_tool, *_callbacks(agent.before_tool_callback)]
+        agent.after_tool_callback = [self._after_tool, *_callbacks(agent.after_tool_callback)]
+        agent.on_model_error_callback = [self._model_error, *_callbacks(agent.on_model_error_callback)]
+        agent.on_tool_error_callback = [self._tool_error, *_callbacks(agent.on_tool_error_callback)]
+        for sub_agent in getattr(agent, "sub_agents", None) or []:
+            self.instrument_agent(sub_agent)
+        for tool in getattr(agent, "tools", None) or []:
+            if getattr(tool, "agent", None) is not None:
+                self.instrument_agent(tool.agent)
+
+    def instrument_firestore(self, db: Any) -> None:
+        """Counts a Firestore client's RPCs and documents on the span that made them."""
+        if id(db) in self._instrumented:
+            return
+        self._instrumented.add(id(db))
+        instrument_firestore(db, _count_rpc, _count_documents)
+
+    def _start(self, key: tuple, span: Span) -> Span:
+        span.parent = _current.get()
+        _current.set(span)
+        with self._lock:
+            self._open[key] = span
+        return span
+
+    def _finish(self, key: tuple) -> Optional[Span]:
+        with self._lock:
+            span = self._open.pop(key, None)
+        if span is None:
+            return None
+        span.duration_ms = round((time.perf_counter() - span.started) * 1000, 1)
+        _current.set(span.parent)
+        record = span.to_record()
+        trace.get_current_span().set_attributes({
+            f"inventory.{name}": value for name, value in record.items()
+            if isinstance(value, (int, float, str, bool))
+        })
+        if self.json_path:
+            self._write(record)
+        return span
+
+    def _write(self, record: dict[str, Any]) -> None:
+        record = {"time": datetime.now(timezone.utc).isoformat(timespec="milliseconds"), **record}
+        line = json.dumps(record, default=str) + "\n"
+        try:
+            with self._lock, open(self.json_path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError as e:
+            # Instrumentation must never fail a turn.
+            logger.warning("Could not write telemetry to %s: %s", self.json_path, e)
+
+    def _fail(self, key: tuple, error: Exception) -> None:
+        """Finishes the span of a call that raised, which never reaches its `after_*` callback."""
+        with self._lock:
+            span = self._open.get(key)
+        if span is not None:
+            span.error = type(error).__name__
+        self._finish(key)
+
+    def _before_agent(self, callbacks: list[Callable]) -> Callable:
+        async def callback(callback_context: Any) -> Any:
+            key = ("agent", callback_context.invocation_id, callback_context.agent_name)
+            span = self._start(key, Span(
+                "agent", callback_context.agent_name, callback_context.agent_name, callback_context.invocation_id))
+            result = await _run(callbacks, callback_context)
+            if result is not None:
+                # A callback answered (e.g. the intent router or a cache), so the agent does not run.
+                span.answered_by_callback = True
+                self._finish(key)
+            return result
+        return callback
+
+    def _after_agent(self, callbacks: list[Callable]) -> Callable:
+        async def callback(callback_context: Any) -> Any:
+            result = await _run(callbacks, callback_context)
+            self._finish(("agent", callback_context.invocation_id, callback_context.agent_name))
+            return result
+        return callback
+
+    def _before_model(self, callback_context: Any, llm_request: Any) -> None:
+        span = Span("model", llm_request.model or "model", callback_context.agent_name, callback_context.invocation_id)
+        span.request_bytes = sum(
+            len(content.model_dump_json(exclude_none=True)) for content in llm_request.contents or [])
+        self._start(("model", callback_context.invocation_id, callback_context.agent_name), span)
+        return None
+
+    def _after_model(self, callback_context: Any, llm_response: Any) -> None:
+        if llm_response.partial:
+            return None
+        key = ("model", callback_context.invocation_id, callback_context.agent_name)
+        with self._lock:
+            span = self._open.get(key)
+        if span is not None:
+            usage = llm_response.usage_metadata
+            grounding = llm_response.grounding_metadata
+            if llm_response.content is not None:
+                span.response_bytes = len(llm_response.content.model_dump_json(exclude_none=True))
+            span.add(
+                prompt_tokens=(usage and usage.prompt_token_count) or 0,
+                cached_tokens=(usage and usage.cached_content_token_count) or 0,
+                output_tokens=(usage and usage.candidates_token_count) or 0,
+                thought_tokens=(usage and usage.thoughts_token_count) or 0,
+                search_queries=len((grounding and grounding.web_search_queries) or []),
+            )
+        self._finish(key)
+        return None
+
+    def _before_tool(self, tool: Any, args: dict[str, Any], tool_context: Any) -> None:
+        span = Span("tool", tool.name, tool_context.agent_name, tool_context.invocation_id)
+        span.request_bytes = _size(args)
+        self._start(("tool", tool_context.function_call_id), span)
+        return None
+
+    def _after_tool(self, tool: Any, args: dict[str, Any], tool_context: Any, tool_response: Any) -> None:
+        key = ("tool", tool_context.function_call_id)
+        with self._lock:
+            span = self._open.get(key)
+        if span is not None:
+            span.response_bytes = _size(tool_response)
+        self._finish(key)
+        return None
+
+    def _model_error(self, callback_context: Any, llm_request: Any, error: Exception) -> None:
+        self._fail(("model", callback_context.invocation_id, callback_context.agent_name), error)
+        return None
+
+    def _tool_error(self, tool: Any, args: dict[str, Any], tool_context: Any, error: Exception) -> None:
+        self._fail(("tool", tool_context.function_call_id), error)
+        return None
+
+
+def instrument_firestore(db: Any, on_rpc: Callable[[str, int], None], on_documents: Callable[[int], None]) -> None:
+    """
+    Routes a Firestore client's RPCs through counting callbacks.
+
+    The client's API is still created on its first RPC, so an `AsyncClient` opens its
+    channel on the event loop that uses it.
+
+    Args:
+        db: A `firestore.Client`, `firestore.AsyncClient` or `LazyClient`.
+        on_rpc: Called with the name of every RPC and the number of documents it writes.
+        on_documents: Called with the number of documents each response returns.
+    """
+    if isinstance(db, LazyClient):
+        db = db.resolve()
+    db._firestore_api_internal = _CountingApi(db, db._firestore_api_internal, on_rpc, on_documents)
+
+
+def _count_rpc(name: str, writes: int) -> None:
+    span = _current.get()
+    if span is not None:
+        span.add(rpcs=1, documents_written=writes)
+
+
+def _count_documents(count: int) -> None:
+    span = _current.get()
+    if span is not None:
+        span.add(documents_read=count)
+
+
+def _callbacks(callback: Any) -> list[Callable]:
+    if callback is None:
+        return []
+    return list(callback) if isinstance(callback, list) else [callback]
+
+
+async def _run(callbacks: list[Callable], callback_context: Any) -> Any:
+    """Runs agent callbacks in order until one returns a result, as ADK does."""
+    for callback in callbacks:
+        result = callback(callback_context=callback_context)
+        if inspect.isawaitable(result):
+            result = await result
+        if result is not None:
+            return result
+    return None
+
+
+def _size(value: Any) -> int:
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _write_count(name: str, args: tuple, kwargs: dict[str, Any]) -> int:
+    if name in _SINGLE_WRITE_RPCS:
+        return 1
+    if name not in ("commit", "batch_write"):
+        return 0
+    request = kwargs.get("request", args[0] if args else None)
+    writes = request.get("writes") if isinstance(request, dict) else getattr(request, "writes", None)
+    return len(writes or [])
+
+
+def _response_documents(response: Any) -> int:
+    pb = getattr(response, "_pb", None)
+    if pb is None:
+        return 0
+    return sum(
+        1 for name in ("document", "found")
+        if name in pb.DESCRIPTOR.fields_by_name and pb.HasField(name)
+    )
+
+
+class _CountingApi:
+    """Wraps a Firestore GAPIC client, reporting calls and streamed documents."""
+
+    def __init__(
+        self,
+        db: Any,
+        api: Optional[Any],
+        on_rpc: Callable[[str, int], None],
+        on_documents: Callable[[int], None],
+    ):
+        self._db = db
+        self._api = api
+        self._on_rpc = on_rpc
+        self._on_documents = on_documents
+        self._lock = threading.Lock()
+
+    def _real_api(self) -> Any:
+        """Returns the wrapped API, letting the client create it on first use."""
+        with self._lock:
+            if self._api is None:
+                self._db._firestore_api_internal = None
+                try:
+                    self._api = self._db._firestore_api
+                finally:
+                    self._db._firestore_api_internal = self
+            return self._api
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._real_api(), name)
+        if name not in _RPCS:
+            return attr
+        on_rpc, on_documents = self._on_rpc, self._on_documents
+
+        def call(*args, **kwargs):
+            on_rpc(name, _write_count(name, args, kwargs))
+            if name == "get_document":
+                on_documents(1)
+            result = attr(*args, **kwargs)
+            if name not in _STREAMING_RPCS:
+                return result
+            if inspect.isawaitable(result):
+                async def stream():
+                    return _CountingStream(await result, on_documents)
+                return stream()
+            return _CountingStream(result, on_documents)
+
+        return call
+
+
+class _CountingStream:
+    """Passes through a sync or async response stream, reporting the documents in it."""
+
+    def __init__(self, stream: Any, on_documents: Callable[[int], None]):
+        self._stream = stream
+        self._on_documents = on_documents
+        self._iterator = None
+
+    def __iter__(self):
+        self._iterator = iter(self._stream)
+        return self
+
+    def __next__(self):
+        if self._iterator is None:
+            self._iterator = iter(self._stream)
+        response = next(self._iterator)
+        self._on_documents(_response_documents(response))
+        return response
+
+    def __aiter__(self):
+        self._iterator = self._stream.__aiter__()
+        return self
+
+    async def __anext__(self):
+        if self._iterator is None:
+            self._iterator = self._stream.__aiter__()
+        response = await self._iterator.__anext__()
+        self._on_documents(_response_documents(response))
+        return response
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
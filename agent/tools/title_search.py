@@ -0,0 +1,101 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Fuzzy title search over inventory items.
+
+Every item written through the tools stores the trigrams of its normalized title in
+`TitleSearchKeys`. A search pages through the items sharing any of the query's trigrams
+with an `array_contains_any` query and ranks them by trigram overlap, so typos and
+missing words such as "4K" still find the item.
+"""
+
+import re
+from typing import Any, Optional
+
+from .catalog import FORMAT_SYNONYMS
+
+SEARCH_KEYS_FIELD = "TitleSearchKeys"
+
+# Firestore allows at most 30 values in an `array_contains_any` filter.
+MAX_QUERY_KEYS = 30
+# Candidates fetched per page of a search.
+MAX_CANDIDATES = 200
+# The most candidates one search ranks; beyond this its matches are marked partial.
+MAX_SCANNED_CANDIDATES = 2000
+# Candidates scoring below this share too little of the query to be the same title.
+MIN_SCORE = 0.3
+
+# Words so common in titles that their trigrams would match nearly every item.
+_STOPWORDS = frozenset(("a", "an", "the", "and", "of", "to", "in", "on", "edition"))
+
+
+def title_tokens(title: str) -> list[str]:
+    """Lowercases a title, spells formats one way (e.g. "Blu-ray" as "bluray") and splits it into words."""
+    text = str(title).lower()
+    for pattern, replacement in FORMAT_SYNONYMS:
+        text = pattern.sub(replacement, text)
+    return re.findall(r"[a-z0-9]+", text)
+
+
+def title_keys(title: str) -> list[str]:
+    """Returns the trigrams of a title's words, padded so that word starts and ends count too."""
+    keys: set[str] = set()
+    for token in title_tokens(title):
+        padded = f" {token} "
+        keys.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return sorted(keys)
+
+
+def query_keys(query: str) -> list[str]:
+    """
+    Picks the trigrams of a search query used to fetch candidates, at most `MAX_QUERY_KEYS`.
+
+    Trigrams of longer, non-stopword words are preferred because they are the most selective.
+    """
+    tokens = [token for token in title_tokens(query) if token not in _STOPWORDS] or title_tokens(query)
+    keys: list[str] = []
+    for token in sorted(set(tokens), key=len, reverse=True):
+        for key in title_keys(token):
+            if key not in keys:
+                keys.append(key)
+    return keys[:MAX_QUERY_KEYS]
+
+
+def similarity(query: str, keys: list[str]) -> float:
+    """Returns the Dice similarity between the trigrams of a query and an item's `TitleSearchKeys`."""
+    wanted, stored = set(title_keys(query)), set(keys or ())
+    if not wanted or not stored:
+        return 0.0
+    return 2 * len(wanted & stored) / (len(wanted) + len(stored))
+
+
+def with_search_keys(data: dict[str, Any]) -> dict[str, Any]:
+    """Returns the document data with `TitleSearchKeys` added if it sets a `Title`."""
+    title = data.get("Title")
+    if not isinstance(title, str) or not title.strip():
+        return data
+    return {**data, SEARCH_KEYS_FIELD: title_keys(title)}
+
+
+def without_search_keys(data: Optional[dict[str, Any]]) -> Optional[dict[str, Any]]:
+    """Drops `TitleSearchKeys` from document data before it is returned to an agent."""
+    if not data or SEARCH_KEYS_FIELD not in data:
+        return data
+    return {key: value for key, value in data.items() if key != SEARCH_KEYS_FIELD}
+
+
+def is_title_field(field: str) -> bool:
+    """Returns True for the field names agents use for an item's title."""
+    return field.strip().lower() in ("title", "name")
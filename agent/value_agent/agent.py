@@ -1,17 +1,23 @@
 from google.adk.agents import Agent
 from google.adk.tools import google_search
-from google.adk.models.google_llm import Gemini
+
+from datetime import timedelta
 
 from .. import config
-from ..tools.agent_tools import retry_config
+from ..tools.agent_tools import AdmittedGemini, model_admission
+from ..tools.clients import lazy_firestore_client
+from ..tools.market_prices import MarketPriceCache
+
 
+# Prices are shared across users, so a UPC valued recently by anyone skips the search.
+market_prices = MarketPriceCache(
+    lazy_firestore_client(config.PROJECT_ID, config.FIRESTORE_DATABASE),
+    max_age=timedelta(hours=config.MARKET_PRICE_MAX_AGE_HOURS),
+)
 
 root_agent = Agent(
     name="value_agent",
-    model=Gemini(
-        model=config.MODEL,
-        retry_options=retry_config
-    ),
+    model=AdmittedGemini(model=config.VALUE_MODEL, admission=model_admission(config.MODEL_RATE_PER_MINUTE)),
     description="Finds the market value of a physical media by searching on eBay using its title, UPC, and condition.",
     instruction="""You are a valuation expert specializing in physical media like DVDs and BluRays. Your task is to find the market value of a given item by searching for it on eBay.
 
@@ -28,9 +34,11 @@ root_agent = Agent(
     - Analyze the collected prices from verified sold listings.
     - Calculate a single estimated value. You can use the **average** or **median** price—use your best judgment based on the range and consistency of the prices you find. If prices are very spread out, the median is often a better choice.
 5.  **Respond with Findings**:
-    - Return the single estimated value you calculated in USD.
+    - Return the single estimated value you calculated in USD, and end your reply with a line of the form `VALUE: $12.99` holding it.
     - You should not respond directly to the user. Return your findings to the master agent.
-    - If you cannot find enough relevant listings to make a confident estimation, return that information.
+    - If you cannot find enough relevant listings to make a confident estimation, return that information and end your reply with `VALUE: NONE`.
 """,
     tools=[google_search],
+    before_agent_callback=market_prices.before_agent_callback,
+    after_agent_callback=market_prices.after_agent_callback,
 )
\ No newline at end of file
@@ -0,0 +1,104 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests of the commands the intent router answers and those it leaves to the orchestrator."""
+
+import asyncio
+from types import SimpleNamespace
+
+from agent.tools.intent_router import IntentRouter
+
+
+class FakeTools:
+    """Serves title searches from fixed matches and counts, and records deletes."""
+
+    def __init__(self, matches, totals=None):
+        self.matches = matches
+        self.totals = totals or {"items": 0, "quantity": 0}
+        self.deleted = []
+        self.aggregated = []
+
+    async def list_inventory_categories(self, tool_context):
+        return sorted(self.matches)
+
+    async def aggregate_inventory(self, tool_context, collection_id=None):
+        self.aggregated.append(collection_id)
+        return {"totals": self.totals}
+
+    async def find_document_by_field(self, collection_id, field, value, tool_context, limit=5):
+        return self.matches[collection_id][:limit]
+
+    async def delete_document(self, collection_id, document_id, tool_context):
+        self.deleted.append((collection_id, document_id))
+        return f"Successfully deleted document at 'users/1/{collection_id}/{document_id}'."
+
+
+def match(document_id, title, score):
+    return {"id": document_id, "score": score, "data": {"Title": title}}
+
+
+def route(tools, text):
+    return asyncio.run(IntentRouter(tools).route(text, SimpleNamespace(state={"user_id": "1"})))
+
+
+def test_lists_the_categories():
+    tools = FakeTools({"dvd": [], "bluray": []})
+    assert route(tools, "What categories do I have?") == "Your inventory categories: bluray, dvd."
+
+
+def test_counts_the_category_a_plural_noun_names():
+    tools = FakeTools({"dvd": [], "bluray": []}, totals={"items": 2, "quantity": 3})
+    assert route(tools, "how many Blu-rays do I have") == "You have 2 items in 'bluray' (3 copies in total)."
+    assert tools.aggregated == ["bluray"]
+
+
+def test_counts_of_an_unknown_category_are_left_to_the_orchestrator():
+    tools = FakeTools({"dvd": []})
+    assert route(tools, "how many westerns do I have") is None
+    assert tools.aggregated == []
+
+
+def test_deletes_the_only_item_with_the_title():
+    tools = FakeTools({"dvd": [match("a", "Toy Story", 1.0), match("b", "Toy Story 2", 0.8)]})
+    assert route(tools, "delete Toy Story") == "Deleted 'Toy Story' from 'dvd'."
+    assert tools.deleted == [("dvd", "a")]
+
+
+def test_title_matching_ignores_case_punctuation_and_format_spelling():
+    tools = FakeTools({"bluray": [match("a", "Inception (Blu-ray)", 0.9)]})
+    assert route(tools, "remove inception bluray") is not None
+    assert tools.deleted == [("bluray", "a")]
+
+
+def test_near_match_is_left_to_the_orchestrator():
+    tools = FakeTools({"dvd": [match("b", "Toy Story 2", 0.8)]})
+    assert route(tools, "delete Toy Story") is None
+    assert tools.deleted == []
+
+
+def test_several_copies_of_the_title_are_left_to_the_orchestrator():
+    tools = FakeTools({"dvd": [match("a", "Toy Story", 1.0)], "bluray": [match("c", "Toy Story", 1.0)]})
+    assert route(tools, "delete Toy Story") is None
+    assert tools.deleted == []
+
+
+def test_references_to_the_conversation_are_left_to_the_orchestrator():
+    tools = FakeTools({"dvd": [match("a", "It", 1.0)]})
+    assert route(tools, "delete it") is None
+    assert tools.deleted == []
+
+
+def test_questions_about_value_are_left_to_the_orchestrator():
+    tools = FakeTools({"dvd": [match("a", "Inception", 1.0)]})
+    assert route(tools, "what is Inception worth") is None
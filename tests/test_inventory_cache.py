@@ -0,0 +1,69 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests that writes made through the tools invalidate the cached reads they affect."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from agent.tools.inventory_cache import InventoryCache
+from agent.tools.sqlite_tools import SqliteTools
+
+USER = "u1"
+
+
+@pytest.fixture
+def tools(tmp_path):
+    tools = SqliteTools(str(tmp_path / "inventory.db"), cache=InventoryCache(ttl_seconds=3600))
+    context = SimpleNamespace(state={"user_id": USER})
+    tools.add_document("dvd", {"Title": "Heat", "Quantity": 1}, context, document_id="heat")
+    tools.add_document("dvd", {"Title": "Alien", "Quantity": 1}, context, document_id="alien")
+    return tools, context
+
+
+def test_repeated_reads_are_served_from_the_cache(tools):
+    tools, context = tools
+    tools.get_document("dvd", "heat", context)
+    tools.storage.transaction(lambda transaction: transaction.delete(USER, "dvd", "heat"))
+    # A write that bypasses the tools is not seen until the entry expires.
+    assert tools.get_document("dvd", "heat", context)["Title"] == "Heat"
+    assert tools.cache.stats()["hits"] == 1
+
+
+def test_writes_invalidate_the_reads_that_observe_them(tools):
+    tools, context = tools
+    assert tools.get_document("dvd", "heat", context)["Quantity"] == 1
+    assert tools.list_inventory_categories(context) == ["dvd"]
+    assert len(tools.find_document_by_field("dvd", "Quantity", 1, context)) == 2
+
+    tools.update_document("dvd", "heat", {"Quantity": 3}, context)
+    tools.bulk_update_documents("dvd", [{"document_id": "alien", "data": {"Quantity": 2}}], context)
+    tools.add_document("vhs", {"Title": "Tron"}, context)
+
+    assert tools.get_document("dvd", "heat", context)["Quantity"] == 3
+    assert tools.list_inventory_categories(context) == ["dvd", "vhs"]
+    assert [match["id"] for match in tools.find_document_by_field("dvd", "Quantity", 2, context)] == ["alien"]
+    assert tools.find_document_by_field("dvd", "Quantity", 1, context) == []
+
+    tools.delete_document("dvd", "heat", context)
+    assert tools.get_document("dvd", "heat", context) == {"error": "Document not found."}
+
+
+def test_a_write_keeps_the_cached_reads_of_other_documents(tools):
+    tools, context = tools
+    tools.get_document("dvd", "heat", context)
+    tools.update_document("dvd", "alien", {"Quantity": 5}, context)
+    tools.get_document("dvd", "heat", context)
+    assert tools.cache.stats()["hits"] == 1
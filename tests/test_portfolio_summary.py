@@ -0,0 +1,74 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests that the summary deltas applied by every write agree with a rebuild from the items."""
+
+from types import SimpleNamespace
+
+from agent.tools.portfolio_summary import rebuild_summary
+from agent.tools.pricing import new_price_entry, rollup_portfolio
+from agent.tools.sqlite_tools import SqliteTools
+
+USER = "u1"
+
+
+def priced(title, value, quantity=1):
+    return {"Title": title, "Quantity": quantity, "PriceHistory": [new_price_entry(value)]}
+
+
+def rebuilt(tools):
+    """Returns the summary rebuilt from the stored items, shaped like `read_summary`."""
+    items = [
+        (category_id, doc.to_dict())
+        for category_id in tools.storage.categories(USER)
+        for doc in tools.storage.query(USER, category_id)
+    ]
+    return rollup_portfolio(items)
+
+
+def stored(tools):
+    summary = tools.storage.read_summary(USER)
+    summary.pop("as_of")
+    return summary
+
+
+def test_write_deltas_match_a_rebuild(tmp_path):
+    tools = SqliteTools(str(tmp_path / "inventory.db"), price_fetcher=lambda item: 7.5)
+    context = SimpleNamespace(state={"user_id": USER})
+    # Deltas are only trusted once a summary has been built.
+    tools.storage.set_summary(USER, rebuild_summary([]))
+
+    tools.add_document("dvd", priced("Heat", 10, quantity=2), context, document_id="heat")
+    tools.add_document("dvd", {"Title": "Alien", "Quantity": "3"}, context, document_id="alien")
+    added = tools.bulk_add_documents(
+        "vhs", [priced("Tron", 4), priced("Big", 6, quantity=5), {"Title": "Jaws"}], context)
+    vhs_ids = [result["document_id"] for result in added["results"]]
+    assert stored(tools) == rebuilt(tools)
+
+    tools.update_document("dvd", "heat", {"Quantity": 4}, context)
+    tools.update_document("dvd", "alien", {"PriceHistory": [new_price_entry(20)]}, context)
+    tools.bulk_update_documents("vhs", [
+        {"document_id": vhs_ids[0], "data": {"Quantity": 0}},
+        {"document_id": "missing", "data": {"Quantity": 9}},
+    ], context)
+    assert stored(tools) == rebuilt(tools)
+
+    tools.delete_document("dvd", "heat", context)
+    tools.bulk_delete_documents("vhs", [vhs_ids[1], "missing"], context)
+    assert stored(tools) == rebuilt(tools)
+
+    # Refreshing prices applies deltas too: Jaws gets its first price and the rest a new one.
+    tools.value_portfolio(context, refresh=True)
+    assert stored(tools) == rebuilt(tools)
+    assert stored(tools)["total_value"] == 7.5 * (3 + 0 + 1)
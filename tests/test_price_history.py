@@ -0,0 +1,86 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests of how item writes compact `PriceHistory` into the rollup and the raw history."""
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from agent.tools import inventory_tools
+from agent.tools.price_history import RECENT_PRICES, ROLLUP_FIELD
+from agent.tools.pricing import new_price_entry
+from agent.tools.sqlite_tools import SqliteTools, _SqliteTransaction
+
+USER = "u1"
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def history(values, first_day=0):
+    return [new_price_entry(value, START + timedelta(days=first_day + day)) for day, value in enumerate(values)]
+
+
+@pytest.fixture
+def tools(tmp_path):
+    return SqliteTools(str(tmp_path / "inventory.db")), SimpleNamespace(state={"user_id": USER})
+
+
+def test_writes_keep_the_latest_prices_and_roll_up_all_of_them(tools):
+    tools, context = tools
+    tools.add_document("dvd", {"Title": "Heat", "PriceHistory": history(range(1, 16))}, context, document_id="h")
+    item = tools.get_document("dvd", "h", context)
+    assert [entry["value"] for entry in item["PriceHistory"]] == list(range(16 - RECENT_PRICES, 16))
+    rollup = item[ROLLUP_FIELD]
+    assert (rollup["count"], rollup["min"], rollup["max"]) == (15, 1, 15)
+    assert len(tools.get_price_history("dvd", "h", context)["history"]) == 15
+
+
+def test_updates_only_roll_up_new_prices(tools):
+    tools, context = tools
+    prices = history([4, 5])
+    tools.add_document("dvd", {"Title": "Heat", "PriceHistory": prices}, context, document_id="h")
+    # An agent writes back the history it read, plus one new check.
+    tools.update_document("dvd", "h", {"PriceHistory": prices + history([9], first_day=5)}, context)
+    rollup = tools.get_document("dvd", "h", context)[ROLLUP_FIELD]
+    assert (rollup["count"], rollup["max"]) == (3, 9)
+    assert [entry["value"] for entry in tools.get_price_history("dvd", "h", context)["history"]] == [9, 5, 4]
+
+
+def test_raw_history_is_written_in_the_item_transaction(tools, monkeypatch):
+    tools, context = tools
+
+    def fail(self, user_id, delta):
+        raise RuntimeError("contention")
+
+    monkeypatch.setattr(_SqliteTransaction, "apply_summary", fail)
+    result = tools.bulk_add_documents("dvd", [{"Title": "Heat", "PriceHistory": history([4, 5])}], context)
+    assert result["failed"] == 1
+    document_id = result["results"][0]["document_id"]
+    assert tools.storage.price_history(USER, "dvd", document_id, 10) == []
+
+
+def test_bulk_writes_are_chunked_by_their_price_entries(monkeypatch):
+    monkeypatch.setattr(inventory_tools, "WRITES_PER_BATCH", 10)
+    writes = [
+        ("a", {"PriceHistory": history([1, 2, 3])}),
+        ("b", {"PriceHistory": history([1, 2, 3, 4])}),
+        ("c", {"Title": "no prices"}),
+        ("d", None),
+        ("e", {"PriceHistory": history(range(20))}),
+        ("f", {}),
+    ]
+    chunks = [[document_id for document_id, _ in chunk] for chunk in inventory_tools._chunks(writes)]
+    # a, b and c take 4, 5 and 1 writes; an item with too many entries is written on its own.
+    assert chunks == [["a", "b", "c"], ["d"], ["e"], ["f"]]
@@ -0,0 +1,176 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests of the adaptive concurrency limit, circuit breaker and queue of `AdmissionController`."""
+
+import asyncio
+
+import pytest
+
+from agent.tools.rate_limit import AdmissionConfig, AdmissionController, AdmissionRejected
+
+
+class ApiError(Exception):
+    def __init__(self, code: int):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+def calling(responses):
+    """Returns a call whose attempts raise or return the given statuses in turn (None for success)."""
+    calls = []
+
+    async def call():
+        calls.append(len(calls))
+        status = responses[len(calls) - 1]
+        if status is not None:
+            raise ApiError(status)
+        yield "ok"
+
+    return call, calls
+
+
+async def collect(controller, call):
+    return [response async for response in controller.stream(call)]
+
+
+def test_throttling_halves_the_limit_once_per_burst():
+    controller = AdmissionController("model", AdmissionConfig(initial_concurrency=8, attempts=1))
+    call, _ = calling([429, 429])
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(ApiError):
+                await collect(controller, call)
+
+    asyncio.run(run())
+    metrics = controller.metrics()
+    assert metrics["concurrency_limit"] == 4
+    assert metrics["throttled"] == 2
+
+
+def test_limit_never_drops_below_the_minimum():
+    controller = AdmissionController("model", AdmissionConfig(initial_concurrency=2, min_concurrency=2, attempts=1))
+    call, _ = calling([503])
+
+    async def run():
+        with pytest.raises(ApiError):
+            await collect(controller, call)
+
+    asyncio.run(run())
+    assert controller.metrics()["concurrency_limit"] == 2
+
+
+def test_circuit_opens_and_lets_one_call_through_when_half_open():
+    config = AdmissionConfig(attempts=1, failure_threshold=2, open_seconds=0.2)
+    controller = AdmissionController("model", config)
+    call, calls = calling([503, 503, None])
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(ApiError):
+                await collect(controller, call)
+        # Open: calls fail fast without reaching the model.
+        with pytest.raises(AdmissionRejected):
+            await collect(controller, call)
+        assert len(calls) == 2
+        await asyncio.sleep(0.25)
+
+        # Half-open: one call goes through while the others keep failing fast.
+        release = asyncio.Event()
+
+        async def probe():
+            await release.wait()
+            async for response in call():
+                yield response
+
+        trial = asyncio.create_task(collect(controller, probe))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected):
+            await collect(controller, call)
+        release.set()
+        assert await trial == ["ok"]
+
+    asyncio.run(run())
+    assert not controller.metrics()["circuit_open"]
+
+
+def test_cancelled_waiter_does_not_hold_a_slot():
+    controller = AdmissionController("model", AdmissionConfig(initial_concurrency=1, attempts=1))
+
+    async def run():
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            yield "slow"
+
+        async def fast():
+            yield "fast"
+
+        first = asyncio.create_task(collect(controller, slow))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(collect(controller, fast))
+        await asyncio.sleep(0)
+        assert controller.metrics()["queue_depth"] == 1
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        release.set()
+        assert await first == ["slow"]
+        assert await asyncio.wait_for(collect(controller, fast), timeout=1) == ["fast"]
+
+    asyncio.run(run())
+    metrics = controller.metrics()
+    assert metrics["in_flight"] == 0
+    assert metrics["queue_depth"] == 0
+
+
+def test_waiter_cancelled_after_its_grant_gives_the_slot_back():
+    controller = AdmissionController("model", AdmissionConfig(initial_concurrency=1, attempts=1))
+
+    async def run():
+        await controller._acquire_slot()
+        queued = asyncio.create_task(controller._acquire_slot())
+        await asyncio.sleep(0)
+        # The running call ends and `_grant` resolves the waiter, which is cancelled before it resumes.
+        controller._release()
+        await asyncio.sleep(0)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+
+    asyncio.run(run())
+    assert controller.metrics()["in_flight"] == 0
+
+
+def test_full_queue_rejects_calls():
+    controller = AdmissionController("model", AdmissionConfig(initial_concurrency=1, max_queue=1, attempts=1))
+
+    async def run():
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            yield "slow"
+
+        running = [asyncio.create_task(collect(controller, slow)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected):
+            await collect(controller, slow)
+        release.set()
+        await asyncio.gather(*running)
+
+    asyncio.run(run())
+    assert controller.metrics()["rejected"] == 1
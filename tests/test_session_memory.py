@@ -0,0 +1,66 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests of the compaction of session events before they are saved to memory."""
+
+from google.adk.events import Event
+from google.genai import types
+
+from agent.tools.session_memory import compact_events
+
+
+def text_event(text, author="user", thought=False):
+    role = "user" if author == "user" else "model"
+    return Event(author=author, content=types.Content(role=role, parts=[types.Part(text=text, thought=thought)]))
+
+
+def texts(events):
+    return [part.text for event in events for part in event.content.parts]
+
+
+def test_keeps_the_newest_events_that_fit_in_order():
+    events = [text_event(f"message {i} " + "x" * 100) for i in range(10)]
+    kept = compact_events(events, max_tokens=100)
+    assert 0 < len(kept) < 10
+    assert texts(kept) == texts(events[-len(kept):])
+
+
+def test_a_newest_event_larger_than_the_budget_is_truncated():
+    events = [text_event("short"), text_event("y" * 10000, author="inventory_agent")]
+    kept = compact_events(events, max_tokens=100)
+    assert len(kept) == 1
+    assert kept[0].author == "inventory_agent"
+    assert kept[0].content.parts[0].text.startswith("yyy")
+    assert len(kept[0].content.model_dump_json(exclude_none=True)) < 500
+
+
+def test_events_without_anything_worth_remembering_are_dropped():
+    events = [
+        text_event("thinking...", author="inventory_agent", thought=True),
+        Event(author="user", content=types.Content(role="user", parts=[
+            types.Part(inline_data=types.Blob(data=b"\xff\xd8", mime_type="image/jpeg"))])),
+        Event(author="user"),
+    ]
+    assert compact_events(events) == []
+
+
+def test_large_tool_results_are_outlined():
+    response = {"inventory": {"dvd": [{"Title": f"Title {i}"} for i in range(500)]}, "next_start_after": None}
+    event = Event(author="inventory_agent", content=types.Content(role="user", parts=[
+        types.Part(function_response=types.FunctionResponse(name="get_all_user_inventory", response=response))]))
+    kept = compact_events([event])
+    assert kept[0].content.parts[0].function_response.response == {
+        "omitted": "result too large to remember",
+        "outline": {"inventory": "1 fields", "next_start_after": None},
+    }
@@ -0,0 +1,166 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests of the SQLite translation of Firestore filters and of paging through the tools."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from agent.tools.inventory_tools import _reduce_items
+from agent.tools.sqlite_tools import SqliteStorage, SqliteTools
+
+USER = "u1"
+
+ITEMS = {
+    "a": {"Title": "Alien", "Format": "DVD", "Quantity": 2, "Tags": ["scifi", "horror"]},
+    "b": {"Title": "Brazil", "Format": "Blu-ray", "Quantity": 1, "Tags": ["comedy"]},
+    "c": {"Title": "Cube", "Format": "DVD", "Quantity": "3"},
+    "d": {"Title": "Dune", "Format": None, "Quantity": 4},
+    "e": {"Title": "Elf", "Quantity": 1, "Details": {"Region": 2}},
+}
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SqliteStorage(str(tmp_path / "inventory.db"))
+
+    def write(transaction):
+        for document_id, data in ITEMS.items():
+            transaction.set(USER, "dvd", document_id, data)
+
+    storage.transaction(write)
+    return storage
+
+
+def matching(storage, field, operator, value):
+    return [doc.id for doc in storage.query(USER, "dvd", (field, operator, value))]
+
+
+@pytest.mark.parametrize("field, operator, value, expected", [
+    ("Format", "==", "DVD", ["a", "c"]),
+    # Like Firestore, comparisons only match values of the same type.
+    ("Quantity", "==", 3, []),
+    ("Quantity", ">=", 2, ["a", "d"]),
+    ("Quantity", "<", 2, ["b", "e"]),
+    # Items without the field, or with it set to null, never match `!=`.
+    ("Format", "!=", "DVD", ["b"]),
+    ("Format", "==", None, ["d"]),
+    ("Format", "in", ["Blu-ray", "VHS"], ["b"]),
+    ("Format", "not-in", ["DVD"], ["b"]),
+    ("Tags", "array_contains", "comedy", ["b"]),
+    ("Tags", "array_contains_any", ["horror", "comedy"], ["a", "b"]),
+    ("Tags", "array_contains_any", [], []),
+    ("Details.Region", "==", 2, ["e"]),
+])
+def test_condition_matches_firestore_semantics(storage, field, operator, value, expected):
+    assert matching(storage, field, operator, value) == expected
+
+
+@pytest.mark.parametrize("field, operator", [
+    ("Title", "like"),
+    ("Title'); DROP TABLE items; --", "=="),
+    ("Details..Region", "=="),
+])
+def test_condition_rejects_invalid_filters(storage, field, operator):
+    with pytest.raises(ValueError):
+        matching(storage, field, operator, "x")
+
+
+def test_aggregate_counts_quantities_like_the_portfolio_totals(storage):
+    def write(transaction):
+        transaction.set(USER, "dvd", "f", {"Title": "Fargo"})
+        transaction.set(USER, "dvd", "g", {"Title": "Gremlins", "Quantity": -2})
+
+    storage.transaction(write)
+    reduced = _reduce_items((doc.to_dict() for doc in storage.query(USER, "dvd")), False, None)
+    # A missing Quantity counts as 1, "3" as 3 and a negative one as 0.
+    assert reduced["quantity"] == 12
+    assert storage.aggregate(USER, "dvd", None, None) == reduced
+
+
+@pytest.fixture
+def tools(tmp_path):
+    tools = SqliteTools(str(tmp_path / "inventory.db"))
+    context = SimpleNamespace(state={"user_id": USER})
+    for category_id, count in (("bluray", 3), ("dvd", 5)):
+        tools.bulk_add_documents(
+            category_id, [{"Title": f"{category_id} {i}", "Quantity": i} for i in range(count)], context)
+    return tools, context
+
+
+def test_query_collection_pages_through_every_match(tools):
+    tools, context = tools
+    titles, start_after = [], None
+    while True:
+        page = tools.query_collection("dvd", "Quantity", ">=", 1, context, limit=2, start_after=start_after)
+        assert len(page["items"]) <= 2
+        titles += [item["Title"] for item in page["items"]]
+        start_after = page["next_start_after"]
+        if start_after is None:
+            break
+    # Range filters are ordered by the filtered field first.
+    assert titles == [f"dvd {i}" for i in range(1, 5)]
+
+
+def test_get_all_user_inventory_pages_across_categories(tools):
+    tools, context = tools
+    pages, start_after = [], None
+    while True:
+        page = tools.get_all_user_inventory(context, limit=3, start_after=start_after)
+        pages.append({category_id: len(items) for category_id, items in page["inventory"].items()})
+        start_after = page["next_start_after"]
+        if start_after is None:
+            break
+    assert pages == [{"bluray": 3}, {"dvd": 3}, {"dvd": 2}]
+
+
+def test_paging_from_a_missing_document_is_an_error(tools):
+    tools, context = tools
+    assert "error" in tools.query_collection("dvd", "Quantity", ">=", 0, context, start_after="missing")
+    assert "error" in tools.get_all_user_inventory(context, start_after="dvd/missing")
+
+
+def test_writes_store_quantities_as_numbers(tools):
+    tools, context = tools
+    tools.add_document("vhs", {"Title": "Heat"}, context, document_id="h")
+    tools.update_document("dvd", tools.find_document_by_field("dvd", "Title", "dvd 2", context)[0]["id"],
+                          {"Quantity": "7"}, context)
+    assert tools.get_document("vhs", "h", context)["Quantity"] == 1
+    counted = tools.aggregate_inventory(context)["totals"]["quantity"]
+    assert counted == tools.aggregate_inventory(context, include_value=True)["totals"]["quantity"] == 3 + 15 + 1
+
+
+def test_bulk_update_reports_malformed_entries_per_item(tools):
+    tools, context = tools
+    document_id = tools.find_document_by_field("dvd", "Title", "dvd 1", context)[0]["id"]
+    result = tools.bulk_update_documents(
+        "dvd", [{"document_id": document_id, "data": {"Notes": "signed"}}, {"data": {"Notes": "lost"}}], context)
+    assert (result["succeeded"], result["failed"]) == (1, 1)
+    assert result["results"][1] == {"document_id": None, "status": "error", "error": "missing 'document_id'"}
+    assert tools.get_document("dvd", document_id, context)["Notes"] == "signed"
+
+
+def test_writes_reject_quantities_that_are_not_whole_numbers(tools):
+    tools, context = tools
+    assert tools.add_document("vhs", {"Title": "Heat", "Quantity": "x"}, context).startswith("Error: invalid Quantity")
+    document_id = tools.find_document_by_field("dvd", "Title", "dvd 1", context)[0]["id"]
+    assert tools.update_document("dvd", document_id, {"Quantity": -1}, context).startswith("Error: invalid Quantity")
+    result = tools.bulk_add_documents(
+        "vhs", [{"Title": "Tron", "Quantity": 2.0}, {"Title": "Big", "Quantity": 2.5}], context)
+    assert [entry["status"] for entry in result["results"]] == ["added", "error"]
+    result = tools.bulk_update_documents("dvd", [{"document_id": document_id, "data": {"Quantity": "two"}}], context)
+    assert result["failed"] == 1
+    assert tools.get_document("dvd", document_id, context)["Quantity"] == 1
+    assert tools.query_collection("vhs", "Quantity", ">=", 0, context)["items"][0]["Quantity"] == 2
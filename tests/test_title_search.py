@@ -0,0 +1,70 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests of the trigram keys a title search queries with and the ranking of its candidates."""
+
+from agent.tools.inventory_tools import _ranked_matches
+from agent.tools.title_search import (
+    MAX_QUERY_KEYS,
+    MIN_SCORE,
+    SEARCH_KEYS_FIELD,
+    query_keys,
+    title_keys,
+)
+
+
+def candidate(title, **fields):
+    return {"Title": title, SEARCH_KEYS_FIELD: title_keys(title), **fields}
+
+
+def test_query_keys_prefer_the_longest_words():
+    keys = query_keys("The Lord of the Rings")
+    assert keys[:len(title_keys("rings"))] == title_keys("rings")
+    assert not set(keys) & (set(title_keys("the")) - set(title_keys("lord")) - set(title_keys("rings")))
+
+
+def test_query_keys_keep_stopwords_when_nothing_else_is_left():
+    assert query_keys("The") == title_keys("the")
+
+
+def test_query_keys_are_capped():
+    assert len(query_keys("supercalifragilistic extraordinarily incomprehensibilities")) == MAX_QUERY_KEYS
+
+
+def test_query_keys_spell_formats_one_way():
+    assert query_keys("Inception Blu-ray") == query_keys("inception bluray")
+
+
+def test_query_keys_of_punctuation_are_empty():
+    assert query_keys("?!") == []
+
+
+def test_ranked_matches_order_by_similarity_and_drop_weak_ones():
+    candidates = [
+        ("x", candidate("Toy Story 2")),
+        ("y", candidate("Toy Story")),
+        ("z", candidate("Casablanca")),
+    ]
+    matches = _ranked_matches("toy story", candidates, limit=5)
+    assert [match["id"] for match in matches] == ["y", "x"]
+    assert matches[0]["score"] == 1.0
+    assert all(match["score"] >= MIN_SCORE for match in matches)
+
+
+def test_ranked_matches_keep_the_best_limit_and_hide_search_keys():
+    candidates = [(str(i), candidate(f"Toy Story {i}", Quantity=i)) for i in range(5)]
+    matches = _ranked_matches("toy story 3", candidates, limit=2)
+    assert [match["id"] for match in matches][0] == "3"
+    assert len(matches) == 2
+    assert SEARCH_KEYS_FIELD not in matches[0]["data"]
@@ -0,0 +1,116 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests of `value_portfolio`: which prices it refreshes and what it writes back."""
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from agent.tools import inventory_tools
+from agent.tools.pricing import new_price_entry
+from agent.tools.sqlite_tools import SqliteTools
+
+USER = "u1"
+
+
+class Fetcher:
+    """Prices every item at $10, except the titles in `failing`, and records what it was asked."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.titles = []
+
+    def __call__(self, item):
+        self.titles.append(item["Title"])
+        if item["Title"] in self.failing:
+            raise RuntimeError("no results")
+        return 10.0
+
+
+def priced(title, days_ago, value=5.0):
+    checked = datetime.now(timezone.utc) - timedelta(days=days_ago)
+    return {"Title": title, "Quantity": 2, "PriceHistory": [new_price_entry(value, checked)]}
+
+
+@pytest.fixture
+def tools(tmp_path):
+    fetcher = Fetcher(failing={"Failing"})
+    tools = SqliteTools(str(tmp_path / "inventory.db"), price_fetcher=fetcher)
+    context = SimpleNamespace(state={"user_id": USER})
+    tools.add_document("dvd", priced("Fresh", 0), context, document_id="fresh")
+    tools.add_document("dvd", priced("Stale", 3), context, document_id="stale")
+    tools.add_document("vhs", {"Title": "Unpriced"}, context, document_id="unpriced")
+    tools.add_document("vhs", priced("Failing", 3), context, document_id="failing")
+    return tools, context, fetcher
+
+
+def test_only_stale_and_unpriced_items_are_refreshed(tools):
+    tools, context, fetcher = tools
+    result = tools.value_portfolio(context)
+    assert sorted(fetcher.titles) == ["Failing", "Stale", "Unpriced"]
+    assert result["refreshed"] == 2
+    assert result["not_refreshed"] == ["Failing"]
+    # Fresh keeps its $5 price, Stale and Unpriced now cost $10 and Failing keeps its old price.
+    assert result["categories"]["dvd"]["value"] == 2 * 5 + 2 * 10
+    assert result["categories"]["vhs"]["value"] == 1 * 10 + 2 * 5
+
+
+def test_refreshed_prices_are_stored_with_their_history(tools):
+    tools, context, fetcher = tools
+    tools.value_portfolio(context)
+    history = tools.get_price_history("dvd", "stale", context)["history"]
+    assert [entry["value"] for entry in history] == [10.0, 5.0]
+    # The next valuation finds every price fresh except the one that failed.
+    fetcher.titles.clear()
+    tools.value_portfolio(context)
+    assert fetcher.titles == ["Failing"]
+
+
+def test_refresh_values_every_item(tools):
+    tools, context, fetcher = tools
+    assert tools.value_portfolio(context, refresh=True)["refreshed"] == 3
+    assert sorted(fetcher.titles) == ["Failing", "Fresh", "Stale", "Unpriced"]
+
+
+def test_a_failed_price_write_reports_its_items(tools, monkeypatch):
+    tools, context, _ = tools
+    transaction = tools.storage.transaction
+    calls = []
+
+    def fail_on_second(write):
+        calls.append(write)
+        if len(calls) == 2:
+            raise RuntimeError("contention")
+        return transaction(write)
+
+    # One transaction per category here; the vhs one fails.
+    monkeypatch.setattr(tools.storage, "transaction", fail_on_second)
+    result = tools.value_portfolio(context)
+    assert result["refreshed"] == 1
+    assert sorted(result["not_refreshed"]) == ["Failing", "Unpriced"]
+
+
+def test_price_writes_are_batched(tools, monkeypatch):
+    tools, context, _ = tools
+    monkeypatch.setattr(inventory_tools, "PRICES_PER_BATCH", 2)
+    for i in range(5):
+        tools.add_document("bluray", {"Title": f"bluray {i}"}, context)
+    transaction = tools.storage.transaction
+    calls = []
+    monkeypatch.setattr(tools.storage, "transaction", lambda write: calls.append(write) or transaction(write))
+    assert tools.value_portfolio(context)["refreshed"] == 7
+    # 5 bluray items in 3 transactions, plus one for dvd and one for vhs.
+    assert len(calls) == 5